@@ -0,0 +1,49 @@
+"""
+Бенчмарк разбора ответов GPT по полису ДМС: последовательный перебор шаблонов
+(старая реализация parse_dms_fields, замороженная копия в tests/test_dms_parser.py)
+против скомпилированного сопоставителя utils.dms_parser.
+
+Корпус — синтетические ответы GPT в формате PROMPT_DMS с разными страховыми
+компаниями (известными, неизвестными и отсутствующими), телефонами, email и
+свободным текстом. Выводится время одного вызова и число ответов, на которых
+результаты реализаций различаются. Строки заглавными буквами с ОПФ, на которых
+старый шаблон «ОПФ + название» перебирает варианты экспоненциально долго, в
+корпус не входят — для них отдельно замеряется только новая реализация.
+
+Запуск из корня репозитория:
+    python -m benchmarks.dms_parser [размер_корпуса]
+"""
+
+import random
+import sys
+import time
+
+from tests.test_dms_parser import PATHOLOGICAL, parse_dms_fields_sequential, synthetic_response
+from utils.dms_parser import KNOWN_INSURERS, parse_dms_fields
+
+
+def measure(func, corpus):
+    start = time.perf_counter()
+    results = [func(text) for text in corpus]
+    return (time.perf_counter() - start) / len(corpus), results
+
+
+def main(size):
+    rng = random.Random(42)
+    corpus = [synthetic_response(rng) for _ in range(size)]
+    print(f"корпус: {size} ответов, известных компаний в списке: {len(KNOWN_INSURERS)}")
+    old_time, old_results = measure(parse_dms_fields_sequential, corpus)
+    new_time, new_results = measure(parse_dms_fields, corpus)
+    print(f"последовательный перебор: {old_time * 1e6:.1f} мкс на вызов")
+    print(f"   скомпилированный: {new_time * 1e6:.1f} мкс на вызов (x{old_time / new_time:.1f})")
+    mismatches = [i for i, (a, b) in enumerate(zip(old_results, new_results)) if a != b]
+    print(f"расхождений: {len(mismatches)}")
+    start = time.perf_counter()
+    parse_dms_fields(PATHOLOGICAL)
+    print(f"строка заглавными с ОПФ (старая реализация зависает): {(time.perf_counter() - start) * 1e6:.1f} мкс")
+    for i in mismatches[:5]:
+        print(f"--- {corpus[i]!r}\n    было: {old_results[i]}\n    стало: {new_results[i]}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
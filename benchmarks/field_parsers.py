@@ -0,0 +1,252 @@
+"""
+Бенчмарк разбора ответов GPT «Ключ: значение»: цепочки if/elif с поиском подстрок
+(старые parse_*_fields, скопированы ниже) против таблиц полей utils.parsers с
+поиском ключа в словаре.
+
+Корпус — синтетические ответы в формате промптов паспорта, миграционной карты,
+патента и трудового договора; часть ключей написана иначе, чем в промпте
+(регистр, лишние слова, разметка), и разбирается нечетким поиском. Выводится
+пропускная способность (строк в секунду) и ответы, на которых результаты
+различаются.
+
+Запуск из корня репозитория:
+    python -m benchmarks.field_parsers [размер_корпуса]
+"""
+
+import random
+import re
+import sys
+import time
+
+from utils.parsers import (
+    is_missing, normalize_authority, normalize_birth_place, normalize_nationality, normalize_sex,
+    parse_contract_fields, parse_migration_fields, parse_passport_fields, parse_patent_fields
+)
+
+# {документ: [(варианты ключа, варианты значения)]}; первый вариант ключа — как в промпте
+RESPONSES = {
+    "passport": [
+        (["ФИО"], ["ИВАНОВ ИВАН", "Каримов Алишер Бахтиёрович"]),
+        (["ФИО (латиницей)"], ["IVANOV IVAN", "KARIMOV ALISHER"]),
+        (["Дата рождения", "Дата рождения владельца"], ["01.02.1990", "Не найдено"]),
+        (["Место рождения", "Место рождения (город)"], ["FERGANA", "г. Душанбе"]),
+        (["Пол"], ["M", "Ж", "МУЖ"]),
+        (["Серия", "Серия паспорта"], ["FA", "AB", "Не найдено"]),
+        (["Номер", "Номер паспорта"], ["1234567", "Не найдено"]),
+        (["Номер (таджикский)"], ["400123456", "Не найдено"]),
+        (["Дата выдачи", "Дата выдачи паспорта"], ["10.10.2015"]),
+        (["Срок действия", "Действителен до"], ["10.10.2025"]),
+        (["Кем выдан", "Authority"], ["МВД 12345", "МВД Узбекистана"]),
+        (["Страна", "Гражданство"], ["UZBEKISTAN", "Таджикистан", "KGZ"]),
+    ],
+    "migration": [
+        (["Серия карты", "Серия карты (4 цифры)"], ["4619"]),
+        (["Номер карты"], ["1234567"]),
+        (["Дата выдачи", "Дата выдачи карты"], ["01.03.2024"]),
+        (["Цель визита"], ["РАБОТА", "Не найдено"]),
+    ],
+    "patent": [
+        (["Серия патента"], ["77", "50"]),
+        (["Номер патента"], ["2400123456"]),
+        (["Дата выдачи", "Дата выдачи патента"], ["05.04.2024"]),
+        (["Кем выдан"], ["ГУ МВД России по г. Москве"]),
+        (["ФИО", "ФИО владельца"], ["КАРИМОВ АЛИШЕР"]),
+        (["Серия и номер бланка", "Серия и номер бланка патента"], ["ПР4744675"]),
+        (["ИНН"], ["771234567890"]),
+    ],
+    "contract": [
+        (["Номер договора", "Номер договора (трудового)"], ["15/24", "Не найдено"]),
+        (["Дата договора"], ["01.04.2024"]),
+        (["Должность"], ["Подсобный рабочий", "Курьер"]),
+        (["Телефон", "Контактный телефон"], ["+7 900 000-00-00"]),
+        (["Место работы"], ["г. Москва, ул. Ленина, д. 1"]),
+    ],
+}
+NOISE = ["Текст документа разобран.", "Примечание: поле могло быть распознано неточно", ""]
+
+
+def synthetic_response(rng, doc):
+    lines = []
+    for keys, values in RESPONSES[doc]:
+        if rng.random() < 0.1:
+            continue
+        key = keys[0] if rng.random() < 0.8 else rng.choice(keys)
+        lines.append(f"{key}: {rng.choice(values)}")
+    if rng.random() < 0.3:
+        lines.insert(rng.randint(0, len(lines)), rng.choice(NOISE))
+    return "\n".join(lines)
+
+
+def migration_if_chain(text: str):
+    res = {}
+    for line in text.splitlines():
+        if ":" not in line:
+            continue
+        key, val = line.split(":", 1)
+        key, val = key.strip(), val.strip()
+        if "Серия карты" in key:
+            res["migration_card_series"] = val
+        elif "Номер карты" in key:
+            res["migration_card_number"] = val
+        elif "Дата выдачи" in key:
+            res["migration_card_date"] = val
+        elif "Цель визита" in key:
+            res["migration_card_purpose"] = val
+    return res
+
+
+
+def patent_if_chain(text: str):
+    # Упрощённая (исходная) версия: парсим только строки формата 'Ключ: Значение'.
+    # Это возвращает стабильность: меньше ложных срабатываний и не ломает корректные GPT-ответы.
+    res = {}
+    for line in text.splitlines():
+        if ":" not in line:
+            continue
+        key, val = line.split(":", 1)
+        key, val = key.strip(), val.strip()
+        if "Серия патента" in key:
+            res["patent_series"] = val
+        elif "Номер патента" in key:
+            res["patent_number"] = val
+        elif "Дата выдачи" in key:
+            res["patent_date"] = val
+        elif "Кем выдан" in key:
+            res["patent_issuer"] = val
+        elif "ФИО" in key and "латиницей" not in key:
+            res["fio"] = val
+        elif "Серия и номер бланка" in key:
+            res["patent_blank"] = val
+        elif "ИНН" in key:
+            res["inn"] = val
+    return res
+
+
+
+def passport_if_chain(text: str):
+    res = {}
+    # Флаг таджикского паспорта (по ключевой фразе или по наличию спец-поля)
+    t = text.lower()
+    is_tajik = ("таджик" in t) or ("номер (таджик" in t)
+
+    for line in text.splitlines():
+        if ":" not in line:
+            continue
+        key, val = line.split(":", 1)
+        key, val = key.strip(), val.strip()
+        kl = key.lower()
+
+        if key == "ФИО":
+            res["fio"] = val.upper()
+        elif "дата рождения" in kl:
+            res["birthdate"] = val
+        elif "место рождения" in kl:
+            res["birth_place"] = normalize_birth_place(val)
+        elif "пол" in kl:
+            res["sex"] = normalize_sex(val)
+        # Серия: не пишем для таджикского паспорта
+        elif (key == "Серия" or ("серия" in kl and "паспорт" in kl)) and not is_tajik:
+            if not is_missing(val) and val.strip().lower() not in {"нет"}:
+                res["passport_series"] = val.upper()
+        # Номер (таджикский): приоритетно пишем в passport_number
+        elif "номер (таджик" in kl:
+            if not is_missing(val):
+                res["passport_number"] = val.upper()
+        # Универсальный номер
+        elif ("номер" in kl and "паспорт" in kl) or key == "Номер":
+            if not is_missing(val):
+                res["passport_number"] = val.upper()
+        elif "дата" in kl and ("выдач" in kl or "passport" in kl):
+            res["issue_date"] = val
+        elif "срок действия" in kl or "действителен до" in kl:
+            res["expiry_date"] = val
+        elif "кем выдан" in kl or "authority" in kl:
+            res["authority"] = normalize_authority(val)
+        elif "страна" in kl or "гражданство" in kl:
+            res["nationality"] = normalize_nationality(val)
+        elif "мрз" in kl or "mrz" in kl:
+            res["mrz"] = val.upper()
+
+    # Если это таджикский паспорт — серия должна быть пустой
+    if is_tajik:
+        res.pop("passport_series", None)
+
+    return res
+
+
+
+def contract_if_chain(text: str):
+    res = {}
+    lines = text.splitlines()
+    
+    # Ищем в тексте стандартные поля с двоеточием
+    for line in lines:
+        if ":" not in line:
+            continue
+        key, val = line.split(":", 1)
+        key, val = key.strip(), val.strip()
+        if "Номер договора" in key:
+            res['contract_number'] = val
+        elif "Дата договора" in key:
+            res['contract_date'] = val
+        elif "Должность" in key:
+            res['position'] = val
+        elif "Место работы" in key:
+            res['work_address'] = val
+        elif "Телефон" in key or "телефон" in key:
+            res['phone'] = val
+    
+    # Ищем пункт 9 о месте работы, если он не был найден
+    if 'work_address' not in res:
+        for i, line in enumerate(lines):
+            # Пытаемся найти "9." или "9)" или "Пункт 9" и т.п.
+            if re.search(r'(?:^|\s)9[\.\)]|пункт\s*9', line.lower()):
+                # Если нашли пункт 9, берем его содержимое и несколько следующих строк
+                work_address = line.split(":", 1)[1].strip() if ":" in line else ""
+                # Если в этой строке нет содержимого, смотрим следующие строки
+                if not work_address and i+1 < len(lines):
+                    # Собираем адрес из следующих строк, пока не дойдем к новому пункту
+                    j = i + 1
+                    while j < len(lines) and not re.search(r'(?:^|\s)10[\.\)]|пункт\s*10', lines[j].lower()):
+                        work_address += " " + lines[j].strip()
+                        j += 1
+                res['work_address'] = work_address.strip()
+                break
+    
+    return res
+
+
+PARSERS = {
+    "passport": (passport_if_chain, parse_passport_fields),
+    "migration": (migration_if_chain, parse_migration_fields),
+    "patent": (patent_if_chain, parse_patent_fields),
+    "contract": (contract_if_chain, parse_contract_fields),
+}
+
+
+def measure(func, corpus, repeats=5):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = [func(text) for text in corpus]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def main(size):
+    rng = random.Random(42)
+    for doc, (old, new) in PARSERS.items():
+        corpus = [synthetic_response(rng, doc) for _ in range(size)]
+        lines = sum(text.count("\n") + 1 for text in corpus)
+        old_time, old_results = measure(old, corpus)
+        new_time, new_results = measure(new, corpus)
+        mismatches = [i for i, (a, b) in enumerate(zip(old_results, new_results)) if a != b]
+        print(f"{doc:>10}: if/elif {lines / old_time:,.0f} строк/с, таблица {lines / new_time:,.0f} строк/с "
+              f"(x{old_time / new_time:.1f}), расхождений {len(mismatches)}")
+        for i in mismatches[:3]:
+            print(f"    {corpus[i]!r}\n    было: {old_results[i]}\n    стало: {new_results[i]}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,106 @@
+"""
+Бенчмарк извлечения полей: отдельный запрос GPT на каждый документ (как было)
+против одного совмещенного запроса с разделами и JSON-ответом (GPT_COMBINED).
+
+Документы сотрудника берутся из каталога образцов (тип определяется по имени
+файла, как в боте) и проходят через utils.pipeline.run_document_pipeline в обоих
+режимах. OCR выполняется заранее и берется из кэша, поэтому сравнивается только
+этап GPT: время, число запросов, токены промпта и ответа, а также совпадение
+полей между режимами. Нужны ключи OpenAI и Vision; кэш GPT отключается.
+
+Запуск из корня репозитория:
+    python -m benchmarks.gpt_combined путь/к/образцам [повторов]
+"""
+
+import asyncio
+import logging
+import mimetypes
+import os
+import sys
+import time
+
+os.environ["GPT_CACHE_ENABLED"] = "0"
+
+from utils.gpt import GPT_USAGE  # noqa: E402
+from utils.http import close_http_session  # noqa: E402
+from utils.ocr import ocr_document  # noqa: E402
+from utils.parsers import (  # noqa: E402
+    parse_passport_fields, parse_migration_fields, parse_patent_fields,
+    parse_dms_fields, parse_contract_fields
+)
+from utils.pipeline import classify_documents, run_document_pipeline  # noqa: E402
+from utils.prompts import (  # noqa: E402
+    PROMPT_PASSPORT, PROMPT_MIGRATION, PROMPT_PATENT,
+    PROMPT_DMS, PROMPT_CONTRACT
+)
+
+PROCESSING_MAP = {
+    'паспорт': ('passport', PROMPT_PASSPORT, parse_passport_fields, []),
+    'патент': ('patent', PROMPT_PATENT, parse_patent_fields, []),
+    'дмс': ('dms', PROMPT_DMS, parse_dms_fields, []),
+    'договор': ('contract', PROMPT_CONTRACT, parse_contract_fields, []),
+    'миграцион': ('migration', PROMPT_MIGRATION, parse_migration_fields, []),
+}
+
+
+def load_documents(sample_dir):
+    documents = []
+    for name in sorted(os.listdir(sample_dir)):
+        path = os.path.join(sample_dir, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                documents.append({'bytes': f.read(), 'name': name,
+                                  'mime': mimetypes.guess_type(name)[0] or 'image/jpeg'})
+    return documents
+
+
+async def measure(documents, classified, combined):
+    before = dict(GPT_USAGE)
+    start = time.perf_counter()
+    results = await run_document_pipeline(documents, PROCESSING_MAP, classified, combined=combined)
+    elapsed = time.perf_counter() - start
+    usage = {key: GPT_USAGE[key] - before[key] for key in GPT_USAGE}
+    return elapsed, usage, results
+
+
+async def main(sample_dir, repeats):
+    logging.disable(logging.INFO)
+    documents = load_documents(sample_dir)
+    classified = classify_documents(documents, PROCESSING_MAP)
+    for keyword, candidates in classified.items():
+        for i in candidates:
+            await ocr_document(documents[i]['bytes'], documents[i]['mime'],
+                               doc_type=PROCESSING_MAP[keyword][0], name=documents[i]['name'])
+    print(f"документов: {sum(len(c) for c in classified.values())}, типов: {sum(1 for c in classified.values() if c)}")
+
+    results = {}
+    for combined, title in ((False, "отдельные запросы"), (True, "совмещенный запрос")):
+        timings = []
+        for _ in range(repeats):
+            elapsed, usage, results[combined] = await measure(documents, classified, combined)
+            timings.append(elapsed)
+        timings.sort()
+        print(f"{title:>20}: медиана {timings[len(timings) // 2] * 1000:.0f} мс, запросов {usage['requests']}, "
+              f"токены {usage['prompt_tokens']} + {usage['completion_tokens']} (за прогон)")
+
+    matched = compared = 0
+    for keyword, separate in results[False].items():
+        if not separate:
+            continue
+        combined = results[True].get(keyword) or {}
+        keys = [k for k, v in separate.items() if v]
+        same = sum(1 for k in keys if combined.get(k) == separate[k])
+        matched += same
+        compared += len(keys)
+        diff = {k: (separate[k], combined.get(k)) for k in keys if combined.get(k) != separate[k]}
+        print(f"{keyword}: совпало полей {same}/{len(keys)} {diff if diff else ''}")
+    if compared:
+        print(f"совпадение полей: {matched}/{compared} ({matched / compared:.0%})")
+    await close_http_session()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 3))
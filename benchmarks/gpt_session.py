@@ -0,0 +1,68 @@
+"""
+Бенчмарк: задержка вызова GPT с новой aiohttp-сессией на каждый запрос (как было)
+и с общей сессией из utils.http (как стало). Запросы идут на локальный mock-сервер.
+
+Запуск из корня репозитория:
+    python -m benchmarks.gpt_session [число_запросов]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from aiohttp import web
+
+HOST, PORT = "127.0.0.1", 8765
+os.environ["OPENAI_BASE_URL"] = f"http://{HOST}:{PORT}/v1"
+os.environ["GPT_CACHE_ENABLED"] = "0"
+
+import aiohttp  # noqa: E402
+from utils.gpt import extract_doc_fields_with_gpt  # noqa: E402
+from utils.http import close_http_session  # noqa: E402
+
+
+async def mock_completion(request):
+    await request.json()
+    await asyncio.sleep(0.005)
+    return web.json_response({"choices": [{"message": {"content": "ФИО: ИВАНОВ ИВАН"}}]})
+
+
+async def call_with_new_session(raw_text, prompt):
+    """Старое поведение: отдельная ClientSession на каждый вызов."""
+    data = {"model": "gpt-4o", "messages": [{"role": "user", "content": prompt + raw_text}]}
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{os.environ['OPENAI_BASE_URL']}/chat/completions", json=data) as resp:
+            res = await resp.json()
+            return res["choices"][0]["message"]["content"].strip()
+
+
+async def measure(func, n):
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await func("Текст документа", "Промпт:\n")
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+async def main(n):
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", mock_completion)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    try:
+        for name, func in (("новая сессия на запрос", call_with_new_session),
+                           ("общая сессия", extract_doc_fields_with_gpt)):
+            p50, p95 = await measure(func, n)
+            print(f"{name:>24}: p50 = {p50:.2f} мс, p95 = {p95:.2f} мс")
+    finally:
+        await close_http_session()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
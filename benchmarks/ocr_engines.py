@@ -0,0 +1,121 @@
+"""
+Бенчмарк движков OCR (utils.ocr_engines) на локальных образцах сканов.
+
+Для каждого движка выводятся время загрузки модели (для локальных движков —
+запуск пула процессов), время распознавания каждого файла и пропускная
+способность в страницах в секунду. Изображения готовятся один раз, как в боте
+(utils.ocr.iter_pdf_pages / prepare_photo), и время подготовки не учитывается.
+
+С флагом --fields текст каждого движка проходит через GPT и существующие
+парсеры, и считается доля совпавших полей. Эталон — файл expected.json в
+каталоге образцов ({"имя файла": {"поле": "значение"}}), а если его нет —
+результат первого движка в списке (нужен ключ OpenAI, для vision — ключ Vision).
+
+Тип документа определяется по имени файла, как в боте.
+
+Запуск из корня репозитория:
+    python -m benchmarks.ocr_engines путь/к/образцам [vision tesseract paddle easyocr] [--fields]
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from benchmarks.ocr_payload import DOC_TYPES, adaptive_payload, doc_type
+from utils.gpt import extract_doc_fields_with_gpt
+from utils.http import close_http_session
+from utils.ocr import GCV_BATCH_SIZE, GCV_CLIENT, engine_ocr_batch
+from utils.ocr_engines import LOCAL_ENGINES, is_local_engine, start_local_ocr, shutdown_local_ocr
+
+
+def recognize(engine, payload):
+    texts = []
+    for start in range(0, len(payload), GCV_BATCH_SIZE):
+        batch = payload[start:start + GCV_BATCH_SIZE]
+        texts.extend(engine_ocr_batch(engine, batch, list(range(start + 1, start + len(batch) + 1))))
+    return "\n\n".join(text for text in texts if text).strip()
+
+
+async def start_engine(engine):
+    """Готовит движок; возвращает время загрузки (сек.) или None, если движок недоступен."""
+    if engine == 'vision':
+        return 0.0 if GCV_CLIENT else None
+    if not is_local_engine(engine):
+        return None
+    start = time.perf_counter()
+    started = await start_local_ocr([engine])
+    return time.perf_counter() - start if started else None
+
+
+async def main(sample_dir, engines, with_fields):
+    logging.disable(logging.INFO)
+    samples = []
+    for name in sorted(os.listdir(sample_dir)):
+        path = os.path.join(sample_dir, name)
+        if not os.path.isfile(path) or name == "expected.json":
+            continue
+        with open(path, "rb") as f:
+            file_bytes = f.read()
+        samples.append((name, adaptive_payload(file_bytes, name.lower().endswith(".pdf"))))
+
+    expected_path = os.path.join(sample_dir, "expected.json")
+    expected = None
+    if os.path.exists(expected_path):
+        with open(expected_path, encoding="utf-8") as f:
+            expected = json.load(f)
+
+    fields = {}
+    summary = []
+    for engine in engines:
+        load_time = await start_engine(engine)
+        if load_time is None:
+            print(f"{engine}: движок недоступен, пропускаем")
+            continue
+        print(f"{engine}: загрузка {load_time:.1f} с")
+        pages = 0
+        elapsed = 0.0
+        matched = compared = 0
+        for name, payload in samples:
+            start = time.perf_counter()
+            raw_text = await asyncio.to_thread(recognize, engine, payload)
+            file_time = time.perf_counter() - start
+            pages += len(payload)
+            elapsed += file_time
+            line = f"  {name}: {len(payload)} стр., {file_time:.2f} с, {len(raw_text)} символов"
+
+            keyword = doc_type(name)
+            if with_fields and keyword:
+                prompt, parser = DOC_TYPES[keyword]
+                result = parser(await extract_doc_fields_with_gpt(raw_text, prompt, use_cache=False))
+                fields[(engine, name)] = result
+                reference = expected.get(name) if expected is not None else fields.get((engines[0], name))
+                if reference:
+                    keys = [k for k, v in reference.items() if v]
+                    same = sum(1 for k in keys if result.get(k) == reference[k])
+                    matched += same
+                    compared += len(keys)
+                    line += f", поля {same}/{len(keys)}"
+            print(line)
+        if is_local_engine(engine):
+            shutdown_local_ocr()
+        summary.append((engine, load_time, pages, elapsed, matched, compared))
+
+    print()
+    for engine, load_time, pages, elapsed, matched, compared in summary:
+        line = f"{engine}: {pages} стр. за {elapsed:.1f} с ({pages / elapsed if elapsed else 0:.2f} стр./с), загрузка {load_time:.1f} с"
+        if compared:
+            line += f", совпадение полей {matched}/{compared} ({matched / compared:.0%})"
+        print(line)
+    await close_http_session()
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    engines = args[1:] or ['vision'] + list(LOCAL_ENGINES)
+    asyncio.run(main(args[0], engines, "--fields" in sys.argv[1:]))
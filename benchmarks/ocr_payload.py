@@ -0,0 +1,129 @@
+"""
+Бенчмарк подготовки изображений для OCR на локальных образцах сканов:
+PNG 300 DPI для каждой страницы (как было) против адаптивного DPI, лимита
+пикселей и JPEG/WebP из utils.ocr_image (как стало).
+
+Для каждого файла выводятся объем отправляемых в Vision данных и время
+подготовки. С флагом --ocr оба варианта дополнительно распознаются в Vision,
+поля извлекаются через GPT и существующие парсеры, и считается доля полей,
+совпавших с результатом исходного варианта (нужны ключи Vision и OpenAI).
+
+Тип документа определяется по имени файла, как в боте (паспорт, патент,
+миграцион..., дмс/страхов..., договор/тд...).
+
+Запуск из корня репозитория:
+    python -m benchmarks.ocr_payload путь/к/образцам [--ocr]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from io import BytesIO
+
+from pdf2image import convert_from_bytes
+
+os.environ["GPT_CACHE_ENABLED"] = "0"
+
+from utils.gpt import extract_doc_fields_with_gpt  # noqa: E402
+from utils.http import close_http_session  # noqa: E402
+from utils.ocr import iter_pdf_pages, gcv_ocr, gcv_ocr_multiple  # noqa: E402
+from utils.ocr_image import prepare_photo  # noqa: E402
+from utils.parsers import (  # noqa: E402
+    parse_passport_fields, parse_migration_fields, parse_patent_fields,
+    parse_dms_fields, parse_contract_fields
+)
+from utils.pipeline import EXTRA_KEYWORDS  # noqa: E402
+from utils.prompts import (  # noqa: E402
+    PROMPT_PASSPORT, PROMPT_MIGRATION, PROMPT_PATENT,
+    PROMPT_DMS, PROMPT_CONTRACT
+)
+
+DOC_TYPES = {
+    'паспорт': (PROMPT_PASSPORT, parse_passport_fields),
+    'патент': (PROMPT_PATENT, parse_patent_fields),
+    'миграцион': (PROMPT_MIGRATION, parse_migration_fields),
+    'дмс': (PROMPT_DMS, parse_dms_fields),
+    'договор': (PROMPT_CONTRACT, parse_contract_fields),
+}
+
+
+def baseline_payload(file_bytes, is_pdf):
+    """Старое поведение: все страницы PDF в PNG 300 DPI, фото — как есть."""
+    if not is_pdf:
+        return [file_bytes]
+    pages = []
+    for img in convert_from_bytes(file_bytes, dpi=300):
+        buf = BytesIO()
+        img.save(buf, format="PNG")
+        pages.append(buf.getvalue())
+    return pages
+
+
+def adaptive_payload(file_bytes, is_pdf):
+    if not is_pdf:
+        return [prepare_photo(file_bytes)]
+    return [img for _, img in iter_pdf_pages(file_bytes)]
+
+
+def doc_type(name):
+    name = name.lower()
+    for keyword in DOC_TYPES:
+        if any(kw in name for kw in [keyword] + EXTRA_KEYWORDS.get(keyword, [])):
+            return keyword
+    return None
+
+
+async def extract_fields(payload, is_pdf, keyword):
+    raw_text = gcv_ocr_multiple(payload) if is_pdf else gcv_ocr(payload[0])
+    prompt, parser = DOC_TYPES[keyword]
+    return parser(await extract_doc_fields_with_gpt(raw_text, prompt, use_cache=False))
+
+
+async def main(sample_dir, with_ocr):
+    logging.disable(logging.INFO)
+    totals = {"base": [0, 0.0], "new": [0, 0.0]}
+    matched = compared = 0
+    for name in sorted(os.listdir(sample_dir)):
+        path = os.path.join(sample_dir, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            file_bytes = f.read()
+        is_pdf = name.lower().endswith(".pdf")
+
+        payloads = {}
+        for variant, prepare in (("base", baseline_payload), ("new", adaptive_payload)):
+            start = time.perf_counter()
+            payloads[variant] = prepare(file_bytes, is_pdf)
+            elapsed = time.perf_counter() - start
+            size = sum(len(p) for p in payloads[variant])
+            totals[variant][0] += size
+            totals[variant][1] += elapsed
+            print(f"{name} [{variant}]: {len(payloads[variant])} стр., {size / 1024:.0f} КБ, {elapsed * 1000:.0f} мс")
+
+        keyword = doc_type(name)
+        if with_ocr and keyword:
+            base_fields = await extract_fields(payloads["base"], is_pdf, keyword)
+            new_fields = await extract_fields(payloads["new"], is_pdf, keyword)
+            keys = [k for k, v in base_fields.items() if v]
+            same = sum(1 for k in keys if new_fields.get(k) == base_fields[k])
+            matched += same
+            compared += len(keys)
+            diff = {k: (base_fields[k], new_fields.get(k)) for k in keys if new_fields.get(k) != base_fields[k]}
+            print(f"{name}: совпало полей {same}/{len(keys)} {diff if diff else ''}")
+
+    for variant, title in (("base", "PNG 300 DPI"), ("new", "адаптивно")):
+        size, elapsed = totals[variant]
+        print(f"итого {title}: {size / 1024:.0f} КБ, {elapsed * 1000:.0f} мс")
+    if compared:
+        print(f"совпадение полей с исходным вариантом: {matched}/{compared} ({matched / compared:.0%})")
+    await close_http_session()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(main(sys.argv[1], "--ocr" in sys.argv[2:]))
@@ -0,0 +1,143 @@
+"""
+Бенчмарк: отрисовка клеток уведомления МВД посимвольно (setFont/stringWidth/
+drawString и rect на каждую клетку, как было) и пакетно (один контур на строку
+клеток и один текстовый объект на поле, как стало).
+
+Для каждой страницы выводится время отрисовки и размер несжатого потока
+содержимого страницы. Затем проверяется, что страницы выглядят одинаково:
+посимвольная и пакетная отрисовка, а также пакетная в один проход и двумя
+слоями (каркас + данные) растеризуются MuPDF без сглаживания и сравниваются
+попиксельно. При расхождении бенчмарк завершается с ошибкой.
+
+Запуск из корня репозитория:
+    python -m benchmarks.pdf_cells [число_итераций]
+"""
+
+import io
+import logging
+import sys
+import tempfile
+import time
+
+from pypdf import PdfReader
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from benchmarks.pdf_fonts import SAMPLE_DATA
+from utils import fonts, pdf_layers
+from utils import mvd_notification_pdf as mvd
+
+PAGES = [mvd.create_page_1, mvd.create_page_2, mvd.create_page_3, mvd.create_page_4, mvd.create_page_5]
+
+
+def draw_char_cells_per_char(c, x, y, text, num_cells, cell_width=mvd.CELL_WIDTH,
+                             cell_height=mvd.CELL_HEIGHT, font_size=mvd.FONT_SIZE):
+    """Старая реализация draw_char_cells: отдельные rect, setFont и drawString на каждую клетку."""
+    clean_text = str(text).strip().upper() if text else ""
+    display_font_size = font_size + 1
+    for i in range(num_cells):
+        cell_x = x + i * cell_width
+        c.setLineWidth(0.8)
+        c.rect(cell_x, y, cell_width, cell_height)
+        if i < len(clean_text):
+            char = clean_text[i]
+            c.setFont("CyrillicFont", display_font_size)
+            char_width = c.stringWidth(char, "CyrillicFont", display_font_size)
+            char_x = cell_x + (cell_width - char_width) / 2
+            char_y = y + (cell_height - display_font_size) / 2 + 1
+            c.setFillColor(colors.black)
+            c.drawString(char_x, char_y, char)
+    c.setLineWidth(0.5)
+
+
+def measure(n):
+    """Время на страницу (мс) и размеры потоков содержимого страниц (байт)."""
+    data = mvd.prepare_data_for_pdf(SAMPLE_DATA)
+    timings = [0.0] * len(PAGES)
+    for _ in range(n):
+        c = canvas.Canvas(io.BytesIO(), pagesize=A4)
+        for page_no, create_page in enumerate(PAGES):
+            start = time.perf_counter()
+            create_page(c, data)
+            c.showPage()
+            timings[page_no] += time.perf_counter() - start
+
+    output = io.BytesIO()
+    c = canvas.Canvas(output, pagesize=A4)
+    mvd.draw_notification_pages(c, data)
+    c.save()
+    sizes = [len(page.get_contents().get_data()) for page in PdfReader(output).pages]
+    return [t / n * 1000 for t in timings], sizes
+
+
+def render(data):
+    """PDF уведомления, нарисованного в один проход текущей draw_char_cells."""
+    output = io.BytesIO()
+    c = canvas.Canvas(output, pagesize=A4)
+    mvd.draw_notification_pages(c, mvd.prepare_data_for_pdf(data))
+    c.save()
+    return output.getvalue()
+
+
+def render_layered(data):
+    """PDF уведомления из каркаса и слоя данных (каркас рисуется заново во временном каталоге)."""
+    pdf_layers.PDF_SKELETON_DIR = tempfile.mkdtemp()
+    pdf_layers._SKELETONS.clear()
+    output = io.BytesIO()
+    mvd.render_notification_pdf(data, output)
+    return output.getvalue()
+
+
+def differing_pages(pdf_a, pdf_b, dpi=100):
+    """Номера страниц (с 1), которые MuPDF без сглаживания растеризует по-разному."""
+    import pymupdf
+    pymupdf.TOOLS.set_aa_level(0)
+    pages_a = pymupdf.open(stream=pdf_a, filetype="pdf")
+    pages_b = pymupdf.open(stream=pdf_b, filetype="pdf")
+    if len(pages_a) != len(pages_b):
+        return list(range(1, max(len(pages_a), len(pages_b)) + 1))
+    return [page_no for page_no, (a, b) in enumerate(zip(pages_a, pages_b), start=1)
+            if a.get_pixmap(dpi=dpi).samples != b.get_pixmap(dpi=dpi).samples]
+
+
+def main(n):
+    logging.disable(logging.INFO)
+    fonts.warm_up_fonts()
+
+    batched = mvd.draw_char_cells
+    mvd.draw_char_cells = draw_char_cells_per_char
+    before_times, before_sizes = measure(n)
+
+    per_char_pdf = render(SAMPLE_DATA)
+
+    mvd.draw_char_cells = batched
+    after_times, after_sizes = measure(n)
+
+    print("стр.   посимвольно            пакетно")
+    for page_no in range(len(PAGES)):
+        print(f"{page_no + 1:>4}   {before_times[page_no]:5.1f} мс {before_sizes[page_no]:>7} Б"
+              f"   {after_times[page_no]:5.1f} мс {after_sizes[page_no]:>7} Б")
+    print(f"всего  {sum(before_times):5.1f} мс {sum(before_sizes):>7} Б"
+          f"   {sum(after_times):5.1f} мс {sum(after_sizes):>7} Б")
+
+    try:
+        import pymupdf  # noqa: F401
+    except ImportError:
+        print("pymupdf не установлен — сравнение страниц пропущено")
+        return
+    batched_pdf = render(SAMPLE_DATA)
+    failed = False
+    for title, pdf_a, pdf_b in [
+        ("посимвольно / пакетно", per_char_pdf, batched_pdf),
+        ("в один проход / двумя слоями", batched_pdf, render_layered(SAMPLE_DATA)),
+    ]:
+        pages = differing_pages(pdf_a, pdf_b)
+        print(f"{title}: {'страницы совпадают' if not pages else f'различаются страницы {pages}'}")
+        failed = failed or bool(pages)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,76 @@
+"""
+Бенчмарк: время генерации уведомления МВД (utils.mvd_notification_pdf)
+с повторной регистрацией шрифтов на каждой странице (как было) и с общим
+реестром utils.fonts (как стало).
+
+Запуск из корня репозитория:
+    python -m benchmarks.pdf_fonts [число_итераций]
+"""
+
+import io
+import logging
+import sys
+import time
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from utils import fonts
+from utils import mvd_notification_pdf
+
+SAMPLE_DATA = {
+    "lastname": "ИВАНОВ",
+    "firstname": "ИВАН",
+    "middlename": "ИВАНОВИЧ",
+    "citizenship": "УЗБЕКИСТАН",
+    "birthdate": "01.01.1990",
+    "passport_number": "FA1234567",
+    "issue_date": "01.01.2020",
+    "passport_issued_by": "МВД 12345",
+    "patent_number": "772500015683",
+    "patent_date": "01.01.2024",
+    "position": "ПОДСОБНЫЙ РАБОЧИЙ",
+    "contract_date": "20.01.2024",
+    "city": "ДМИТРОВ",
+    "inn": "7733450363",
+    "dms_number": "0004315689",
+    "insurance_date": "15.01.2024",
+}
+
+
+def register_fonts_every_time():
+    """Старое поведение register_fonts(): поиск файла и разбор TTF при каждом вызове."""
+    for font_path in fonts.get_font_paths():
+        try:
+            pdfmetrics.registerFont(TTFont("FormFont", font_path))
+            pdfmetrics.registerFont(TTFont("CyrillicFont", font_path))
+            return "FormFont"
+        except Exception:
+            continue
+    return "Helvetica"
+
+
+def measure(n):
+    start = time.perf_counter()
+    for _ in range(n):
+        mvd_notification_pdf.create_notification_pdf_by_template(SAMPLE_DATA, io.BytesIO())
+    return (time.perf_counter() - start) / n * 1000
+
+
+def main(n):
+    logging.disable(logging.INFO)
+    fonts.warm_up_fonts()
+
+    # Старое поведение: каждый create_page_N заново разбирает TTF-файлы
+    mvd_notification_pdf.register_fonts = register_fonts_every_time
+    before = measure(n)
+
+    mvd_notification_pdf.register_fonts = fonts.register_fonts
+    after = measure(n)
+
+    print(f"регистрация на каждой странице: {before:.1f} мс на документ")
+    print(f"           общий реестр шрифтов: {after:.1f} мс на документ")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,54 @@
+"""
+Бенчмарк: генерация уведомления МВД за один проход (каркас + данные на одном
+холсте, как было) и наложением слоя данных на закэшированный каркас (как стало).
+
+Запуск из корня репозитория:
+    python -m benchmarks.pdf_layers [число_итераций]
+"""
+
+import io
+import logging
+import sys
+import time
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from benchmarks.pdf_fonts import SAMPLE_DATA
+from utils import fonts
+from utils import mvd_notification_pdf
+
+
+def render_single_pass(output):
+    """Старое поведение: вся форма рисуется заново для каждого документа."""
+    c = canvas.Canvas(output, pagesize=A4)
+    mvd_notification_pdf.draw_notification_pages(c, mvd_notification_pdf.prepare_data_for_pdf(SAMPLE_DATA))
+    c.save()
+
+
+def render_layers(output):
+    mvd_notification_pdf.render_notification_pdf(SAMPLE_DATA, output)
+
+
+def measure(render, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        output = io.BytesIO()
+        render(output)
+    return (time.perf_counter() - start) / n * 1000, len(output.getvalue())
+
+
+def main(n):
+    logging.disable(logging.INFO)
+    fonts.warm_up_fonts()
+    mvd_notification_pdf.get_notification_skeleton()
+
+    before, before_size = measure(render_single_pass, n)
+    after, after_size = measure(render_layers, n)
+
+    print(f"     один проход: {before:.1f} мс на документ, {before_size} байт")
+    print(f"каркас + данные: {after:.1f} мс на документ, {after_size} байт")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -7,3 +7,74 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SERVICE_ACCOUNT_JSON = os.getenv("SERVICE_ACCOUNT_JSON")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+
+# Сколько документов одного сотрудника обрабатывается параллельно (OCR + GPT)
+DOCUMENT_CONCURRENCY = int(os.getenv("DOCUMENT_CONCURRENCY", "4"))
+
+# Сохранение состояния диалогов (SQLite), чтобы незавершенные заявки переживали
+# перезапуск: включение, путь и как часто передавать изменения в хранилище (сек.)
+PERSISTENCE_ENABLED = os.getenv("PERSISTENCE_ENABLED", "1").lower() not in ("0", "false", "no")
+PERSISTENCE_PATH = os.getenv("PERSISTENCE_PATH", "cache/bot_state.sqlite3")
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", "10"))
+
+# Хранилище загруженных документов на диске: каталог, сколько хранить файл после
+# последнего обращения и как часто удалять устаревшие (сек.)
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", "cache/documents")
+DOCUMENT_STORE_TTL = float(os.getenv("DOCUMENT_STORE_TTL", str(7 * 24 * 3600)))
+DOCUMENT_STORE_CLEANUP_INTERVAL = float(os.getenv("DOCUMENT_STORE_CLEANUP_INTERVAL", "3600"))
+# Сколько хранить задачи фоновой обработки документов пользователя, к которым
+# не обращались (сек.): брошенный диалог не держит их результаты в памяти
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", "3600"))
+
+# Google Vision: размер пула потоков, лимит одновременных запросов (сверх пула задачи ждут
+# свободный поток) и таймаут (сек.), который отсчитывается с начала работы потока над задачей
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "4"))
+OCR_MAX_IN_FLIGHT = int(os.getenv("OCR_MAX_IN_FLIGHT", "8"))
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "60"))
+
+# Движок OCR: vision (Google Cloud Vision) или локальный tesseract / paddle / easyocr;
+# резервный движок используется, если основной недоступен или вернул ошибку
+# (пусто — без резерва); число процессов пула локального OCR
+OCR_ENGINE = os.getenv("OCR_ENGINE", "vision").lower()
+OCR_FALLBACK_ENGINE = os.getenv("OCR_FALLBACK_ENGINE", "").lower()
+LOCAL_OCR_WORKERS = int(os.getenv("LOCAL_OCR_WORKERS", "2"))
+
+# Кэш результатов OCR (SQLite): путь, максимум записей и время жизни (сек.)
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "cache/ocr_cache.sqlite3")
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "5000"))
+OCR_CACHE_TTL = float(os.getenv("OCR_CACHE_TTL", str(30 * 24 * 3600)))
+
+# Подготовка изображений для OCR: DPI растеризации обычных страниц и страниц
+# с мелким плотным текстом, предел пикселей на изображение, формат и качество
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_DENSE_DPI = int(os.getenv("OCR_DENSE_DPI", "300"))
+OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", "9000000"))
+OCR_IMAGE_FORMAT = os.getenv("OCR_IMAGE_FORMAT", "JPEG").upper()
+OCR_IMAGE_QUALITY = int(os.getenv("OCR_IMAGE_QUALITY", "90"))
+# Предобработка фото документов перед OCR: границы, перспектива, наклон, контраст, обрезка
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "1").lower() not in ("0", "false", "no")
+
+# Кэш ответов GPT (SQLite): включение, путь, максимум записей и время жизни (сек.)
+GPT_CACHE_ENABLED = os.getenv("GPT_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+GPT_CACHE_PATH = os.getenv("GPT_CACHE_PATH", "cache/gpt_cache.sqlite3")
+GPT_CACHE_MAX_ENTRIES = int(os.getenv("GPT_CACHE_MAX_ENTRIES", "5000"))
+GPT_CACHE_TTL = float(os.getenv("GPT_CACHE_TTL", str(30 * 24 * 3600)))
+# Структурированный ответ GPT (JSON по схеме полей документа) вместо текста «Поле: значение»
+GPT_STRUCTURED = os.getenv("GPT_STRUCTURED", "1").lower() not in ("0", "false", "no")
+# Один запрос GPT с разделами на все документы сотрудника вместо запроса на каждый документ
+GPT_COMBINED = os.getenv("GPT_COMBINED", "0").lower() in ("1", "true", "yes")
+
+# OpenAI API и общий HTTP-клиент: лимит соединений, TTL DNS-кэша и keep-alive (сек.)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+HTTP_CONNECTION_LIMIT = int(os.getenv("HTTP_CONNECTION_LIMIT", "20"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+
+# Пул процессов для генерации PDF: число процессов, максимум задач в очереди
+# и сколько ждать свободного места в очереди (сек.)
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+PDF_RENDER_MAX_PENDING = int(os.getenv("PDF_RENDER_MAX_PENDING", "8"))
+PDF_RENDER_WAIT_TIMEOUT = float(os.getenv("PDF_RENDER_WAIT_TIMEOUT", "30"))
+
+# Каталог кэша статических каркасов PDF-форм (пересоздаются при изменении макета)
+PDF_SKELETON_DIR = os.getenv("PDF_SKELETON_DIR", "cache/pdf_skeletons")
@@ -1,6 +1,11 @@
 from telegram import Update
-from telegram.ext import ContextTypes
+from telegram.ext import ContextTypes, ConversationHandler
+from utils.pipeline import cancel_prefetch
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Фоновая обработка загруженных документов больше не нужна
+    cancel_prefetch(update.effective_user.id)
     await update.message.reply_text("❌ Отменено. Для начала введите /start")
-    return "END"
+    # Строка "END" не завершала диалог, а переводила его в несуществующее состояние
+    # (с персистентностью оно еще и сохранялось), поэтому /start после /cancel не срабатывал
+    return ConversationHandler.END
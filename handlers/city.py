@@ -2,6 +2,7 @@ from telegram import Update, ReplyKeyboardMarkup
 from telegram.ext import ContextTypes
 from keyboards import DONE_UPLOADING
 from states import UPLOAD_DOCUMENTS
+from utils.pipeline import cancel_prefetch
 
 async def select_city(update: Update, context: ContextTypes.DEFAULT_TYPE):
     city = update.message.text.strip()
@@ -27,4 +28,5 @@ async def select_city(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=ReplyKeyboardMarkup(DONE_UPLOADING, resize_keyboard=True)
     )
     context.user_data['documents'] = []
+    cancel_prefetch(update.effective_user.id)
     return UPLOAD_DOCUMENTS
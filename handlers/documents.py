@@ -1,16 +1,21 @@
+import asyncio
 import logging
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InputFile
 from telegram.ext import ContextTypes, ConversationHandler
 
 from keyboards import DONE_UPLOADING
 from states import UPLOAD_DOCUMENTS, MANUAL_INPUT
+from utils.document_store import conversation_memory, put_document
 from utils.fields import get_field_description
-from utils.gpt import extract_doc_fields_with_gpt
-from utils.ocr import convert_pdf_to_png, gcv_ocr, gcv_ocr_multiple
+from utils.ocr import ocr_document
 from utils.parsers import (
     parse_passport_fields, parse_migration_fields, parse_patent_fields,
     parse_dms_fields, parse_contract_fields
 )
+from utils.pipeline import (
+    classify_documents, run_document_pipeline, extract_passport_fields,
+    start_prefetch, get_prefetched, cancel_prefetch
+)
 from utils.prompts import (
     PROMPT_PASSPORT, PROMPT_MIGRATION, PROMPT_PATENT,
     PROMPT_DMS, PROMPT_CONTRACT
@@ -38,21 +43,21 @@ async def upload_documents(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         file_obj = await (message.document or message.photo[-1]).get_file()
         file_name = message.document.file_name if message.document else "photo.jpg"
+        mime_type = message.document.mime_type if message.document else "image/jpeg"
         
         await message.reply_text(f"📥 Загружаю и обрабатываю: {file_name}...")
         try:
             file_bytes = await file_obj.download_as_bytearray()
-            raw_text = gcv_ocr(bytes(file_bytes))
+            raw_text = await ocr_document(bytes(file_bytes), mime_type, doc_type='passport')
             if not raw_text:
                 await message.reply_text("❌ Не удалось распознать текст. Попробуйте другой файл.")
                 return UPLOAD_DOCUMENTS
 
-            gpt_response = await extract_doc_fields_with_gpt(raw_text, PROMPT_PASSPORT)
-            if "Ошибка" in gpt_response:
-                await message.reply_text(f"❌ Ошибка GPT: {gpt_response}")
+            fields = await extract_passport_fields(raw_text)
+            if not fields:
+                await message.reply_text("❌ Не удалось извлечь данные паспорта. Попробуйте другой файл.")
                 return UPLOAD_DOCUMENTS
 
-            fields = parse_passport_fields(gpt_response)
             word_bytes = create_passport_translation_doc(fields)
             
             await message.reply_document(
@@ -89,10 +94,17 @@ async def upload_documents(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await message.reply_text(f"📥 Загружаю: {file_name}...")
         try:
             file_bytes = await file_obj.download_as_bytearray()
-            user_data.setdefault('documents', []).append({
-                'bytes': bytes(file_bytes), 'name': file_name, 'mime': mime_type
-            })
+            # В user_data — только описание документа, содержимое хранится на диске
+            doc = await asyncio.to_thread(put_document, file_bytes, file_name, mime_type)
+            del file_bytes
+            user_data.setdefault('documents', []).append(doc)
             count = len(user_data['documents'])
+            # OCR и GPT начинаются сразу, пока пользователь загружает остальные документы
+            start_prefetch(update.effective_user.id, doc, build_processing_map(service_type))
+            memory = conversation_memory(user_data)
+            logger.info(f"Документ {file_name} сохранен ({doc['size']} байт); состояние диалога "
+                        f"{update.effective_user.id}: {memory['memory_bytes']} байт в памяти, "
+                        f"документов {memory['documents']} на {memory['stored_bytes']} байт на диске")
             await message.reply_text(
                 f"✅ Документ загружен! Всего: {count}\n"
                 "Продолжайте или нажмите '🏁 Завершить загрузку'.",
@@ -107,21 +119,8 @@ async def upload_documents(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return UPLOAD_DOCUMENTS
 
 
-async def process_documents(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """
-    Обрабатывает все загруженные документы, извлекает данные и запрашивает недостающие.
-    """
-    user_data = context.user_data
-    documents = user_data.get('documents', [])
-    service_type = user_data.get('service', '')
-
-    # Инициализация словарей для данных
-    user_data.update({
-        'passport_fields': {}, 'migration_fields': {}, 'patent_fields': {},
-        'dms_fields': {}, 'contract_fields': {}, 'manual_fields': {}, 'missing_fields': []
-    })
-
-    # Карта обработки: {ключевое_слово: (тип_документа, промпт, парсер, обязательные_поля)}
+def build_processing_map(service_type: str) -> dict:
+    """Карта обработки: {ключевое_слово: (тип_документа, промпт, парсер, обязательные_поля)}."""
     processing_map = {
         'паспорт': ('passport', PROMPT_PASSPORT, parse_passport_fields, ['fio', 'birthdate', 'passport_number']),
         'патент': ('patent', PROMPT_PATENT, parse_patent_fields, ['patent_number', 'patent_date', 'patent_blank']),
@@ -134,55 +133,64 @@ async def process_documents(update: Update, context: ContextTypes.DEFAULT_TYPE):
         processing_map['договор'] = ('contract', PROMPT_CONTRACT, parse_contract_fields, ['position', 'contract_date'])
     else: # Для других услуг
         processing_map['миграцион'] = ('migration', PROMPT_MIGRATION, parse_migration_fields, ['migration_card_number', 'migration_card_date'])
+    return processing_map
 
 
-    processed_docs_indices = set()
+async def process_documents(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обрабатывает все загруженные документы, извлекает данные и запрашивает недостающие.
+    """
+    user_data = context.user_data
+    documents = user_data.get('documents', [])
+    service_type = user_data.get('service', '')
+
+    # Инициализация словарей для данных
+    user_data.update({
+        'passport_fields': {}, 'migration_fields': {}, 'patent_fields': {},
+        'dms_fields': {}, 'contract_fields': {}, 'manual_fields': {}, 'missing_fields': []
+    })
 
+    processing_map = build_processing_map(service_type)
+
+    # Классифицируем все документы, затем обрабатываем их параллельно
+    classified = classify_documents(documents, processing_map)
+    total = sum(1 for candidates in classified.values() if candidates)
+    if total:
+        await update.message.reply_text(f"🔍 Обрабатываю документы ({total} шт.)...")
+
+    done = 0
+
+    async def report_progress(doc, ok):
+        nonlocal done
+        if ok:
+            done += 1
+            await update.message.reply_text(f"✅ Обработано: {doc['name']} ({done}/{total})")
+        else:
+            await update.message.reply_text(f"❌ Ошибка обработки документа: {doc['name']}. Попробую запросить данные вручную.")
+
+    # Документы, обработка которых началась при загрузке, не обрабатываются повторно
+    user_id = update.effective_user.id
+    try:
+        results = await run_document_pipeline(documents, processing_map, classified, report_progress,
+                                              prefetched=get_prefetched(user_id))
+    finally:
+        cancel_prefetch(user_id)
+
+    # Сводим результаты в порядке processing_map, чтобы порядок запросов был детерминированным
     for keyword, (doc_type, prompt, parser, req_fields) in processing_map.items():
-        processed_this_type = False
-        for i, doc in enumerate(documents):
-            if i in processed_docs_indices:
-                continue
-            
-            # Ищем по нескольким ключевым словам
-            search_keywords = [keyword]
-            if keyword == 'договор':
-                search_keywords.append('тд')
-            if keyword == 'дмс':
-                search_keywords.append('страхов')
-
-            if any(kw in doc['name'].lower() for kw in search_keywords):
-                await update.message.reply_text(f"🔍 Обрабатываю: {doc['name']}...")
-                try:
-                    if doc['mime'] == 'application/pdf':
-                        png_pages = convert_pdf_to_png(doc['bytes'])
-                        raw_text = gcv_ocr_multiple(png_pages) if png_pages else ""
-                    else:
-                        raw_text = gcv_ocr(doc['bytes'])
-
-                    if raw_text:
-                        fields_raw = await extract_doc_fields_with_gpt(raw_text, prompt)
-                        data = parser(fields_raw)
-                        user_data[f'{doc_type}_fields'] = data
-                        
-                        # Проверка обязательных полей
-                        for field in req_fields:
-                            if not data.get(field) or data.get(field) == 'Не найдено':
-                                user_data['missing_fields'].append((doc_type, field))
-                        
-                        processed_this_type = True
-                        processed_docs_indices.add(i)
-                        await update.message.reply_text(f"✅ Обработано: {doc['name']}")
-                        break # Переходим к следующему типу документа
-                except Exception as e:
-                    logger.error(f"Ошибка обработки '{doc['name']}': {e}", exc_info=True)
-                    await update.message.reply_text(f"❌ Ошибка обработки документа: {doc['name']}. Попробую запросить данные вручную.")
-        
-        if not processed_this_type:
+        data = results.get(keyword)
+        if data is None:
             await update.message.reply_text(f"⚠️ Не найден или не удалось обработать документ типа '{keyword.capitalize()}'. Запрошу данные вручную.")
             # Добавляем все обязательные поля этого типа как недостающие
             for field in req_fields:
                 user_data['missing_fields'].append((doc_type, field))
+            continue
+
+        user_data[f'{doc_type}_fields'] = data
+        # Проверка обязательных полей
+        for field in req_fields:
+            if not data.get(field) or data.get(field) == 'Не найдено':
+                user_data['missing_fields'].append((doc_type, field))
 
     # Убираем дубликаты из недостающих полей, сохраняя порядок
     unique_missing_fields = []
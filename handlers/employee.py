@@ -2,6 +2,7 @@ from states import SELECT_SERVICE
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ContextTypes
 from keyboards import SERVICE_OPTIONS, ADD_EMPLOYEE_OPTION
+from utils.pipeline import cancel_prefetch
 
 async def add_another_employee(update: Update, context: ContextTypes.DEFAULT_TYPE):
     answer = update.message.text.strip()
@@ -11,6 +12,8 @@ async def add_another_employee(update: Update, context: ContextTypes.DEFAULT_TYP
         context.user_data.clear()
         context.user_data['company_name'] = company_name
         context.user_data['company_inn'] = company_inn
+        # Документы прежнего сотрудника больше не нужны
+        cancel_prefetch(update.effective_user.id)
         await update.message.reply_text(
             "👤 Начнем добавление нового сотрудника!\n"
             "Выберите тип услуги:",
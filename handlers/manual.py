@@ -6,7 +6,7 @@ from keyboards import ADD_EMPLOYEE_OPTION
 from states import MANUAL_INPUT, ADD_ANOTHER_EMPLOYEE
 from utils.fields import get_field_description
 from utils.supabase import save_to_supabase
-from utils.template_notification_pdf import create_notification_from_db_data
+from utils.pdf_render import render_notification_pdf
 
 logger = logging.getLogger(__name__)
 
@@ -167,18 +167,14 @@ async def save_application(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if service_type == "Уведомление от работника иностранного гражданина":
         await update.message.reply_text("⏳ Генерирую официальный PDF-документ по форме МВД России от 05.09.2023 г. № 655...")
         try:
-            # Создаем уведомление по официальному шаблону МВД
-            template_pdf_path = create_notification_from_db_data(full_data)
-            if template_pdf_path:
-                with open(template_pdf_path, 'rb') as pdf_file:
-                    await update.message.reply_document(
-                        document=InputFile(pdf_file, filename="Уведомление_МВД.pdf"),
-                        caption="✅ Уведомление успешно сформировано в формате PDF по официальной форме!\n"
-                               "📋 Форма соответствует Приложению №1 к приказу МВД России от 05.09.2023 г. № 655"
-                    )
-                # Удаляем временный файл
-                import os
-                os.remove(template_pdf_path)
+            # Создаем уведомление по официальному шаблону МВД сразу в памяти
+            pdf_bytes = await render_notification_pdf(full_data)
+            if pdf_bytes:
+                await update.message.reply_document(
+                    document=InputFile(pdf_bytes, filename="Уведомление_МВД.pdf"),
+                    caption="✅ Уведомление успешно сформировано в формате PDF по официальной форме!\n"
+                           "📋 Форма соответствует Приложению №1 к приказу МВД России от 05.09.2023 г. № 655"
+                )
             else:
                 await update.message.reply_text("❌ Не удалось создать PDF-файл по форме МВД.")
         except Exception as e:
@@ -6,7 +6,7 @@ from keyboards import ADD_EMPLOYEE_OPTION
 from states import MANUAL_INPUT, ADD_ANOTHER_EMPLOYEE
 from utils.fields import get_field_description
 from utils.supabase import save_to_supabase
-from utils.template_notification_pdf import create_notification_from_db_data
+from utils.pdf_render import render_notification_pdf
 
 logger = logging.getLogger(__name__)
 
@@ -88,17 +88,13 @@ async def save_application(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⏳ Генерирую официальный PDF-документ с точным позиционированием...")
         try:
             # Создаем официальное уведомление в формате PDF с клетками для каждого символа
-            pdf_path = create_notification_from_db_data(user_data)
-            if pdf_path:
-                with open(pdf_path, 'rb') as pdf_file:
-                    await update.message.reply_document(
-                        document=InputFile(pdf_file, filename="Уведомление_официальный.pdf"),
-                        caption="✅ Официальное уведомление успешно сформировано в формате PDF!\n"
-                               "📋 Документ содержит клетки для каждого символа согласно требованиям."
-                    )
-                # Удаляем временный файл
-                import os
-                os.remove(pdf_path)
+            pdf_bytes = await render_notification_pdf(user_data)
+            if pdf_bytes:
+                await update.message.reply_document(
+                    document=InputFile(pdf_bytes, filename="Уведомление_официальный.pdf"),
+                    caption="✅ Официальное уведомление успешно сформировано в формате PDF!\n"
+                           "📋 Документ содержит клетки для каждого символа согласно требованиям."
+                )
             else:
                 await update.message.reply_text("❌ Не удалось создать PDF-файл.")
         except Exception as e:
@@ -3,7 +3,8 @@ from telegram.ext import ContextTypes
 from states import MANUAL_INPUT, UPLOAD_DOCUMENTS
 from handlers.manual import save_application
 from handlers.documents import get_field_description
-from utils.ocr import convert_pdf_to_png, gcv_ocr, gcv_ocr_multiple
+from utils.document_store import open_document
+from utils.ocr import ocr_document
 from utils.prompts import PROMPT_PASSPORT, PROMPT_MIGRATION, PROMPT_PATENT, PROMPT_DMS
 from utils.gpt import extract_doc_fields_with_gpt
 from utils.parsers import parse_passport_fields, parse_migration_fields, parse_patent_fields, parse_dms_fields
@@ -35,11 +36,8 @@ async def process_documents(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if 'паспорт' in doc['name'].lower() or 'passport' in doc['name'].lower():
             await update.message.reply_text("🔍 Обрабатываю паспорт...")
             try:
-                if doc['mime'] == 'application/pdf':
-                    png_pages = convert_pdf_to_png(doc['bytes'], pages=[1])
-                    raw_text = gcv_ocr(png_pages[0]) if png_pages else ""
-                else:
-                    raw_text = gcv_ocr(doc['bytes'])
+                async with open_document(doc) as content:
+                    raw_text = await ocr_document(content, doc['mime'], doc_type='passport')
                 if raw_text:
                     fields_raw = await extract_doc_fields_with_gpt(raw_text, PROMPT_PASSPORT)
                     passport_data = parse_passport_fields(fields_raw)
@@ -69,11 +67,8 @@ async def process_documents(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if 'миграцион' in doc['name'].lower() or 'migration' in doc['name'].lower():
                 await update.message.reply_text("🔍 Обрабатываю миграционную карту...")
                 try:
-                    if doc['mime'] == 'application/pdf':
-                        png_pages = convert_pdf_to_png(doc['bytes'], pages=[1])
-                        raw_text = gcv_ocr(png_pages[0]) if png_pages else ""
-                    else:
-                        raw_text = gcv_ocr(doc['bytes'])
+                    async with open_document(doc) as content:
+                        raw_text = await ocr_document(content, doc['mime'], doc_type='migration')
                     
                     if raw_text:
                         fields_raw = await extract_doc_fields_with_gpt(raw_text, PROMPT_MIGRATION)
@@ -103,11 +98,8 @@ async def process_documents(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if 'патент' in doc['name'].lower() or 'patent' in doc['name'].lower():
             await update.message.reply_text("🔍 Обрабатываю патент...")
             try:
-                if doc['mime'] == 'application/pdf':
-                    png_pages = convert_pdf_to_png(doc['bytes'], pages=[1, 2])
-                    raw_text = gcv_ocr_multiple(png_pages)
-                else:
-                    raw_text = gcv_ocr(doc['bytes'])
+                async with open_document(doc) as content:
+                    raw_text = await ocr_document(content, doc['mime'], doc_type='patent')
                 if raw_text:
                     fields_raw = await extract_doc_fields_with_gpt(raw_text, PROMPT_PATENT)
                     patent_data = parse_patent_fields(fields_raw)
@@ -156,11 +148,8 @@ async def process_documents(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if 'дмс' in doc['name'].lower() or 'страхован' in doc['name'].lower() or 'dms' in doc['name'].lower():
                 await update.message.reply_text("🔍 Обрабатываю полис ДМС...")
                 try:
-                    if doc['mime'] == 'application/pdf':
-                        png_pages = convert_pdf_to_png(doc['bytes'], pages=[1])
-                        raw_text = gcv_ocr(png_pages[0]) if png_pages else ""
-                    else:
-                        raw_text = gcv_ocr(doc['bytes'])
+                    async with open_document(doc) as content:
+                        raw_text = await ocr_document(content, doc['mime'], doc_type='dms')
                     
                     if raw_text:
                         fields_raw = await extract_doc_fields_with_gpt(raw_text, PROMPT_DMS)
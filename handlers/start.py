@@ -1,9 +1,12 @@
 from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import ContextTypes
 from states import COMPANY_INN
+from utils.pipeline import cancel_prefetch
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
+    # Документы прежней заявки больше не нужны
+    cancel_prefetch(update.effective_user.id)
     await update.message.reply_text(
         "👋 Добро пожаловать в EasyMigrateBot!\n\n"
         "📝 Введите ИНН вашей компании (10 или 12 цифр):",
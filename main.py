@@ -1,6 +1,6 @@
 import logging
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, ConversationHandler, filters
-from config import TELEGRAM_TOKEN
+from config import TELEGRAM_TOKEN, PERSISTENCE_ENABLED, PERSISTENCE_PATH, PERSISTENCE_UPDATE_INTERVAL
 from handlers.start import start
 from handlers.company import get_company_inn
 from handlers.service import select_service
@@ -10,6 +10,12 @@ from handlers.documents import upload_documents
 from handlers.manual import manual_input
 from handlers.employee import add_another_employee
 from handlers.cancel import cancel
+from utils.fonts import warm_up_fonts
+from utils.http import get_http_session, close_http_session
+from utils.pdf_render import start_pdf_renderer, shutdown_pdf_renderer
+from utils.ocr_engines import start_local_ocr, shutdown_local_ocr
+from utils.persistence import SQLitePersistence
+from utils.document_store import start_document_store, shutdown_document_store, referenced_digests
 
 
 # Состояния диалога импортируются из states.py
@@ -20,11 +26,31 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def on_startup(app):
+    """Инициализация общих ресурсов при запуске бота."""
+    await get_http_session()
+    warm_up_fonts()
+    await start_pdf_renderer()
+    await start_local_ocr()
+    # Документы незавершенных диалогов (user_data уже загружен из SQLite) не удаляются по сроку
+    await start_document_store(lambda: referenced_digests(app.user_data))
+
+async def on_shutdown(app):
+    """Освобождение общих ресурсов при остановке бота."""
+    await close_http_session()
+    shutdown_pdf_renderer()
+    shutdown_local_ocr()
+    shutdown_document_store()
+
 def main():
     if not TELEGRAM_TOKEN:
         logger.error("Ошибка: Не задан TELEGRAM_TOKEN")
         return
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    builder = ApplicationBuilder().token(TELEGRAM_TOKEN).post_init(on_startup).post_shutdown(on_shutdown)
+    if PERSISTENCE_ENABLED:
+        # user_data (документы, найденные и введенные вручную поля) и этап диалога переживают перезапуск
+        builder = builder.persistence(SQLitePersistence(PERSISTENCE_PATH, update_interval=PERSISTENCE_UPDATE_INTERVAL))
+    app = builder.build()
     conv = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
         states={
@@ -40,6 +66,8 @@ def main():
             ADD_ANOTHER_EMPLOYEE: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_another_employee)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
+        name="application",
+        persistent=PERSISTENCE_ENABLED,
     )
     app.add_handler(conv)
     logger.info("✅ Бот запущен")
@@ -12,8 +12,8 @@ import logging
 from datetime import datetime
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+
+from utils.fonts import register_ttf
 
 # Настраиваем логгер
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -69,23 +69,23 @@ def register_fonts():
         if os.path.exists(font_path):
             try:
                 if "arial" in font_path.lower():
-                    pdfmetrics.registerFont(TTFont("Arial", font_path))
+                    register_ttf("Arial", font_path)
                     font_name = "Arial"
                     font_registered = True
                     logger.info(f"Зарегистрирован шрифт Arial: {font_path}")
                     
                     # Также регистрируем его для кириллицы
-                    pdfmetrics.registerFont(TTFont("Arial-Cyrillic", font_path))
+                    register_ttf("Arial-Cyrillic", font_path)
                     break
                 elif "times" in font_path.lower() or "liberation" in font_path.lower():
-                    pdfmetrics.registerFont(TTFont("Times", font_path))
+                    register_ttf("Times", font_path)
                     if not font_registered:
                         font_name = "Times"
                         font_registered = True
                         logger.info(f"Зарегистрирован шрифт Times: {font_path}")
                         
                         # Также регистрируем его для кириллицы
-                        pdfmetrics.registerFont(TTFont("Times-Cyrillic", font_path))
+                        register_ttf("Times-Cyrillic", font_path)
             except Exception as e:
                 logger.warning(f"Не удалось зарегистрировать шрифт {font_path}: {e}")
     
@@ -0,0 +1,297 @@
+"""
+Разбор ответов GPT по полису ДМС (utils.dms_parser) против замороженной копии
+прежнего последовательного перебора шаблонов: на синтетическом корпусе, на
+названиях всех известных страховых компаний и на шаблоне «ОПФ + название».
+"""
+
+import random
+import re
+import time
+
+import pytest
+
+from utils import dms_parser
+from utils.dms_parser import KNOWN_INSURERS, parse_dms_fields
+
+
+# --- Прежний разбор (до компиляции шаблонов при импорте), без изменений ---
+
+def parse_dms_fields_sequential(text: str):
+    """Старая реализация parse_dms_fields: шаблоны перебираются и компилируются при каждом вызове."""
+    res = {}
+    lines = text.splitlines()
+
+    # Разбор строк с двоеточием для извлечения ключевых данных
+    for line in lines:
+        if ":" not in line:
+            continue
+        key, val = line.split(":", 1)
+        key, val = key.strip(), val.strip()
+        lk = key.lower()
+
+        if ("email" in lk or "почта" in lk or "e-mail" in lk) or "@" in val:
+            res['insurance_expiry'] = val
+        elif "телефон" in lk or "phone" in lk:
+            res['phone'] = val
+        elif "номер" in lk and ("полис" in lk or "дмс" in lk or "страхов" in lk):
+            res['dms_number'] = val
+        elif "дата" in lk and ("выдач" in lk or "полис" in lk or "дмс" in lk or "страхов" in lk or "начал" in lk):
+            res['insurance_date'] = val
+        elif (("страховая компания" in lk or "страховщик" in lk or ("компан" in lk and "страхов" in lk) or 
+              "insurance company" in lk or "insurer" in lk) and "@" not in val and "телефон" not in lk):
+            # Новый формат ответа GPT: "Страховая компания: <название>" или "Insurance company: <название>"
+            if val and val != "Не найдено":
+                res['insurance_company'] = val
+
+    full_text = " ".join(lines)
+
+    # УНИВЕРСАЛЬНОЕ ИЗВЛЕЧЕНИЕ НАЗВАНИЯ СТРАХОВОЙ КОМПАНИИ
+    if 'insurance_company' not in res:
+        # Стратегия 1: Поиск известных страховых компаний
+        known_companies = [
+            r'(?:ООО\s+)?(?:Страховая\s+компания\s+)?СОГАЗ(?:\s+МЕДИЦИНА)?',
+            r'(?:ООО\s+)?ИНГОССТРАХ(?:-М)?',
+            r'(?:ООО\s+)?РЕСО-Гарантия',
+            r'(?:ООО\s+)?(?:СК\s+)?Альфа-Страхование',
+            r'(?:ПАО\s+)?Росгосстрах',
+            r'(?:ООО\s+)?ВТБ\s+Страхование',
+            r'(?:ООО\s+)?(?:СК\s+)?Сбербанк\s+Страхование',
+            r'(?:ООО\s+)?(?:СК\s+)?АльфаСтрахование-ОМС',
+            r'(?:ООО\s+)?МАКС(?:\s+М)?',
+            r'(?:ООО\s+)?(?:СК\s+)?Капитал\s+Лайф\s+Страхование\s+Жизни',
+            r'(?:ООО\s+)?(?:СК\s+)?ЭРГО(?:\s+Русь)?',
+            r'(?:ООО\s+)?(?:СК\s+)?Гайде',
+            r'(?:ООО\s+)?(?:СК\s+)?УралСиб',
+            r'(?:АО\s+)?(?:СК\s+)?Энергогарант',
+            r'(?:ООО\s+)?(?:СК\s+)?Медэкспресс',
+            r'(?:ООО\s+)?(?:СК\s+)?Страховая\s+Группа\s+МСК',
+            r'(?:ООО\s+)?(?:СК\s+)?ЖАСО',
+            r'(?:ООО\s+)?(?:СК\s+)?Мед\s+Инвест',
+            r'(?:ООО\s+)?(?:СК\s+)?АСКО(?:-МЕД)?(?:\s+ДМС)?',
+            r'(?:ООО\s+)?(?:СК\s+)?Спасские\s+ворота(?:-М)?',
+            r'(?:ООО\s+)?(?:СК\s+)?Либерти\s+Страхование',
+            r'(?:ООО\s+)?(?:СК\s+)?МетЛайф',
+            r'(?:ООО\s+)?(?:СК\s+)?Группа\s+Ренессанс\s+Страхование',
+            r'(?:ООО\s+)?(?:СК\s+)?Открытие\s+Страхование',
+            r'(?:ООО\s+)?(?:СК\s+)?Зетта\s+Страхование',
+            r'(?:ООО\s+)?(?:СК\s+)?Рента',
+            r'(?:ООО\s+)?(?:СК\s+)?СОСЬЕТЕ\s+ЖЕНЕРАЛЬ\s+Страхование',
+            r'(?:ООО\s+)?(?:СК\s+)?Согласие',
+        ]
+        
+        for pattern in known_companies:
+            match = re.search(pattern, full_text, re.IGNORECASE)
+            if match:
+                res['insurance_company'] = match.group(0).strip()
+                break
+        
+        # Стратегия 2: Поиск организационно-правовых форм + "страх"
+        if 'insurance_company' not in res:
+            org_forms_pattern = r'(?:ООО|АО|ПАО|ЗАО|НПФ|ОАО)\s+["\']?(?:[А-ЯЁ][а-яё\s\-]*)*(?:страх|медицин|полис)[а-яёА-ЯЁ\s\-]*["\']?'
+            match = re.search(org_forms_pattern, full_text, re.IGNORECASE)
+            if match:
+                candidate = match.group(0).strip().strip('"\'')
+                # Проверяем, что это не содержит номера или даты
+                if not re.search(r'\d{6,}|\d{2}\.\d{2}\.\d{4}', candidate):
+                    res['insurance_company'] = candidate
+        
+        # Стратегия 3: Поиск по ключевым словам в строках без двоеточия
+        if 'insurance_company' not in res:
+            for line in lines:
+                if ':' in line:
+                    continue
+                    
+                line_clean = line.strip()
+                if len(line_clean) < 5:  # Слишком короткая строка
+                    continue
+                    
+                line_lower = line_clean.lower()
+                
+                # Проверяем наличие страховых маркеров
+                insurance_markers = [
+                    'страхов', 'страхование', 'insurance', 'медицин', 'дмс', 'полис',
+                    'согаз', 'ингос', 'ресо', 'альфа', 'росгос', 'втб', 'сбербанк',
+                    'макс', 'капитал', 'эрго', 'гайде', 'уралсиб', 'энергогарант',
+                    'медэкспресс', 'мск', 'жасо', 'аско', 'спасские', 'либерти',
+                    'метлайф', 'ренессанс', 'открытие', 'зетта', 'рента', 'согласие'
+                ]
+                
+                has_insurance_marker = any(marker in line_lower for marker in insurance_markers)
+                
+                # Исключаем строки с явными признаками не-названий
+                exclusion_patterns = [
+                    r'\d{6,}',  # Длинные числа (номера полисов)
+                    r'\d{2}\.\d{2}\.\d{4}',  # Даты
+                    r'\+?\d[\d\-\(\) ]{8,}',  # Телефоны
+                    r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}',  # Email
+                    r'(?:номер|серия|дата|период|с\s+\d|до\s+\d)',  # Технические поля
+                ]
+                
+                has_exclusion = any(re.search(pattern, line_clean, re.IGNORECASE) for pattern in exclusion_patterns)
+                
+                if has_insurance_marker and not has_exclusion:
+                    # Очищаем от лишних символов
+                    cleaned = re.sub(r'^[^\w]*|[^\w]*$', '', line_clean)
+                    if len(cleaned) > 5:
+                        res['insurance_company'] = cleaned
+                        break
+        
+        # Стратегия 4: Поиск названий в первых строках (логотип/шапка)
+        if 'insurance_company' not in res:
+            for i, line in enumerate(lines[:10]):  # Первые 10 строк
+                if ':' in line or len(line.strip()) < 5:
+                    continue
+                    
+                line_clean = line.strip()
+                line_upper = line_clean.upper()
+                
+                # Часто названия компаний написаны заглавными в шапке
+                if (len([c for c in line_clean if c.isupper()]) / len(line_clean) > 0.7 and 
+                    not re.search(r'\d{6,}|\d{2}\.\d{2}\.\d{4}|\+?\d[\d\-\(\) ]{8,}', line_clean)):
+                    
+                    # Дополнительная проверка на страховые термины
+                    if any(term in line_upper for term in ['СТРАХ', 'МЕДИЦИН', 'INSURANCE', 'СОГАЗ', 'ИНГОС', 'РЕСО']):
+                        res['insurance_company'] = line_clean
+                        break
+
+    # Извлечение остальных полей (номер, дата и т.д.)
+    for i, line in enumerate(lines):
+        # Поиск номера полиса по шаблону (если не найден выше)
+        if 'dms_number' not in res:
+            number_match = re.search(r'(?:№|серия\s+DMS\s*№)\s*([0-9]+)', line, re.IGNORECASE)
+            if number_match:
+                res['dms_number'] = number_match.group(1)
+            else:
+                alt_match = re.search(r'\b(?:полис|dms)\s+№?\s*([A-Za-zА-Яа-я0-9\-\/]+)', line, re.IGNORECASE)
+                if alt_match:
+                    res['dms_number'] = alt_match.group(1)
+
+        if 'insurance_date' not in res:
+            date_match = re.search(r'дата\s+выдачи:\s*(\d{2}\.\d{2}\.\d{4})', line, re.IGNORECASE)
+            if date_match:
+                res['insurance_date'] = date_match.group(1)
+
+        # Email
+        email_match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b', line)
+        if email_match and 'insurance_expiry' not in res:
+            res['insurance_expiry'] = email_match.group(0)
+            continue
+
+    # Последняя попытка найти номер полиса в полном тексте
+    if 'dms_number' not in res:
+        full_number_match = re.search(r'\b(\d{10,15})\b', full_text)
+        if full_number_match:
+            res['dms_number'] = full_number_match.group(1)
+
+    return res
+
+
+# --- Синтетический корпус ---
+
+COMPANIES = [
+    "СОГАЗ", "ООО СК «Сбербанк страхование»", "АО «АльфаСтрахование»", "ПАО СК «Росгосстрах»",
+    "ООО «Капитал Лайф Страхование Жизни»", "ИНГОССТРАХ", "РЕСО-Гарантия", "ООО «Медицинская страховая группа»",
+    "АО Страховая компания Мед-полис", "ООО «Зетта Страхование»", "Не найдено",
+]
+FREE_LINES = [
+    "Полис добровольного медицинского страхования", "ПОЛИС ДМС ДЛЯ ИНОСТРАННЫХ ГРАЖДАН",
+    "Страховщик обязуется оплатить медицинские услуги", "Программа: амбулаторно-поликлиническая помощь",
+    "Застрахованное лицо: ИВАНОВ ИВАН", "Период страхования с 01.02.2024 по 31.01.2025",
+    "Действует на территории Московской области", "ООО «Страховая компания Гелиос»",
+]
+# Старый шаблон «ОПФ + название» на этой строке работает минуты
+PATHOLOGICAL = "ООО СТРАХОВАЯ КОМПАНИЯ ГЕЛИОС\nНомер полиса: 866882\nПолис добровольного медицинского страхования"
+
+
+def synthetic_response(rng):
+    lines = []
+    if rng.random() < 0.3:
+        lines.append(rng.choice(FREE_LINES))
+    number = "".join(rng.choice("0123456789") for _ in range(rng.choice([6, 10, 12])))
+    lines += [
+        f"Номер полиса: {number if rng.random() < 0.85 else 'Не найдено'}",
+        f"Серия полиса: {rng.choice(['DMS', 'ДМС', 'Не найдено'])}",
+        f"Дата начала: {rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2024",
+        f"Дата окончания: {rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2025",
+    ]
+    if rng.random() < 0.8:
+        lines.append(f"Страховая компания: {rng.choice(COMPANIES)}")
+    lines.append(f"Телефон страховщика: +7 (495) {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}")
+    if rng.random() < 0.7:
+        lines.append(f"Email страховщика: {rng.choice(['info', 'dms', 'client'])}@{rng.choice(['sogaz', 'ingos', 'reso'])}.ru")
+    for _ in range(rng.randint(0, 3)):
+        lines.insert(rng.randint(0, len(lines)), rng.choice(FREE_LINES + [f"Полис № {number}"]))
+    if rng.random() < 0.2:
+        rng.shuffle(lines)
+    return "\n".join(lines)
+
+
+# Названия, на которых срабатывает каждый шаблон KNOWN_INSURERS (в том же порядке)
+INSURER_NAMES = [
+    "ООО Страховая компания СОГАЗ МЕДИЦИНА", "ИНГОССТРАХ-М", "ООО РЕСО-Гарантия", "СК Альфа-Страхование",
+    "ПАО Росгосстрах", "ВТБ Страхование", "ООО СК Сбербанк Страхование", "АльфаСтрахование-ОМС", "МАКС М",
+    "Капитал Лайф Страхование Жизни", "ЭРГО Русь", "СК Гайде", "УралСиб", "АО СК Энергогарант", "Медэкспресс",
+    "Страховая Группа МСК", "ЖАСО", "Мед Инвест", "АСКО-МЕД ДМС", "Спасские ворота-М", "Либерти Страхование",
+    "МетЛайф", "Группа Ренессанс Страхование", "Открытие Страхование", "Зетта Страхование", "СК Рента",
+    "СОСЬЕТЕ ЖЕНЕРАЛЬ Страхование", "Согласие",
+]
+
+# Строки с ОПФ, на которых прежний шаблон «ОПФ + название» отрабатывает быстро
+ORG_FORM_LINES = [
+    "ООО Гелиос страх", "АО Полис-Гарант", "ЗАО Гелиос Страхование жизни", 'ПАО "Северная страховая"',
+    "ОАО МЕДИЦИНСКИЙ ЦЕНТР", "ООО Ромашка и Медицина", "компания ООО Рога и Копыта полис 123",
+    "НПФ Будущее", "ООО «Страховая компания Гелиос»", "ООО Медицинская-страховая группа",
+]
+OLD_ORG_FORM = r'(?:ООО|АО|ПАО|ЗАО|НПФ|ОАО)\s+["\']?(?:[А-ЯЁ][а-яё\s\-]*)*(?:страх|медицин|полис)[а-яёА-ЯЁ\s\-]*["\']?'
+
+
+def test_synthetic_corpus_parses_like_sequential():
+    rng = random.Random(42)
+    for _ in range(2000):
+        text = synthetic_response(rng)
+        assert parse_dms_fields(text) == parse_dms_fields_sequential(text), text
+
+
+def test_every_known_insurer_pattern_has_a_name():
+    assert len(INSURER_NAMES) == len(KNOWN_INSURERS)
+    for name, pattern in zip(INSURER_NAMES, KNOWN_INSURERS):
+        assert re.fullmatch(pattern, name, re.IGNORECASE), (name, pattern)
+
+
+
+@pytest.mark.parametrize("pattern, fragment", [
+    (r'(?:ООО\s+)?(?:СК\s+)?Гайде', "гайде"),
+    (r'(?:ООО\s+)?ИНГОССТРАХ(?:-М)?', "ингосстрах"),
+    (r'(?:ООО\s+)?ВТБ\s+Страхование', "втб"),
+    # Символ перед квантификатором в обязательный фрагмент не входит
+    (r'Медэкс?пресс', "медэк"),
+    (r'РЕСО-?Гарантия', "ресо"),
+])
+def test_required_fragment_is_always_in_match(pattern, fragment):
+    assert dms_parser._required_fragment(pattern) == fragment
+
+@pytest.mark.parametrize("name", INSURER_NAMES)
+@pytest.mark.parametrize("case", [str, str.upper, str.lower])
+def test_known_insurers_are_found_like_sequential(name, case):
+    for text in (f"Полис ДМС\n{case(name)}", f"Полис № 1234567\nВыдан: {case(name)} (головной офис)"):
+        assert dms_parser.find_known_insurer(text.replace("\n", " ")) is not None
+        assert parse_dms_fields(text) == parse_dms_fields_sequential(text), text
+
+
+@pytest.mark.parametrize("line", ORG_FORM_LINES)
+def test_org_form_pattern_matches_like_before(line):
+    old = re.search(OLD_ORG_FORM, line, re.IGNORECASE)
+    new = dms_parser._ORG_FORM_RE.search(line)
+    assert (new and new.group(0)) == (old and old.group(0))
+    text = f"Номер полиса: 123456\n{line}"
+    assert parse_dms_fields(text) == parse_dms_fields_sequential(text)
+
+
+def test_uppercase_org_form_line_does_not_backtrack():
+    # Прежний шаблон «ОПФ + название» на этой строке работает минуты
+    start = time.perf_counter()
+    assert parse_dms_fields(PATHOLOGICAL) == {
+        'dms_number': '866882',
+        'insurance_company': 'ООО СТРАХОВАЯ КОМПАНИЯ ГЕЛИОС Номер полиса',
+    }
+    assert time.perf_counter() - start < 1
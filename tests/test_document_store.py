@@ -0,0 +1,84 @@
+"""Тесты хранилища документов: закрытие отображения после OCR и очистка с учетом ссылок из диалогов."""
+
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from utils import document_store
+
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_store, "DOCUMENT_STORE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _age(doc, seconds):
+    past = time.time() - seconds
+    os.utime(document_store._path(doc['digest']), (past, past))
+
+
+def test_mapping_is_closed_after_block():
+    doc = document_store.put_document(b"%PDF-1.4 " * 100, "паспорт.pdf", "application/pdf")
+
+    async def scenario():
+        async with document_store.open_document(doc) as content:
+            assert isinstance(content, memoryview)
+            assert content[:8].tobytes() == b"%PDF-1.4"
+        return content
+
+    content = asyncio.run(scenario())
+    with pytest.raises(ValueError):
+        content.tobytes()
+
+
+def test_file_is_opened_off_event_loop(monkeypatch):
+    doc = document_store.put_document(b"jpeg", "паспорт.jpg", "image/jpeg")
+    threads = []
+    map_document = document_store._map_document
+
+    def recording_map(doc):
+        threads.append(threading.current_thread())
+        return map_document(doc)
+
+    monkeypatch.setattr(document_store, "_map_document", recording_map)
+
+    async def scenario():
+        async with document_store.open_document(doc) as content:
+            return content.tobytes(), threading.current_thread()
+
+    data, loop_thread = asyncio.run(scenario())
+    assert data == b"jpeg"
+    assert threads and threads[0] is not loop_thread
+
+
+def test_legacy_bytes_and_empty_files_are_not_mapped():
+    empty = document_store.put_document(b"", "пустой.jpg", "image/jpeg")
+
+    async def scenario():
+        async with document_store.open_document({'bytes': b"old", 'name': "x", 'mime': "image/jpeg"}) as legacy:
+            assert legacy == b"old"
+        async with document_store.open_document(empty) as content:
+            assert content == b""
+
+    asyncio.run(scenario())
+
+
+def test_cleanup_keeps_documents_of_persisted_conversations():
+    kept = document_store.put_document(b"kept", "паспорт.jpg", "image/jpeg")
+    stale = document_store.put_document(b"stale", "патент.jpg", "image/jpeg")
+    fresh = document_store.put_document(b"fresh", "дмс.jpg", "image/jpeg")
+    _age(kept, 3600)
+    _age(stale, 3600)
+    # user_data, восстановленный из SQLite после перезапуска, ссылается на старый документ
+    user_data = {1: {'documents': [kept, {'bytes': b"old", 'name': "x", 'mime': "image/jpeg"}]}, 2: {}}
+
+    removed = document_store.cleanup_documents(ttl=60, keep=document_store.referenced_digests(user_data))
+
+    assert removed == 1
+    assert os.path.exists(document_store._path(kept['digest']))
+    assert not os.path.exists(document_store._path(stale['digest']))
+    assert os.path.exists(document_store._path(fresh['digest']))
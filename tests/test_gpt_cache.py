@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import pytest
+
+from utils import field_schemas, gpt
+from utils.cache import SQLiteCache
+
+PASSPORT = {key: None for key in gpt.json_schema("passport")["properties"]}
+CONTRACT = {key: None for key in gpt.json_schema("contract")["properties"]}
+SECTIONS = {"passport": ("Промпт паспорта", "текст паспорта"), "contract": ("Промпт договора", "текст договора")}
+SCHEMAS = {"passport": "passport", "contract": "contract"}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = SQLiteCache(str(tmp_path / "gpt.sqlite"))
+    monkeypatch.setattr(gpt, "GPT_CACHE", cache)
+    return cache
+
+
+def _reply(monkeypatch, *contents):
+    """Подменяет запрос к API: возвращает contents по очереди и считает вызовы."""
+    calls = []
+
+    async def chat_completion(full_prompt, max_tokens=512, response=None):
+        calls.append(full_prompt)
+        return contents[len(calls) - 1]
+
+    monkeypatch.setattr(gpt, "_chat_completion", chat_completion)
+    return calls
+
+
+def test_combined_reply_is_cached_once(cache, monkeypatch):
+    calls = _reply(monkeypatch, json.dumps({"passport": PASSPORT, "contract": dict(CONTRACT, position="ГРУЗЧИК")}))
+    sets = []
+    cache_set = cache.set
+
+    def counting_set(key, value):
+        sets.append(key)
+        cache_set(key, value)
+
+    monkeypatch.setattr(cache, "set", counting_set)
+
+    first = asyncio.run(gpt.extract_fields_combined(SECTIONS, SCHEMAS))
+    second = asyncio.run(gpt.extract_fields_combined(SECTIONS, SCHEMAS))
+
+    assert first == second and first["contract"]["position"] == "ГРУЗЧИК"
+    assert len(calls) == 1
+    assert len(sets) == 1
+
+
+@pytest.mark.parametrize("reply", [
+    {"passport": PASSPORT},
+    {"passport": PASSPORT, "contract": dict(CONTRACT, unknown_field="x")},
+])
+def test_invalid_combined_reply_is_not_cached(cache, monkeypatch, reply):
+    calls = _reply(monkeypatch, json.dumps(reply), json.dumps(reply))
+
+    asyncio.run(gpt.extract_fields_combined(SECTIONS, SCHEMAS))
+    asyncio.run(gpt.extract_fields_combined(SECTIONS, SCHEMAS))
+
+    assert len(calls) == 2
+
+
+def test_combined_cache_key_depends_on_schema(cache, monkeypatch):
+    reply = json.dumps({"passport": PASSPORT, "contract": CONTRACT})
+    calls = _reply(monkeypatch, reply, reply)
+    asyncio.run(gpt.extract_fields_combined(SECTIONS, SCHEMAS))
+
+    changed = dict(field_schemas.FIELD_SCHEMAS["contract"], position="Должность сотрудника полностью")
+    monkeypatch.setitem(field_schemas.FIELD_SCHEMAS, "contract", changed)
+    asyncio.run(gpt.extract_fields_combined(SECTIONS, SCHEMAS))
+
+    assert len(calls) == 2
+
+
+def test_invalid_document_reply_is_not_cached(cache, monkeypatch):
+    invalid = json.dumps(dict(CONTRACT, unknown_field="x"))
+    calls = _reply(monkeypatch, invalid, invalid)
+
+    asyncio.run(gpt.extract_doc_fields_with_gpt("текст договора", "Промпт договора", schema="contract"))
+    asyncio.run(gpt.extract_doc_fields_with_gpt("текст договора", "Промпт договора", schema="contract"))
+
+    assert len(calls) == 2
+
+
+def test_document_cache_key_depends_on_schema(cache, monkeypatch):
+    reply = json.dumps(CONTRACT)
+    calls = _reply(monkeypatch, reply, reply, reply)
+    asyncio.run(gpt.extract_doc_fields_with_gpt("текст договора", "Промпт договора", schema="contract"))
+    asyncio.run(gpt.extract_doc_fields_with_gpt("текст договора", "Промпт договора", schema="contract"))
+    assert len(calls) == 1
+
+    changed = dict(field_schemas.FIELD_SCHEMAS["contract"], position="Должность сотрудника полностью")
+    monkeypatch.setitem(field_schemas.FIELD_SCHEMAS, "contract", changed)
+    asyncio.run(gpt.extract_doc_fields_with_gpt("текст договора", "Промпт договора", schema="contract"))
+
+    assert len(calls) == 2
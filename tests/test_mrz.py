@@ -0,0 +1,106 @@
+"""
+Разбор MRZ паспорта (utils.mrz): образец ICAO 9303, контрольные цифры,
+исправление ошибок OCR, выбор века в датах и выделение серии из номера.
+"""
+
+import datetime
+
+import pytest
+
+from utils import mrz
+
+# Образец паспорта из ICAO Doc 9303, часть 4
+SPECIMEN = (
+    "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<",
+    "L898902C36UTO7408122F1204159ZE184226B<<<<<10",
+)
+
+
+class FixedDate(datetime.date):
+    @classmethod
+    def today(cls):
+        return cls(2026, 10, 17)
+
+
+@pytest.fixture(autouse=True)
+def fixed_today(monkeypatch):
+    monkeypatch.setattr(mrz, "date", FixedDate)
+
+
+def td3(country, number, birth, expiry, sex="M", surname="IVANOV", given_names="IVAN"):
+    """Две строки TD3 с верными контрольными цифрами."""
+    first = f"P<{country}{surname}<<{given_names}".ljust(mrz.TD3_LENGTH, "<")
+    number = number.ljust(9, "<")
+    personal = "<" * 14
+    parts = [number + mrz.check_digit(number), country, birth + mrz.check_digit(birth), sex,
+             expiry + mrz.check_digit(expiry), personal + mrz.check_digit(personal)]
+    composite = parts[0] + parts[2] + parts[4] + parts[5]
+    return first, "".join(parts) + mrz.check_digit(composite)
+
+
+def test_icao_specimen_is_valid_line_pair():
+    assert mrz.find_td3("\n".join(["ПАСПОРТ", *SPECIMEN])) == SPECIMEN
+    assert mrz.parse_td3(*SPECIMEN) == {
+        "surname": "ERIKSSON",
+        "given_names": "ANNA MARIA",
+        "number": "L898902C3",
+        "country": "UTO",
+        "nationality": "UTO",
+        "birthdate": "12.08.1974",
+        "sex": "F",
+        "expiry_date": "15.04.2012",
+        "personal_number": "ZE184226B",
+    }
+
+
+def test_corrupted_check_digit_gives_no_fields():
+    first, second = SPECIMEN
+    corrupted = second[:9] + "7" + second[10:]
+    assert mrz.parse_td3(first, corrupted) is None
+    assert mrz.mrz_passport_fields(f"{first}\n{corrupted}") == {}
+
+
+def test_letters_confused_with_digits_are_fixed():
+    first, second = SPECIMEN
+    # OCR прочитал «0» в дате рождения как «O», «1» в сроке действия как «I»
+    ocr_second = second[:13] + "74O8122F" + "I2O4159" + second[28:]
+    assert ocr_second != second
+    assert mrz.parse_td3(first, ocr_second) == mrz.parse_td3(*SPECIMEN)
+
+
+@pytest.mark.parametrize("birth, expected", [
+    ("900101", "01.01.1990"),
+    ("260101", "01.01.2026"),
+    ("270101", "01.01.1927"),
+    ("050607", "07.06.2005"),
+])
+def test_birth_century_is_in_the_past(birth, expected):
+    fields = mrz.mrz_passport_fields("\n".join(td3("UZB", "FA1234567", birth, "300101")))
+    assert fields["birthdate"] == expected
+
+
+@pytest.mark.parametrize("expiry, expected", [
+    ("300101", "01.01.2030"),
+    ("200101", "01.01.2020"),
+    ("750101", "01.01.2075"),
+    ("760101", "01.01.1976"),
+])
+def test_expiry_century_allows_future_dates(expiry, expected):
+    fields = mrz.mrz_passport_fields("\n".join(td3("UZB", "FA1234567", "900101", expiry)))
+    assert fields["expiry_date"] == expected
+
+
+def test_uzbek_number_is_split_into_series():
+    fields = mrz.mrz_passport_fields("\n".join(td3("UZB", "FA1234567", "900101", "300101")))
+    assert fields["passport_series"] == "FA"
+    assert fields["passport_number"] == "1234567"
+    assert fields["nationality"] == "УЗБЕКИСТАН"
+    assert fields["sex"] == "МУЖСКОЙ"
+    assert fields["fio_latin"] == "IVANOV IVAN"
+
+
+def test_tajik_number_has_no_series():
+    fields = mrz.mrz_passport_fields("\n".join(td3("TJK", "A12345678", "900101", "300101")))
+    assert "passport_series" not in fields
+    assert fields["passport_number"] == "A12345678"
+    assert fields["nationality"] == "ТАДЖИКИСТАН"
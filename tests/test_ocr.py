@@ -0,0 +1,159 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import ocr
+from utils.cache import SQLiteCache
+
+
+class _Page:
+    def __init__(self, page_no):
+        self.page_no = page_no
+
+    def close(self):
+        pass
+
+
+def test_skipped_page_does_not_shift_page_texts(monkeypatch):
+    # Превью страницы 2 не растеризуется: тексты страниц 1 и 3 остаются при своих номерах
+    def convert_from_path(path, dpi, first_page, last_page, grayscale=False):
+        return [] if first_page == 2 else [_Page(first_page)]
+
+    monkeypatch.setattr(ocr, "convert_from_path", convert_from_path)
+    monkeypatch.setattr(ocr, "choose_dpi", lambda preview: 200)
+    monkeypatch.setattr(ocr, "fit_pixel_budget", lambda img: img)
+    monkeypatch.setattr(ocr, "encode_for_ocr", lambda img: f"страница {img.page_no}")
+    monkeypatch.setattr(ocr, "_engines", lambda: ["tesseract"])
+    monkeypatch.setattr(ocr, "engine_ocr_batch", lambda engine, batch, page_numbers, report=None: [f"текст: {img}" for img in batch])
+
+    assert list(ocr.iter_pdf_pages(b"%PDF", [1, 2, 3])) == [(1, "страница 1"), (3, "страница 3")]
+    assert ocr.ocr_pages(ocr.iter_pdf_pages(b"%PDF", [1, 2, 3])) == {1: "текст: страница 1", 3: "текст: страница 3"}
+
+    # Страница 2 — текстовый слой, страница 1 не растеризуется: текст страницы 3 остается после слоя
+    monkeypatch.setattr(ocr, "read_text_layer", lambda pdf_bytes, pages: ([1, 2, 3], {2: "слой"}))
+    monkeypatch.setattr(ocr, "convert_from_path", lambda path, dpi, first_page, last_page, grayscale=False:
+                        [] if first_page == 1 else [_Page(first_page)])
+    assert ocr.ocr_pdf(b"%PDF", [1, 2, 3]) == "слой\n\nтекст: страница 3"
+
+
+def test_slot_is_held_until_timed_out_ocr_finishes(monkeypatch):
+    finished = threading.Event()
+    release = threading.Event()
+
+    def slow_ocr():
+        release.wait()
+        finished.set()
+        return "текст"
+
+    async def scenario():
+        monkeypatch.setattr(ocr, "_OCR_SLOTS", asyncio.Semaphore(1))
+        with pytest.raises(asyncio.TimeoutError):
+            await ocr._run_in_executor(slow_ocr, timeout=0.05)
+        # Поток еще распознает: слот занят, следующая задача ждет
+        assert ocr._OCR_SLOTS.locked()
+        release.set()
+        assert await ocr._run_in_executor(lambda: "после", timeout=5) == "после"
+        assert finished.is_set()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+
+
+
+def test_timeout_starts_when_worker_picks_up_job(monkeypatch):
+    release = threading.Event()
+
+    def busy_ocr():
+        release.wait(5)
+        return "первый"
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(ocr, "_OCR_EXECUTOR", executor)
+
+    async def scenario():
+        monkeypatch.setattr(ocr, "_OCR_SLOTS", asyncio.Semaphore(2))
+        first = asyncio.ensure_future(ocr._run_in_executor(busy_ocr, timeout=5))
+        # Вторая задача ждет единственный поток дольше своего таймаута, но сама выполняется быстро
+        second = asyncio.ensure_future(ocr._run_in_executor(lambda: "второй", timeout=0.1))
+        await asyncio.sleep(0.3)
+        assert not second.done()
+        release.set()
+        return await first, await second
+
+    try:
+        assert asyncio.run(scenario()) == ("первый", "второй")
+    finally:
+        release.set()
+        executor.shutdown()
+
+def test_cache_work_runs_off_event_loop(tmp_path, monkeypatch):
+    threads = []
+
+    def recording(func):
+        def wrapper(*args):
+            threads.append(threading.get_ident())
+            return func(*args)
+        return wrapper
+
+    cache = SQLiteCache(str(tmp_path / "ocr.sqlite"))
+    monkeypatch.setattr(cache, "get", recording(cache.get))
+    monkeypatch.setattr(cache, "set", recording(cache.set))
+    monkeypatch.setattr(ocr, "OCR_CACHE", cache)
+    monkeypatch.setattr(ocr, "ocr_cache_key", recording(ocr.ocr_cache_key))
+
+    async def ocr_image_async(file_bytes, report=None):
+        report['engines'].add(ocr.OCR_ENGINE)
+        return "текст"
+
+    monkeypatch.setattr(ocr, "ocr_image_async", ocr_image_async)
+
+    async def scenario():
+        first = await ocr.ocr_document(b"photo", "image/jpeg")
+        second = await ocr.ocr_document(b"photo", "image/jpeg")
+        return first, second
+
+    assert asyncio.run(scenario()) == ("текст", "текст")
+    # Ключ, чтение, запись, ключ, чтение — все в потоках, а не в потоке цикла событий
+    assert len(threads) == 5 and threading.get_ident() not in threads
+
+
+@pytest.mark.parametrize("vision_page_error, vision_down, cached", [
+    (False, False, True),
+    # Страница с ошибкой Vision: в тексте не хватает страницы
+    (True, False, False),
+    # Текст резервного движка не подменяет результат основного на весь срок кэша
+    (False, True, False),
+])
+def test_only_complete_primary_engine_text_is_cached(tmp_path, monkeypatch, vision_page_error, vision_down, cached):
+    calls = []
+
+    def engine_ocr_batch(engine, batch, page_numbers, report=None):
+        calls.append(engine)
+        if engine == "vision" and vision_down:
+            raise RuntimeError("Vision недоступен")
+        if engine == "vision" and vision_page_error:
+            ocr._mark_failed(report)
+            return ["текст"] + [""] * (len(batch) - 1)
+        return [f"текст {engine}" for _ in batch]
+
+    monkeypatch.setattr(ocr, "OCR_CACHE", SQLiteCache(str(tmp_path / "ocr.sqlite")))
+    monkeypatch.setattr(ocr, "OCR_ENGINE", "vision")
+    monkeypatch.setattr(ocr, "_engines", lambda: ["vision", "tesseract"])
+    monkeypatch.setattr(ocr, "engine_ocr_batch", engine_ocr_batch)
+    monkeypatch.setattr(ocr, "read_text_layer", lambda pdf_bytes, pages: ([1, 2], {}))
+    monkeypatch.setattr(ocr, "iter_pdf_pages", lambda pdf_bytes, pages: [(1, "стр. 1"), (2, "стр. 2")])
+
+    async def scenario():
+        first = await ocr.ocr_document(b"%PDF", "application/pdf", pages=[1, 2])
+        calls_after_first = len(calls)
+        second = await ocr.ocr_document(b"%PDF", "application/pdf", pages=[1, 2])
+        return first, second, calls_after_first
+
+    first, second, calls_after_first = asyncio.run(scenario())
+
+    assert first == second
+    assert (len(calls) == calls_after_first) == cached
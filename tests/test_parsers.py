@@ -0,0 +1,240 @@
+"""
+Разбор ответов GPT таблицами полей (utils.parsers) против замороженной копии
+прежних цепочек if/elif на сгенерированных строках «Ключ: значение».
+"""
+
+import re
+
+from hypothesis import given, settings, strategies as st
+
+from utils import parsers
+from utils.parsers import is_missing, normalize_authority, normalize_birth_place, normalize_nationality, normalize_sex
+
+
+# --- Прежний разбор (цепочки if/elif до перехода на таблицы), без изменений ---
+
+def baseline_migration(text: str):
+    res = {}
+    for line in text.splitlines():
+        if ":" not in line:
+            continue
+        key, val = line.split(":", 1)
+        key, val = key.strip(), val.strip()
+        if "Серия карты" in key:
+            res["migration_card_series"] = val
+        elif "Номер карты" in key:
+            res["migration_card_number"] = val
+        elif "Дата выдачи" in key:
+            res["migration_card_date"] = val
+        elif "Цель визита" in key:
+            res["migration_card_purpose"] = val
+    return res
+
+
+def baseline_patent(text: str):
+    res = {}
+    for line in text.splitlines():
+        if ":" not in line:
+            continue
+        key, val = line.split(":", 1)
+        key, val = key.strip(), val.strip()
+        if "Серия патента" in key:
+            res["patent_series"] = val
+        elif "Номер патента" in key:
+            res["patent_number"] = val
+        elif "Дата выдачи" in key:
+            res["patent_date"] = val
+        elif "Кем выдан" in key:
+            res["patent_issuer"] = val
+        elif "ФИО" in key and "латиницей" not in key:
+            res["fio"] = val
+        elif "Серия и номер бланка" in key:
+            res["patent_blank"] = val
+        elif "ИНН" in key:
+            res["inn"] = val
+    return res
+
+
+def baseline_passport(text: str):
+    res = {}
+    t = text.lower()
+    is_tajik = ("таджик" in t) or ("номер (таджик" in t)
+
+    for line in text.splitlines():
+        if ":" not in line:
+            continue
+        key, val = line.split(":", 1)
+        key, val = key.strip(), val.strip()
+        kl = key.lower()
+
+        if key == "ФИО":
+            res["fio"] = val.upper()
+        elif "дата рождения" in kl:
+            res["birthdate"] = val
+        elif "место рождения" in kl:
+            res["birth_place"] = normalize_birth_place(val)
+        elif "пол" in kl:
+            res["sex"] = normalize_sex(val)
+        elif (key == "Серия" or ("серия" in kl and "паспорт" in kl)) and not is_tajik:
+            if not is_missing(val) and val.strip().lower() not in {"нет"}:
+                res["passport_series"] = val.upper()
+        elif "номер (таджик" in kl:
+            if not is_missing(val):
+                res["passport_number"] = val.upper()
+        elif ("номер" in kl and "паспорт" in kl) or key == "Номер":
+            if not is_missing(val):
+                res["passport_number"] = val.upper()
+        elif "дата" in kl and ("выдач" in kl or "passport" in kl):
+            res["issue_date"] = val
+        elif "срок действия" in kl or "действителен до" in kl:
+            res["expiry_date"] = val
+        elif "кем выдан" in kl or "authority" in kl:
+            res["authority"] = normalize_authority(val)
+        elif "страна" in kl or "гражданство" in kl:
+            res["nationality"] = normalize_nationality(val)
+        elif "мрз" in kl or "mrz" in kl:
+            res["mrz"] = val.upper()
+
+    if is_tajik:
+        res.pop("passport_series", None)
+
+    return res
+
+
+def baseline_contract(text: str):
+    res = {}
+    lines = text.splitlines()
+
+    for line in lines:
+        if ":" not in line:
+            continue
+        key, val = line.split(":", 1)
+        key, val = key.strip(), val.strip()
+        if "Номер договора" in key:
+            res['contract_number'] = val
+        elif "Дата договора" in key:
+            res['contract_date'] = val
+        elif "Должность" in key:
+            res['position'] = val
+        elif "Место работы" in key:
+            res['work_address'] = val
+        elif "Телефон" in key or "телефон" in key:
+            res['phone'] = val
+
+    if 'work_address' not in res:
+        for i, line in enumerate(lines):
+            if re.search(r'(?:^|\s)9[\.\)]|пункт\s*9', line.lower()):
+                work_address = line.split(":", 1)[1].strip() if ":" in line else ""
+                if not work_address and i+1 < len(lines):
+                    j = i + 1
+                    while j < len(lines) and not re.search(r'(?:^|\s)10[\.\)]|пункт\s*10', lines[j].lower()):
+                        work_address += " " + lines[j].strip()
+                        j += 1
+                res['work_address'] = work_address.strip()
+                break
+
+    return res
+
+
+# --- Генерация ответов ---
+
+# {документ: (прежний разбор, новый разбор, таблица полей, написания ключей)};
+# первые написания — ключи из промптов, остальные — как GPT пишет их иначе
+DOCUMENTS = {
+    "migration": (baseline_migration, parsers.parse_migration_fields, parsers._MIGRATION_TABLE, [
+        "Серия карты", "Номер карты", "Дата выдачи", "Цель визита",
+        "Серия карты (4 цифры)", "Номер карты (7 цифр)", "Дата выдачи карты",
+    ]),
+    "patent": (baseline_patent, parsers.parse_patent_fields, parsers._PATENT_TABLE, [
+        "Серия патента", "Номер патента", "Дата выдачи", "Кем выдан", "ФИО", "Серия и номер бланка", "ИНН",
+        "ФИО владельца", "ФИО (латиницей)", "Дата выдачи патента", "Серия и номер бланка патента",
+    ]),
+    "passport": (baseline_passport, parsers.parse_passport_fields, parsers._PASSPORT_TABLE, [
+        "ФИО", "ФИО (латиницей)", "Дата рождения", "Место рождения", "Пол", "Серия", "Номер",
+        "Номер (таджикский)", "Дата выдачи", "Срок действия", "Кем выдан", "Страна",
+        "Серия паспорта", "Номер паспорта", "Дата рождения владельца", "Место рождения (город)",
+        "Дата выдачи паспорта", "Действителен до", "Authority", "Гражданство", "MRZ", "МРЗ",
+    ]),
+    "contract": (baseline_contract, parsers.parse_contract_fields, parsers._CONTRACT_TABLE, [
+        "Номер договора", "Дата договора", "Должность", "Место работы", "Телефон",
+        "Номер договора (трудового)", "Контактный телефон",
+    ]),
+}
+
+# Символы, на которых splitlines() разрывает строку
+LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85  "
+
+values = st.one_of(
+    st.sampled_from(["Не найдено", "нет", "FA", "1234567", "01.02.1990", "МВД 12345", "UZBEKISTAN",
+                     "Таджикистан", "M", "Ж", "г. Москва, ул. Ленина, д. 1", "9. пункт", ""]),
+    st.text(st.characters(blacklist_categories=("Cs",), blacklist_characters=LINE_BREAKS), max_size=20),
+)
+noise = st.text(st.characters(blacklist_categories=("Cs",), blacklist_characters=LINE_BREAKS + ":"), max_size=30)
+# Приписки к ключу, не содержащие фрагментов ключей ни одного документа
+fillers = st.text("0123456789 .,()№", max_size=4)
+
+
+@st.composite
+def responses(draw, doc):
+    keys = DOCUMENTS[doc][3]
+    lines = []
+    for _ in range(draw(st.integers(0, 14))):
+        if draw(st.integers(0, 5)) == 0:
+            lines.append(draw(noise))
+        else:
+            padding = draw(st.sampled_from(["", " ", "  "]))
+            lines.append(f"{padding}{draw(st.sampled_from(keys))}{padding}: {draw(values)}")
+    return "\n".join(lines)
+
+
+@settings(max_examples=300)
+@given(st.data())
+def test_responses_parse_like_baseline(data):
+    for doc, (baseline, parse, _, _) in DOCUMENTS.items():
+        text = data.draw(responses(doc), label=doc)
+        assert parse(text) == baseline(text)
+
+
+@settings(max_examples=300)
+@given(st.data())
+def test_keys_with_extra_text_parse_like_baseline(data):
+    for doc, (baseline, parse, _, keys) in DOCUMENTS.items():
+        key = data.draw(fillers) + data.draw(st.sampled_from(keys)) + data.draw(fillers)
+        line = f"{key}: {data.draw(values)}"
+        assert parse(line) == baseline(line), (doc, line)
+
+
+@settings(max_examples=300)
+@given(st.data())
+def test_combined_keys_resolve_to_a_baseline_field(data):
+    # Прежний разбор выбирал поле по порядку веток, новый — по самым длинным фрагментам;
+    # для ключа из двух написаний новое поле — одно из тех, что дает прежний разбор
+    for doc, (baseline, parse, _, keys) in DOCUMENTS.items():
+        first, second = data.draw(st.sampled_from(keys)), data.draw(st.sampled_from(keys))
+        separator = data.draw(st.sampled_from([" ", " и ", ", ", " / "]))
+        line = f"{first}{separator}{second}: AB1"
+        candidates = [baseline(line), baseline(f"{first}: AB1"), baseline(f"{second}: AB1")]
+        assert parse(line) in candidates, (doc, line)
+
+
+@settings(max_examples=300)
+@given(st.data())
+def test_key_case_and_markup_do_not_matter(data):
+    for doc, (_, _, table, keys) in DOCUMENTS.items():
+        key = data.draw(st.sampled_from(keys)) + data.draw(fillers)
+        field = dict(parsers.key_fields(f"{key}: x", table))
+        for variant in (key.upper(), key.lower(), f"**{key}**", f"- {key}", f"  {'  '.join(key.split())}"):
+            assert dict(parsers.key_fields(f"{variant}: x", table)) == field, (doc, variant)
+
+
+def test_short_fragment_is_not_matched_inside_word():
+    assert parsers.parse_passport_fields("Полное имя: IVANOV IVAN") == {}
+    assert parsers.parse_passport_fields("Пол владельца: M") == {"sex": "МУЖСКОЙ"}
+    assert parsers.parse_patent_fields("Длинный номер: 1") == {}
+
+
+@settings(max_examples=300)
+@given(st.text("абвгдеклмнорстуя", min_size=1, max_size=5), st.booleans())
+def test_short_fragment_inside_word_is_not_a_field(letters, before):
+    word = f"{letters}пол" if before else f"пол{letters}"
+    assert dict(parsers.key_fields(f"{word}: x", parsers._PASSPORT_TABLE)).get("sex") is None
@@ -0,0 +1,109 @@
+import io
+import os
+
+import pytest
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from utils import fonts, mvd_notification_pdf, pdf_layers
+
+SAMPLE_DATA = {
+    "lastname": "ИВАНОВ",
+    "firstname": "ИВАН",
+    "citizenship": "УЗБЕКИСТАН",
+    "birthdate": "01.01.1990",
+    "passport_number": "FA1234567",
+    "position": "ПОДСОБНЫЙ РАБОЧИЙ",
+}
+
+
+def _render_blank(output):
+    c = canvas.Canvas(output, pagesize=A4)
+    c.drawString(100, 100, "skeleton")
+    c.save()
+
+
+def test_new_skeleton_removes_other_versions(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_layers, "PDF_SKELETON_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_layers, "_SKELETONS", {})
+    (tmp_path / "form-old.pdf").write_bytes(b"%PDF-old")
+    (tmp_path / "other-old.pdf").write_bytes(b"%PDF-old")
+
+    pdf_layers.get_skeleton("form", "new", _render_blank)
+
+    assert sorted(os.listdir(tmp_path)) == ["form-new.pdf", "other-old.pdf"]
+
+
+def _single_pass(data):
+    output = io.BytesIO()
+    c = canvas.Canvas(output, pagesize=A4)
+    mvd_notification_pdf.draw_notification_pages(c, mvd_notification_pdf.prepare_data_for_pdf(data))
+    c.save()
+    return output.getvalue()
+
+
+def _layered(data):
+    output = io.BytesIO()
+    mvd_notification_pdf.render_notification_pdf(data, output)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize("data", [
+    SAMPLE_DATA,
+    # Символы вне SHARED_CHARSET: шрифт слоя данных переносится в каркас
+    dict(SAMPLE_DATA, lastname="ЎРОҚОВ"),
+])
+def test_layered_pdf_embeds_font_once(tmp_path, monkeypatch, data):
+    if not fonts.form_fonts():
+        pytest.skip("нет TrueType-шрифта с кириллицей")
+    pymupdf = pytest.importorskip("pymupdf")
+    monkeypatch.setattr(pdf_layers, "PDF_SKELETON_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_layers, "_SKELETONS", {})
+
+    layered = _layered(data)
+
+    assert len(layered) < len(_single_pass(data)) * 0.95
+    document = pymupdf.open(stream=layered, filetype="pdf")
+    embedded = {xref for page in document for xref, ext, *_ in page.get_fonts() if ext != "n/a"}
+    assert len(embedded) == 1
+    # Значение рисуется по одной букве в клетке
+    assert " ".join(data["lastname"]) in document[0].get_text()
+
+
+def _text_chars(pdf):
+    """Символы страниц: (страница, символ, шрифт без префикса подмножества, размер, точка начала)."""
+    import pymupdf
+    chars = []
+    for page_no, page in enumerate(pymupdf.open(stream=pdf, filetype="pdf")):
+        for block in page.get_text("rawdict")["blocks"]:
+            for line in block.get("lines", []):
+                for span in line["spans"]:
+                    font = span["font"].split("+")[-1]
+                    chars.extend((page_no, char["c"], font, round(span["size"], 1),
+                                  round(char["origin"][0], 1), round(char["origin"][1], 1))
+                                 for char in span["chars"] if char["c"].strip())
+    return sorted(chars)
+
+
+@pytest.mark.parametrize("data", [
+    SAMPLE_DATA,
+    {},
+    # Отмеченный чекбокс меняет шрифт следующих надписей
+    dict(SAMPLE_DATA, contract_type="гражданско-правовой"),
+])
+def test_layered_pdf_text_matches_single_pass(tmp_path, monkeypatch, data):
+    pymupdf = pytest.importorskip("pymupdf")
+    monkeypatch.setattr(pdf_layers, "PDF_SKELETON_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_layers, "_SKELETONS", {})
+
+    layered, single = _layered(data), _single_pass(data)
+
+    assert _text_chars(layered) == _text_chars(single)
+    # Без сглаживания страницы совпадают попиксельно
+    pymupdf.TOOLS.set_aa_level(0)
+    try:
+        for layered_page, single_page in zip(pymupdf.open(stream=layered, filetype="pdf"),
+                                             pymupdf.open(stream=single, filetype="pdf")):
+            assert layered_page.get_pixmap(dpi=100).samples == single_page.get_pixmap(dpi=100).samples
+    finally:
+        pymupdf.TOOLS.set_aa_level(8)
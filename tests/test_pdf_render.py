@@ -0,0 +1,40 @@
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import pdf_render
+
+
+class _Executor:
+    """Пул, который отвечает заданным результатом или исключением."""
+
+    def __init__(self, result):
+        self.result = result
+        self.shut_down = False
+
+    def submit(self, func, *args):
+        future = Future()
+        if isinstance(self.result, Exception):
+            future.set_exception(self.result)
+        else:
+            future.set_result(self.result)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_pool_is_recreated_and_render_retried(monkeypatch):
+    broken, fresh = _Executor(BrokenProcessPool("процесс завершился")), _Executor(b"%PDF")
+    pools = iter([broken, fresh])
+    monkeypatch.setattr(pdf_render, "_EXECUTOR", None)
+
+    def get_executor():
+        if pdf_render._EXECUTOR is None:
+            pdf_render._EXECUTOR = next(pools)
+        return pdf_render._EXECUTOR
+
+    monkeypatch.setattr(pdf_render, "_get_executor", get_executor)
+
+    assert asyncio.run(pdf_render.render_notification_pdf({})) == b"%PDF"
+    assert broken.shut_down and pdf_render._EXECUTOR is fresh
@@ -0,0 +1,73 @@
+"""Тесты SQLitePersistence: изменения, пришедшие во время записи, и повтор после ошибки записи."""
+
+import asyncio
+import threading
+
+import utils.persistence as persistence
+from utils.persistence import SQLitePersistence
+
+
+def _reopen_user_data(path):
+    async def load():
+        return await SQLitePersistence(path).get_user_data()
+    return asyncio.run(load())
+
+
+def test_update_during_write_is_flushed(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "FLUSH_DELAY", 0.01)
+    path = str(tmp_path / "state.sqlite3")
+
+    async def scenario():
+        store = SQLitePersistence(path)
+        write = store._write
+        started, release = threading.Event(), threading.Event()
+
+        def slow_write(pending):
+            if not started.is_set():
+                started.set()
+                release.wait(5)
+            write(pending)
+
+        store._write = slow_write
+        await store.update_user_data(1, {"step": 1})
+        # Первая запись идет в потоке; обновление приходит в это время
+        while not started.is_set():
+            await asyncio.sleep(0.005)
+        await store.update_user_data(2, {"step": 2})
+        release.set()
+        # Никаких новых update_* и flush(): вторая запись должна произойти сама
+        for _ in range(200):
+            if not store._pending and store._flush_task.done():
+                break
+            await asyncio.sleep(0.01)
+        assert not store._pending
+
+    asyncio.run(scenario())
+    assert _reopen_user_data(path) == {1: {"step": 1}, 2: {"step": 2}}
+
+
+def test_failed_write_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "FLUSH_DELAY", 0.01)
+    path = str(tmp_path / "state.sqlite3")
+
+    async def scenario():
+        store = SQLitePersistence(path)
+        write = store._write
+        failures = []
+
+        def flaky_write(pending):
+            if not failures:
+                failures.append(1)
+                raise OSError("disk I/O error")
+            write(pending)
+
+        store._write = flaky_write
+        await store.update_user_data(1, {"documents": [{"bytes": b"x" * persistence.BLOB_MIN_SIZE}]})
+        for _ in range(200):
+            if not store._pending and store._flush_task.done():
+                break
+            await asyncio.sleep(0.01)
+        assert failures and not store._pending
+
+    asyncio.run(scenario())
+    assert _reopen_user_data(path) == {1: {"documents": [{"bytes": b"x" * persistence.BLOB_MIN_SIZE}]}}
@@ -0,0 +1,152 @@
+import asyncio
+import contextlib
+
+from utils import pipeline
+
+PROCESSING_MAP = {'паспорт': ('passport', 'Промпт паспорта', dict, [])}
+
+
+def _doc(digest):
+    return {'digest': digest, 'size': 1, 'name': f'паспорт {digest}.jpg', 'mime': 'image/jpeg'}
+
+
+def _fake_processing(monkeypatch):
+    """Подменяет OCR и GPT; возвращает список документов, для которых запрашивался GPT."""
+    extracted = []
+
+    async def ocr_document(content, mime, doc_type=None, name=None):
+        return f"текст {name}"
+
+    async def extract_fields(doc_type, raw_text, prompt, parser):
+        extracted.append(raw_text)
+        return {'text': raw_text}
+
+    monkeypatch.setattr(pipeline, "open_document", lambda doc: contextlib.nullcontext(b""))
+    monkeypatch.setattr(pipeline, "ocr_document", ocr_document)
+    monkeypatch.setattr(pipeline, "_extract_fields", extract_fields)
+    monkeypatch.setattr(pipeline, "_PREFETCH", {})
+    monkeypatch.setattr(pipeline, "_sweep_task", None)
+    return extracted
+
+
+def test_fields_are_prefetched_only_for_first_candidate(monkeypatch):
+    extracted = _fake_processing(monkeypatch)
+
+    async def scenario():
+        for digest in ("a", "b"):
+            pipeline.start_prefetch(1, _doc(digest), PROCESSING_MAP, combined=False)
+        tasks = pipeline.get_prefetched(1)
+        await asyncio.gather(*(task for doc_tasks in tasks.values() for task in doc_tasks.values() if task))
+        pipeline.cancel_prefetch(1)
+        return tasks
+
+    tasks = asyncio.run(scenario())
+
+    assert tasks['a']['fields'] is not None and tasks['b']['fields'] is None
+    assert tasks['b']['ocr'].result() == "текст паспорт b.jpg"
+    assert extracted == ["текст паспорт a.jpg"]
+
+
+def test_stale_prefetch_is_cancelled(monkeypatch):
+    _fake_processing(monkeypatch)
+
+    async def scenario():
+        pipeline.start_prefetch(1, _doc("a"), PROCESSING_MAP, combined=False)
+        tasks = pipeline.get_prefetched(1)['a']
+        assert pipeline.cleanup_prefetch(ttl=3600) == 0
+        assert pipeline.cleanup_prefetch(ttl=0) == 1
+        await asyncio.sleep(0)
+        return tasks
+
+    tasks = asyncio.run(scenario())
+
+    assert tasks['ocr'].cancelled() and tasks['fields'].cancelled()
+    assert pipeline.get_prefetched(1) == {}
+
+
+MULTI_MAP = {
+    'паспорт': ('passport', 'Промпт паспорта', dict, []),
+    'патент': ('patent', 'Промпт патента', dict, []),
+    'миграцион': ('migration', 'Промпт карты', dict, []),
+}
+
+
+def _named(name):
+    return {'digest': name, 'size': 1, 'name': name, 'mime': 'image/jpeg'}
+
+
+def _run(monkeypatch, documents, processing_map, ocr_texts, delays=None):
+    """Прогоняет run_document_pipeline на подмененных OCR и GPT: (результаты, вызовы on_progress)."""
+    delays = delays or {}
+    progress = []
+
+    async def ocr_document(content, mime, doc_type=None, name=None):
+        await asyncio.sleep(delays.get(name, 0))
+        text = ocr_texts[name]
+        if isinstance(text, Exception):
+            raise text
+        return text
+
+    async def extract_fields(doc_type, raw_text, prompt, parser):
+        return {'type': doc_type, 'text': raw_text}
+
+    async def on_progress(doc, ok):
+        progress.append((doc['name'], ok))
+
+    monkeypatch.setattr(pipeline, "open_document", lambda doc: contextlib.nullcontext(b""))
+    monkeypatch.setattr(pipeline, "ocr_document", ocr_document)
+    monkeypatch.setattr(pipeline, "_extract_fields", extract_fields)
+
+    async def scenario():
+        classified = pipeline.classify_documents(documents, processing_map)
+        return await pipeline.run_document_pipeline(documents, processing_map, classified, on_progress,
+                                                    combined=False)
+
+    return asyncio.run(scenario()), progress
+
+
+def test_results_follow_processing_map_order(monkeypatch):
+    documents = [_named("миграционная.jpg"), _named("патент.jpg"), _named("паспорт.jpg")]
+    texts = {doc['name']: f"текст {doc['name']}" for doc in documents}
+    # Паспорт обрабатывается дольше всех, но в результатах остается первым
+    results, progress = _run(monkeypatch, documents, MULTI_MAP, texts,
+                             delays={"паспорт.jpg": 0.03, "патент.jpg": 0.02})
+
+    assert list(results) == list(MULTI_MAP)
+    assert [data['type'] for data in results.values()] == ['passport', 'patent', 'migration']
+    assert [name for name, _ in progress] == ["миграционная.jpg", "патент.jpg", "паспорт.jpg"]
+
+
+def test_failed_or_empty_candidate_falls_back_to_next(monkeypatch):
+    documents = [_named("паспорт 1.jpg"), _named("паспорт 2.jpg"), _named("паспорт 3.jpg"),
+                 _named("патент 1.jpg"), _named("патент 2.jpg")]
+    texts = {
+        "паспорт 1.jpg": RuntimeError("Vision недоступен"),
+        "паспорт 2.jpg": "текст паспорта",
+        "паспорт 3.jpg": "не должен читаться",
+        "патент 1.jpg": "",
+        "патент 2.jpg": "текст патента",
+    }
+    results, _ = _run(monkeypatch, documents, MULTI_MAP, texts)
+
+    assert results == {
+        'паспорт': {'type': 'passport', 'text': "текст паспорта"},
+        'патент': {'type': 'patent', 'text': "текст патента"},
+        'миграцион': None,
+    }
+
+
+def test_progress_is_reported_once_per_finished_document(monkeypatch):
+    documents = [_named("паспорт 1.jpg"), _named("паспорт 2.jpg"), _named("паспорт 3.jpg"),
+                 _named("патент.jpg"), _named("миграционная.jpg")]
+    texts = {
+        "паспорт 1.jpg": RuntimeError("Vision недоступен"),
+        "паспорт 2.jpg": "текст паспорта",
+        "паспорт 3.jpg": "текст паспорта",
+        "патент.jpg": "текст патента",
+        # Пустой текст — документ пропускается без отчета, как в последовательной обработке
+        "миграционная.jpg": "",
+    }
+    _, progress = _run(monkeypatch, documents, MULTI_MAP, texts)
+
+    assert sorted(progress) == sorted([("паспорт 1.jpg", False), ("паспорт 2.jpg", True), ("патент.jpg", True)])
@@ -0,0 +1,87 @@
+"""
+Персистентный кэш строк на SQLite с LRU-вытеснением и сроком жизни записей.
+Используется для результатов OCR и ответов GPT, чтобы они переживали перезапуск бота.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCache:
+    """
+    Кэш «ключ → строка» в локальном файле SQLite.
+
+    Args:
+        path: Путь к файлу базы
+        max_entries: Максимум записей; при превышении удаляются давно не использованные
+        ttl: Время жизни записи в секундах (0 — без ограничения)
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000, ttl: float = 0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        """Возвращает значение по ключу или None, если записи нет или она устарела."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created = row
+            if self.ttl and now - created > self.ttl:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str):
+        """Сохраняет значение, удаляет устаревшие записи и вытесняет давно не использованные сверх лимита."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            if self.ttl:
+                self._conn.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl,))
+            count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Счетчики попаданий/промахов и текущее число записей."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
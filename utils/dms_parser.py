@@ -0,0 +1,233 @@
+"""
+Разбор ответа GPT по полису ДМС шаблонами, скомпилированными при импорте.
+
+Раньше parse_dms_fields перебирал около 30 шаблонов страховых компаний по
+одному, затем шаблон организационно-правовых форм, а для каждой строки —
+списки маркеров, исключений и шаблоны номера, даты и email; текст
+просматривался десятки раз. Теперь:
+- у каждой известной компании есть обязательный фрагмент названия (выводится
+  из шаблона при импорте); шаблон запускается, только если фрагмент есть в
+  тексте, — проверка подстроки в разы быстрее поиска по шаблону с IGNORECASE,
+  а порядок приоритета компаний прежний;
+- маркеры страховых компаний и признаки «не названия» — по одному шаблону;
+- шаблон «ОПФ + название» больше не уходит в экспоненциальный перебор на
+  строках заглавными буквами;
+- текст разбивается на строки один раз, поля «Ключ: значение» и кандидаты для
+  номера, даты и email собираются за один проход по строкам.
+"""
+
+import re
+
+# Известные страховые компании в порядке приоритета
+KNOWN_INSURERS = [
+    r'(?:ООО\s+)?(?:Страховая\s+компания\s+)?СОГАЗ(?:\s+МЕДИЦИНА)?',
+    r'(?:ООО\s+)?ИНГОССТРАХ(?:-М)?',
+    r'(?:ООО\s+)?РЕСО-Гарантия',
+    r'(?:ООО\s+)?(?:СК\s+)?Альфа-Страхование',
+    r'(?:ПАО\s+)?Росгосстрах',
+    r'(?:ООО\s+)?ВТБ\s+Страхование',
+    r'(?:ООО\s+)?(?:СК\s+)?Сбербанк\s+Страхование',
+    r'(?:ООО\s+)?(?:СК\s+)?АльфаСтрахование-ОМС',
+    r'(?:ООО\s+)?МАКС(?:\s+М)?',
+    r'(?:ООО\s+)?(?:СК\s+)?Капитал\s+Лайф\s+Страхование\s+Жизни',
+    r'(?:ООО\s+)?(?:СК\s+)?ЭРГО(?:\s+Русь)?',
+    r'(?:ООО\s+)?(?:СК\s+)?Гайде',
+    r'(?:ООО\s+)?(?:СК\s+)?УралСиб',
+    r'(?:АО\s+)?(?:СК\s+)?Энергогарант',
+    r'(?:ООО\s+)?(?:СК\s+)?Медэкспресс',
+    r'(?:ООО\s+)?(?:СК\s+)?Страховая\s+Группа\s+МСК',
+    r'(?:ООО\s+)?(?:СК\s+)?ЖАСО',
+    r'(?:ООО\s+)?(?:СК\s+)?Мед\s+Инвест',
+    r'(?:ООО\s+)?(?:СК\s+)?АСКО(?:-МЕД)?(?:\s+ДМС)?',
+    r'(?:ООО\s+)?(?:СК\s+)?Спасские\s+ворота(?:-М)?',
+    r'(?:ООО\s+)?(?:СК\s+)?Либерти\s+Страхование',
+    r'(?:ООО\s+)?(?:СК\s+)?МетЛайф',
+    r'(?:ООО\s+)?(?:СК\s+)?Группа\s+Ренессанс\s+Страхование',
+    r'(?:ООО\s+)?(?:СК\s+)?Открытие\s+Страхование',
+    r'(?:ООО\s+)?(?:СК\s+)?Зетта\s+Страхование',
+    r'(?:ООО\s+)?(?:СК\s+)?Рента',
+    r'(?:ООО\s+)?(?:СК\s+)?СОСЬЕТЕ\s+ЖЕНЕРАЛЬ\s+Страхование',
+    r'(?:ООО\s+)?(?:СК\s+)?Согласие',
+]
+
+# Признаки строки с названием страховой компании
+INSURANCE_MARKERS = [
+    'страхов', 'страхование', 'insurance', 'медицин', 'дмс', 'полис',
+    'согаз', 'ингос', 'ресо', 'альфа', 'росгос', 'втб', 'сбербанк',
+    'макс', 'капитал', 'эрго', 'гайде', 'уралсиб', 'энергогарант',
+    'медэкспресс', 'мск', 'жасо', 'аско', 'спасские', 'либерти',
+    'метлайф', 'ренессанс', 'открытие', 'зетта', 'рента', 'согласие'
+]
+
+# Признаки строки, которая не является названием
+NOT_A_NAME_PATTERNS = [
+    r'\d{6,}',  # Длинные числа (номера полисов)
+    r'\d{2}\.\d{2}\.\d{4}',  # Даты
+    r'\+?\d[\d\-\(\) ]{8,}',  # Телефоны
+    r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}',  # Email
+    r'(?:номер|серия|дата|период|с\s+\d|до\s+\d)',  # Технические поля
+]
+
+# Необязательные префиксы вида (?:ООО\s+)? в начале шаблона компании
+_OPTIONAL_PREFIX_RE = re.compile(r'^(?:\(\?:[^()]*\)\?)+')
+# Буквальный фрагмент: до первого спецсимвола регулярного выражения
+_LITERAL_RE = re.compile(r'^[^\\()\[\]{}|.*+?^$]+')
+
+
+def _required_fragment(pattern: str) -> str:
+    """Фрагмент, который обязан быть в тексте (в нижнем регистре), если шаблон компании совпал."""
+    core = _OPTIONAL_PREFIX_RE.sub('', pattern)
+    literal = _LITERAL_RE.match(core).group(0)
+    # Символ перед квантификатором необязателен
+    if core[len(literal):len(literal) + 1] in ('?', '*', '{'):
+        literal = literal[:-1]
+    return literal.lower()
+
+
+# [(обязательный фрагмент, шаблон)] в порядке приоритета KNOWN_INSURERS
+_KNOWN_INSURERS = [(_required_fragment(pattern), re.compile(pattern, re.IGNORECASE))
+                   for pattern in KNOWN_INSURERS]
+# ОПФ + название со словом «страх»/«медицин»/«полис». Раньше название задавалось как
+# (?:[А-ЯЁ][а-яё\s\-]*)* — с IGNORECASE классы пересекаются, и на длинной строке
+# заглавными без нужного слова поиск шел экспоненциально долго; форма ниже совпадает
+# с теми же строками за полиномиальное время.
+_ORG_FORM_RE = re.compile(
+    r'(?:ООО|АО|ПАО|ЗАО|НПФ|ОАО)\s+["\']?(?:[А-ЯЁ][а-яё\s\-]*)?(?:страх|медицин|полис)[а-яёА-ЯЁ\s\-]*["\']?',
+    re.IGNORECASE
+)
+_MARKERS_RE = re.compile("|".join(re.escape(marker) for marker in INSURANCE_MARKERS))
+_NOT_A_NAME_RE = re.compile("|".join(NOT_A_NAME_PATTERNS), re.IGNORECASE)
+# Номер или дата внутри названия: такое «название» отбрасывается
+_NUMBER_OR_DATE_RE = re.compile(r'\d{6,}|\d{2}\.\d{2}\.\d{4}')
+_HEADER_EXCLUSION_RE = re.compile(r'\d{6,}|\d{2}\.\d{2}\.\d{4}|\+?\d[\d\-\(\) ]{8,}')
+_HEADER_TERMS = ('СТРАХ', 'МЕДИЦИН', 'INSURANCE', 'СОГАЗ', 'ИНГОС', 'РЕСО')
+_EDGE_PUNCTUATION_RE = re.compile(r'^[^\w]*|[^\w]*$')
+
+_POLICY_NUMBER_RE = re.compile(r'(?:№|серия\s+DMS\s*№)\s*([0-9]+)', re.IGNORECASE)
+_POLICY_NUMBER_ALT_RE = re.compile(r'\b(?:полис|dms)\s+№?\s*([A-Za-zА-Яа-я0-9\-\/]+)', re.IGNORECASE)
+_ISSUE_DATE_RE = re.compile(r'дата\s+выдачи:\s*(\d{2}\.\d{2}\.\d{4})', re.IGNORECASE)
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+_LONG_NUMBER_RE = re.compile(r'\b(\d{10,15})\b')
+
+
+def _key_field(key_lower: str, val: str):
+    """Поле для строки «Ключ: значение» (None — строка не относится к полям ДМС)."""
+    if ("email" in key_lower or "почта" in key_lower or "e-mail" in key_lower) or "@" in val:
+        return 'insurance_expiry'
+    if "телефон" in key_lower or "phone" in key_lower:
+        return 'phone'
+    if "номер" in key_lower and ("полис" in key_lower or "дмс" in key_lower or "страхов" in key_lower):
+        return 'dms_number'
+    if "дата" in key_lower and ("выдач" in key_lower or "полис" in key_lower or "дмс" in key_lower
+                                or "страхов" in key_lower or "начал" in key_lower):
+        return 'insurance_date'
+    if (("страховая компания" in key_lower or "страховщик" in key_lower
+         or ("компан" in key_lower and "страхов" in key_lower)
+         or "insurance company" in key_lower or "insurer" in key_lower)
+            and "@" not in val and "телефон" not in key_lower):
+        # Новый формат ответа GPT: "Страховая компания: <название>" или "Insurance company: <название>"
+        return 'insurance_company' if val and val != "Не найдено" else None
+    return None
+
+
+def find_known_insurer(full_text: str):
+    """Известная страховая компания в тексте; при нескольких — первая по списку KNOWN_INSURERS."""
+    text_lower = full_text.lower()
+    for fragment, pattern in _KNOWN_INSURERS:
+        if fragment in text_lower:
+            match = pattern.search(full_text)
+            if match:
+                return match.group(0).strip()
+    return None
+
+
+def _insurer_from_lines(lines):
+    """Строка без «:», похожая на название страховой компании."""
+    for line in lines:
+        if ':' in line:
+            continue
+        line_clean = line.strip()
+        if len(line_clean) < 5:
+            continue
+        if _MARKERS_RE.search(line_clean.lower()) and not _NOT_A_NAME_RE.search(line_clean):
+            cleaned = _EDGE_PUNCTUATION_RE.sub('', line_clean)
+            if len(cleaned) > 5:
+                return cleaned
+    return None
+
+
+def _insurer_from_header(lines):
+    """Название заглавными буквами в шапке (первые 10 строк)."""
+    for line in lines[:10]:
+        if ':' in line or len(line.strip()) < 5:
+            continue
+        line_clean = line.strip()
+        line_upper = line_clean.upper()
+        # Часто названия компаний написаны заглавными в шапке
+        if (sum(1 for c in line_clean if c.isupper()) / len(line_clean) > 0.7
+                and not _HEADER_EXCLUSION_RE.search(line_clean)
+                and any(term in line_upper for term in _HEADER_TERMS)):
+            return line_clean
+    return None
+
+
+def find_insurance_company(lines, full_text: str):
+    """Название страховой компании: известные компании, ОПФ + «страх», строки-маркеры, шапка."""
+    company = find_known_insurer(full_text)
+    if company:
+        return company
+    match = _ORG_FORM_RE.search(full_text)
+    if match:
+        candidate = match.group(0).strip().strip('"\'')
+        # Проверяем, что это не содержит номера или даты
+        if not _NUMBER_OR_DATE_RE.search(candidate):
+            return candidate
+    return _insurer_from_lines(lines) or _insurer_from_header(lines)
+
+
+def parse_dms_fields(text: str):
+    res = {}
+    lines = text.splitlines()
+    number = issue_date = email = None
+
+    # Один проход: поля «Ключ: значение» и первые строки с номером, датой выдачи и email
+    for line in lines:
+        if ":" in line:
+            key, val = line.split(":", 1)
+            key, val = key.strip(), val.strip()
+            field = _key_field(key.lower(), val)
+            if field:
+                res[field] = val
+            if issue_date is None:
+                date_match = _ISSUE_DATE_RE.search(line)
+                if date_match:
+                    issue_date = date_match.group(1)
+        if number is None:
+            number_match = _POLICY_NUMBER_RE.search(line) or _POLICY_NUMBER_ALT_RE.search(line)
+            if number_match:
+                number = number_match.group(1)
+        if email is None and "@" in line:
+            email_match = _EMAIL_RE.search(line)
+            if email_match:
+                email = email_match.group(0)
+
+    full_text = " ".join(lines)
+    if 'insurance_company' not in res:
+        company = find_insurance_company(lines, full_text)
+        if company:
+            res['insurance_company'] = company
+
+    if 'dms_number' not in res and number is not None:
+        res['dms_number'] = number
+    if 'insurance_date' not in res and issue_date is not None:
+        res['insurance_date'] = issue_date
+    if 'insurance_expiry' not in res and email is not None:
+        res['insurance_expiry'] = email
+
+    # Последняя попытка найти номер полиса в полном тексте
+    if 'dms_number' not in res:
+        full_number_match = _LONG_NUMBER_RE.search(full_text)
+        if full_number_match:
+            res['dms_number'] = full_number_match.group(1)
+
+    return res
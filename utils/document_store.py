@@ -0,0 +1,217 @@
+"""
+Хранилище загруженных документов на локальном диске, адресуемое по содержимому.
+
+Раньше байты каждого загруженного файла лежали в user_data['documents'] до конца
+оформления, и память бота росла с числом незавершенных заявок. Теперь файл
+сохраняется в DOCUMENT_STORE_DIR под именем SHA-256 содержимого, а в user_data
+попадает только описание {'digest', 'size', 'name', 'mime'}. Когда документ
+нужен для OCR, файл отображается в память (mmap) и читается без копирования:
+хеш для кэша OCR считается прямо по отображению, поэтому при попадании в кэш
+содержимое не загружается в память процесса целиком. Открытие файла идет в
+потоке, а отображение закрывается сразу после OCR (open_document).
+
+Одинаковые файлы хранятся один раз. Файлы, к которым не обращались дольше
+DOCUMENT_STORE_TTL, удаляются фоновой задачей, кроме документов, на которые
+ссылаются незавершенные диалоги (в том числе восстановленные из SQLite после
+перезапуска): иначе такой диалог после паузы не смог бы прочитать свои файлы.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import mmap
+import os
+import sys
+import tempfile
+import time
+
+from config import DOCUMENT_STORE_DIR, DOCUMENT_STORE_TTL, DOCUMENT_STORE_CLEANUP_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_cleanup_task = None
+
+
+def _path(digest: str) -> str:
+    # Подкаталоги по первым двум символам, чтобы в одном каталоге не было слишком много файлов
+    return os.path.join(DOCUMENT_STORE_DIR, digest[:2], digest)
+
+
+def put_document(data, name: str, mime: str) -> dict:
+    """
+    Сохраняет содержимое файла и возвращает описание документа для user_data.
+
+    Returns:
+        dict: {'digest', 'size', 'name', 'mime'}
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    path = _path(digest)
+    if os.path.exists(path):
+        # Тот же файл уже сохранен — продлеваем срок хранения
+        os.utime(path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return {'digest': digest, 'size': len(data), 'name': name, 'mime': mime}
+
+
+def _map_document(doc: dict):
+    """(содержимое, отображение или None); отображение закрывает вызывающий."""
+    if 'bytes' in doc:
+        return doc['bytes'], None
+    path = _path(doc['digest'])
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b"", None
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    os.utime(path)
+    return memoryview(mapped), mapped
+
+
+@contextlib.asynccontextmanager
+async def open_document(doc: dict):
+    """
+    Содержимое документа из user_data без копирования в память процесса:
+    async with open_document(doc) as content: ...
+
+    Файл открывается и отображается в потоке; при выходе из блока отображение
+    закрывается, поэтому содержимое нельзя сохранять за пределами блока.
+
+    Yields:
+        memoryview | bytes: Отображение файла только для чтения; bytes — для
+            документов, сохраненных в user_data до появления хранилища
+    """
+    content, mapped = await asyncio.to_thread(_map_document, doc)
+    try:
+        yield content
+    finally:
+        if mapped is not None:
+            try:
+                content.release()
+                mapped.close()
+            except BufferError:
+                # Отображение еще читает поток (хеширование после отмены задачи) —
+                # оно закроется при сборке мусора
+                logger.debug(f"Отображение документа {doc['digest'][:16]}… еще используется")
+
+
+def referenced_digests(user_data_by_user) -> set:
+    """digest документов из user_data всех пользователей ({id: user_data}, как Application.user_data)."""
+    return {
+        doc['digest']
+        for user_data in user_data_by_user.values()
+        for doc in user_data.get('documents', [])
+        if doc.get('digest')
+    }
+
+
+def cleanup_documents(ttl: float = DOCUMENT_STORE_TTL, keep=frozenset()) -> int:
+    """
+    Удаляет документы, к которым не обращались дольше ttl секунд, кроме digest из keep;
+    возвращает число удаленных.
+    """
+    if not os.path.isdir(DOCUMENT_STORE_DIR):
+        return 0
+    deadline = time.time() - ttl
+    removed = 0
+    for entry in os.scandir(DOCUMENT_STORE_DIR):
+        if not entry.is_dir():
+            continue
+        for file in os.scandir(entry.path):
+            if file.name in keep:
+                continue
+            try:
+                if file.stat().st_mtime < deadline:
+                    os.unlink(file.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def document_store_stats() -> dict:
+    """Число файлов и их общий размер в хранилище."""
+    files = size = 0
+    if os.path.isdir(DOCUMENT_STORE_DIR):
+        for entry in os.scandir(DOCUMENT_STORE_DIR):
+            if entry.is_dir():
+                for file in os.scandir(entry.path):
+                    files += 1
+                    size += file.stat().st_size
+    return {"files": files, "bytes": size}
+
+
+def conversation_memory(user_data) -> dict:
+    """
+    Сколько памяти процесса занимает состояние диалога и сколько — его документы на диске.
+
+    Returns:
+        dict: {'memory_bytes': размер user_data в памяти (sys.getsizeof по всем
+            вложенным объектам), 'documents': число документов,
+            'stored_bytes': их общий размер в хранилище}
+    """
+    seen = set()
+    stack = [user_data]
+    memory = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        memory += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set)):
+            stack.extend(obj)
+    documents = user_data.get('documents', [])
+    return {
+        "memory_bytes": memory,
+        "documents": len(documents),
+        "stored_bytes": sum(doc.get('size', 0) for doc in documents),
+    }
+
+
+async def _cleanup_loop(referenced):
+    while True:
+        try:
+            # Ссылки собираются в цикле событий, где меняется user_data; удаление — в потоке
+            keep = referenced() if referenced else frozenset()
+            removed = await asyncio.to_thread(cleanup_documents, DOCUMENT_STORE_TTL, keep)
+            if removed:
+                stats = await asyncio.to_thread(document_store_stats)
+                logger.info(f"Хранилище документов: удалено устаревших файлов {removed}, "
+                            f"осталось {stats['files']} на {stats['bytes']} байт")
+        except Exception as e:
+            logger.error(f"Ошибка очистки хранилища документов: {e}")
+        await asyncio.sleep(DOCUMENT_STORE_CLEANUP_INTERVAL)
+
+
+async def start_document_store(referenced=None):
+    """
+    Создает каталог хранилища и запускает периодическую очистку устаревших документов.
+
+    Args:
+        referenced: Функция без аргументов, возвращающая digest документов, которые
+            нельзя удалять (см. referenced_digests)
+    """
+    global _cleanup_task
+    os.makedirs(DOCUMENT_STORE_DIR, exist_ok=True)
+    if _cleanup_task is None or _cleanup_task.done():
+        _cleanup_task = asyncio.get_running_loop().create_task(_cleanup_loop(referenced))
+
+
+def shutdown_document_store():
+    """Останавливает периодическую очистку."""
+    global _cleanup_task
+    if _cleanup_task is not None:
+        _cleanup_task.cancel()
+        _cleanup_task = None
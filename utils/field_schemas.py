@@ -0,0 +1,143 @@
+"""
+Схемы полей документов для структурированного ответа GPT (JSON Schema, strict).
+
+GPT возвращает JSON-объект с ключами полей, которые уже используются в
+user_data (fio, birthdate, dms_number, ...), поэтому ответ разбирается одним
+проверяющим декодером за O(числа полей) без эвристик по строкам текста.
+Парсеры из utils.parsers остаются запасным вариантом для текстовых ответов.
+"""
+
+import json
+import logging
+
+from utils.parsers import (
+    is_missing, normalize_authority, normalize_birth_place, normalize_nationality, normalize_sex
+)
+
+logger = logging.getLogger(__name__)
+
+# {схема: {ключ поля: описание для модели}}
+FIELD_SCHEMAS = {
+    'passport': {
+        'fio': "ФИО (Фамилия Имя Отчество) русскими буквами, ВСЕ ЗАГЛАВНЫМИ",
+        'fio_latin': "ФИО латиницей, ВСЕ ЗАГЛАВНЫМИ",
+        'birthdate': "Дата рождения, ДД.ММ.ГГГГ",
+        'birth_place': "Место рождения",
+        'sex': "Пол",
+        'passport_series': "Серия паспорта (null для таджикского паспорта)",
+        'passport_number': "Номер паспорта (у таджикского паспорта — весь номер)",
+        'issue_date': "Дата выдачи, ДД.ММ.ГГГГ",
+        'expiry_date': "Срок действия паспорта (до какого числа), ДД.ММ.ГГГГ",
+        'authority': "Кем выдан (например, МВД России, МВД Таджикистана, МВД Узбекистана)",
+        'nationality': "Страна паспорта",
+    },
+    # Паспорт с прочитанной MRZ: остальные поля берутся из нее
+    'passport_no_mrz_fields': {
+        'fio': "ФИО (Фамилия Имя Отчество) русскими буквами, ВСЕ ЗАГЛАВНЫМИ",
+        'birth_place': "Место рождения",
+        'issue_date': "Дата выдачи, ДД.ММ.ГГГГ",
+        'authority': "Кем выдан (например, МВД России, МВД Таджикистана, МВД Узбекистана)",
+    },
+    'migration': {
+        'migration_card_series': "Серия миграционной карты",
+        'migration_card_number': "Номер миграционной карты",
+        'migration_card_date': "Дата выдачи, ДД.ММ.ГГГГ",
+        'migration_card_purpose': "Цель визита",
+    },
+    'patent': {
+        'patent_series': "Серия патента",
+        'patent_number': "Номер патента",
+        'patent_date': "Дата выдачи, ДД.ММ.ГГГГ",
+        'patent_issuer': "Кем выдан",
+        'fio': "ФИО владельца русскими буквами",
+        'patent_blank': "Серия и номер бланка патента (на обороте внизу, например ПР4744675)",
+        'inn': "ИНН",
+    },
+    'dms': {
+        'dms_number': "Номер полиса ДМС",
+        'insurance_date': "Дата начала действия полиса, ДД.ММ.ГГГГ",
+        'insurance_company': "Полное официальное название страховой компании",
+        'phone': "Контактный телефон страховщика",
+        # Исторически в insurance_expiry хранится email страховщика (пункт 10 уведомления)
+        'insurance_expiry': "Адрес электронной почты страховщика",
+    },
+    'contract': {
+        'contract_number': "Номер трудового договора",
+        'contract_date': "Дата заключения трудового договора, ДД.ММ.ГГГГ",
+        'position': "Должность сотрудника",
+    },
+}
+
+# Нормализация значений — та же, что в текстовых парсерах
+FIELD_NORMALIZERS = {
+    'fio': str.upper,
+    'fio_latin': str.upper,
+    'birth_place': normalize_birth_place,
+    'sex': normalize_sex,
+    'passport_series': str.upper,
+    'passport_number': str.upper,
+    'authority': normalize_authority,
+    'nationality': normalize_nationality,
+}
+
+
+def json_schema(name: str) -> dict:
+    """JSON Schema схемы полей: все поля обязательны, отсутствующее значение — null."""
+    fields = FIELD_SCHEMAS[name]
+    return {
+        "type": "object",
+        "properties": {key: {"type": ["string", "null"], "description": description}
+                       for key, description in fields.items()},
+        "required": list(fields),
+        "additionalProperties": False,
+    }
+
+
+def response_format(name: str) -> dict:
+    """Параметр response_format Chat Completions для структурированного ответа по схеме."""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": json_schema(name)}}
+
+
+def decode_fields(content, name: str):
+    """
+    Проверяет и нормализует структурированный ответ GPT.
+
+    Args:
+        content: JSON-строка или уже разобранный объект
+        name: Имя схемы из FIELD_SCHEMAS
+
+    Returns:
+        dict: Найденные поля (отсутствующие не включаются) или None, если ответ
+            не соответствует схеме
+    """
+    fields = FIELD_SCHEMAS[name]
+    if isinstance(content, str):
+        try:
+            content = json.loads(content)
+        except ValueError as e:
+            logger.warning(f"Ответ GPT ({name}) не является JSON: {e}")
+            return None
+    if not isinstance(content, dict):
+        logger.warning(f"Ответ GPT ({name}) не является JSON-объектом")
+        return None
+    unknown = set(content) - set(fields)
+    if unknown:
+        logger.warning(f"Ответ GPT ({name}) содержит поля вне схемы: {sorted(unknown)}")
+        return None
+
+    res = {}
+    for key, value in content.items():
+        if value is None:
+            continue
+        if not isinstance(value, (str, int, float)):
+            logger.warning(f"Ответ GPT ({name}): поле {key} имеет тип {type(value).__name__}")
+            return None
+        value = str(value).strip()
+        if not value or is_missing(value):
+            continue
+        res[key] = FIELD_NORMALIZERS.get(key, str)(value)
+
+    # У таджикского паспорта серии нет
+    if res.get('nationality') == "ТАДЖИКИСТАН":
+        res.pop('passport_series', None)
+    return res
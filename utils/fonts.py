@@ -0,0 +1,104 @@
+"""
+Общий реестр шрифтов для генераторов PDF.
+
+Раньше каждая страница уведомления заново искала файлы шрифтов и разбирала
+TrueType-файлы. Теперь шрифты регистрируются один раз на процесс (лениво и
+потокобезопасно), а все модули генерации PDF используют этот реестр.
+"""
+
+import os
+import platform
+import logging
+import threading
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+logger = logging.getLogger(__name__)
+
+_LOCK = threading.RLock()
+# Уже зарегистрированные TrueType-шрифты: {(имя, путь): TTFont}
+_TTF_FONTS = {}
+# Результат register_fonts(): имя основного шрифта формы
+_FORM_FONT_NAME = None
+
+
+def get_font_paths():
+    """Возвращает кандидатов на шрифт с поддержкой кириллицы для текущей ОС."""
+    system = platform.system()
+    if system == "Windows":
+        return [
+            "C:/Windows/Fonts/arial.ttf",
+            "C:/Windows/Fonts/times.ttf",
+            "C:/Windows/Fonts/cour.ttf",  # Courier New
+        ]
+    if system == "Darwin":  # macOS
+        return [
+            "/Library/Fonts/Arial.ttf",
+            "/Library/Fonts/Times New Roman.ttf",
+            "/Library/Fonts/Courier New.ttf",
+        ]
+    # Linux и другие
+    return [
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+        "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    ]
+
+
+def register_ttf(font_name: str, font_path: str) -> TTFont:
+    """
+    Регистрирует TrueType-шрифт под именем font_name.
+    Файл разбирается только при первом вызове для пары (имя, путь).
+    """
+    key = (font_name, font_path)
+    with _LOCK:
+        font = _TTF_FONTS.get(key)
+        if font is None:
+            font = TTFont(font_name, font_path)
+            pdfmetrics.registerFont(font)
+            _TTF_FONTS[key] = font
+        return font
+
+
+def _register_form_fonts() -> str:
+    """Находит шрифт с кириллицей и регистрирует его как FormFont и CyrillicFont."""
+    font_name = "Helvetica"  # По умолчанию
+    for font_path in get_font_paths():
+        if os.path.exists(font_path):
+            try:
+                # Регистрируем шрифт для основного текста
+                register_ttf("FormFont", font_path)
+                # Регистрируем шрифт для кириллицы
+                register_ttf("CyrillicFont", font_path)
+                font_name = "FormFont"
+                logger.info(f"Зарегистрирован шрифт: {font_path}")
+                break
+            except Exception as e:
+                logger.warning(f"Не удалось зарегистрировать шрифт {font_path}: {e}")
+    else:
+        logger.warning("Не удалось зарегистрировать шрифт с поддержкой кириллицы, используем стандартный")
+    return font_name
+
+
+def register_fonts() -> str:
+    """
+    Регистрирует шрифты формы (FormFont, CyrillicFont) один раз на процесс.
+
+    Returns:
+        str: Имя основного шрифта ("FormFont" или "Helvetica")
+    """
+    global _FORM_FONT_NAME
+    if _FORM_FONT_NAME is None:
+        with _LOCK:
+            if _FORM_FONT_NAME is None:
+                _FORM_FONT_NAME = _register_form_fonts()
+    return _FORM_FONT_NAME
+
+
+def form_fonts() -> tuple:
+    """Имена TrueType-шрифтов формы в постоянном порядке; пусто, если шрифт с кириллицей не найден."""
+    return ("FormFont", "CyrillicFont") if register_fonts() == "FormFont" else ()
+
+
+def warm_up_fonts():
+    """Заранее регистрирует шрифты, чтобы первый PDF не тратил время на разбор TTF."""
+    return register_fonts()
@@ -1,27 +1,175 @@
+import asyncio
+import hashlib
+import json
 import logging
+import time
 import aiohttp
-from config import OPENAI_API_KEY
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, GPT_CACHE_ENABLED, GPT_CACHE_PATH,
+    GPT_CACHE_MAX_ENTRIES, GPT_CACHE_TTL
+)
+from utils.cache import SQLiteCache
+from utils.field_schemas import decode_fields, json_schema, response_format
+from utils.http import get_http_session
 
 logger = logging.getLogger(__name__)
 
-async def extract_doc_fields_with_gpt(raw_text: str, prompt: str):
-    url = "https://api.openai.com/v1/chat/completions"
+GPT_MODEL = "gpt-4o"
+
+# Ответы при одинаковых промпте и тексте детерминированы (temperature 0.1),
+# поэтому повторные запросы берутся из кэша
+GPT_CACHE = SQLiteCache(GPT_CACHE_PATH, max_entries=GPT_CACHE_MAX_ENTRIES, ttl=GPT_CACHE_TTL) if GPT_CACHE_ENABLED else None
+
+# Сколько запросов отправлено в API и сколько токенов потрачено с запуска процесса
+GPT_USAGE = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+# Совмещенный запрос: тексты нескольких документов в одном запросе, ответ — JSON по разделам
+COMBINED_PROMPT_HEADER = (
+    "Ниже несколько документов одного иностранного работника. Для каждого документа "
+    "выполни его инструкцию, но ответ верни одним JSON-объектом вида "
+    '{"<раздел>": {"<поле из формата ответа инструкции>": "<значение>"}}. '
+    "Названия полей пиши точно как в формате ответа инструкции, без номеров. "
+    "Если значение не найдено — пиши 'Не найдено'.\n"
+)
+# То же со структурированным ответом: поля каждого раздела задаются схемой
+COMBINED_STRUCTURED_PROMPT_HEADER = (
+    "Ниже несколько документов одного иностранного работника. Для каждого документа "
+    "найди поля из его инструкции и верни их в разделе ответа с тем же названием. "
+    "Формат ответа задан JSON-схемой; если значение не найдено — null.\n"
+)
+# Структурированный ответ по схеме: формат «Поле: значение» из промпта не используется
+STRUCTURED_PROMPT_NOTE = "Ответ верни JSON-объектом по заданной схеме; если значение не найдено — null.\n"
+
+def gpt_cache_key(raw_text: str, prompt: str, model: str = GPT_MODEL) -> str:
+    """Ключ кэша: модель + хэш промпта + хэш текста с нормализованными пробелами."""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    normalized_text = " ".join(raw_text.split())
+    text_hash = hashlib.sha256(normalized_text.encode("utf-8")).hexdigest()
+    return f"{model}:{prompt_hash}:{text_hash}"
+
+def schema_digest(schema) -> str:
+    """Хэш содержимого JSON-схемы ответа: при изменении полей или описаний схемы меняется ключ кэша."""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+async def _chat_completion(full_prompt: str, max_tokens: int = 512, response: dict = None):
+    """
+    Один запрос к Chat Completions. Возвращает текст ответа или None при ошибке.
+
+    Args:
+        response: Параметр response_format (JSON-объект или JSON-схема)
+    """
+    url = f"{OPENAI_BASE_URL}/chat/completions"
     headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
-    full_prompt = prompt + raw_text
     data = {
-        "model": "gpt-4o",
+        "model": GPT_MODEL,
         "messages": [{"role": "user", "content": full_prompt}],
-        "max_tokens": 512,
+        "max_tokens": max_tokens,
         "temperature": 0.1
     }
+    if response:
+        data["response_format"] = response
+    start = time.perf_counter()
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=120)) as resp:
-                res = await resp.json()
-                if "error" in res:
-                    logger.error(f"ChatGPT API error {resp.status}: {res['error']}")
-                    return "Ошибка при обработке документа (AI API)."
-                return res["choices"][0]["message"]["content"].strip()
+        session = await get_http_session()
+        async with session.post(url, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=120)) as resp:
+            res = await resp.json()
+            if "error" in res:
+                logger.error(f"ChatGPT API error {resp.status}: {res['error']}")
+                return None
+            content = res["choices"][0]["message"]["content"].strip()
     except Exception as e:
         logger.error(f"Ошибка при AI-сортировке: {e}", exc_info=True)
+        return None
+    usage = res.get("usage") or {}
+    GPT_USAGE["requests"] += 1
+    GPT_USAGE["prompt_tokens"] += usage.get("prompt_tokens", 0)
+    GPT_USAGE["completion_tokens"] += usage.get("completion_tokens", 0)
+    logger.info(f"GPT: {(time.perf_counter() - start) * 1000:.0f} мс, "
+                f"токены {usage.get('prompt_tokens', '?')} + {usage.get('completion_tokens', '?')}")
+    return content
+
+async def extract_doc_fields_with_gpt(raw_text: str, prompt: str, use_cache: bool = True, schema: str = None):
+    """
+    Извлекает поля документа через GPT.
+
+    Args:
+        schema: Имя схемы из utils.field_schemas — ответ приходит JSON-объектом
+            по схеме (structured output), иначе текстом «Поле: значение»
+    """
+    if schema:
+        prompt = STRUCTURED_PROMPT_NOTE + prompt
+    cache_prompt = f"{schema_digest(json_schema(schema))}{prompt}" if schema else prompt
+    cache_key = gpt_cache_key(raw_text, cache_prompt) if (GPT_CACHE is not None and use_cache) else None
+    if cache_key:
+        cached = await asyncio.to_thread(GPT_CACHE.get, cache_key)
+        if cached is not None:
+            logger.info(f"Ответ GPT из кэша ({GPT_CACHE.hits} попаданий / {GPT_CACHE.misses} промахов)")
+            return cached
+
+    content = await _chat_completion(prompt + raw_text, response=response_format(schema) if schema else None)
+    if content is None:
         return "Ошибка при обработке документа (AI)."
+
+    # Ошибки, пустые ответы и ответы не по схеме не кэшируем
+    if cache_key and content and "Ошибка при обработке документа" not in content \
+            and (not schema or decode_fields(content, schema) is not None):
+        await asyncio.to_thread(GPT_CACHE.set, cache_key, content)
+    return content
+
+async def extract_fields_combined(sections: dict, schemas: dict = None, use_cache: bool = True):
+    """
+    Извлекает поля нескольких документов одним запросом.
+
+    Args:
+        sections: {раздел: (промпт документа, текст OCR)}; промпты — те же, что
+            для отдельных запросов
+        schemas: {раздел: имя схемы из utils.field_schemas} — структурированный
+            ответ, каждый раздел по своей схеме; без схем ответ — JSON-объект
+            с полями из формата ответа промптов
+
+    Returns:
+        dict: {раздел: объект полей раздела} (разделы, которых нет в ответе,
+            пропускаются) или None, если запрос или разбор JSON не удался
+    """
+    body = "".join(
+        f"\n### Раздел: {name}\nИнструкция:\n{prompt}\n{raw_text}\n"
+        for name, (prompt, raw_text) in sections.items()
+    )
+    if schemas:
+        header = COMBINED_STRUCTURED_PROMPT_HEADER
+        schema = {
+            "type": "object",
+            "properties": {name: json_schema(schemas[name]) for name in sections},
+            "required": list(sections),
+            "additionalProperties": False,
+        }
+        response = {"type": "json_schema", "json_schema": {"name": "documents", "strict": True, "schema": schema}}
+    else:
+        header = COMBINED_PROMPT_HEADER
+        response = {"type": "json_object"}
+    cache_key = gpt_cache_key(body, f"{schema_digest(response)}{header}") if (GPT_CACHE is not None and use_cache) else None
+    # Запросы к SQLite — в потоке, чтобы не блокировать цикл событий
+    content = await asyncio.to_thread(GPT_CACHE.get, cache_key) if cache_key else None
+    cached = content is not None
+    if cached:
+        logger.info(f"Совмещенный ответ GPT из кэша ({GPT_CACHE.hits} попаданий / {GPT_CACHE.misses} промахов)")
+    else:
+        content = await _chat_completion(header + body, max_tokens=512 * len(sections), response=response)
+        if content is None:
+            return None
+    try:
+        parsed = json.loads(content)
+    except ValueError as e:
+        logger.error(f"Совмещенный ответ GPT не является JSON: {e}")
+        return None
+    if not isinstance(parsed, dict):
+        logger.error("Совмещенный ответ GPT не является JSON-объектом")
+        return None
+
+    answers = {name: parsed[name] for name in sections if isinstance(parsed.get(name), dict)}
+    # Кэшируем только новый ответ, в котором есть все разделы и каждый прошел проверку схемы
+    valid = len(answers) == len(sections) and (
+        not schemas or all(decode_fields(answers[name], schemas[name]) is not None for name in sections))
+    if cache_key and not cached and valid:
+        await asyncio.to_thread(GPT_CACHE.set, cache_key, content)
+    return answers
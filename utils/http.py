@@ -0,0 +1,35 @@
+"""
+Общий HTTP-клиент aiohttp на все время работы бота.
+
+Сессия создается при запуске (main.py, post_init) и закрывается при остановке,
+поэтому TCP/TLS-соединения с API переиспользуются между запросами.
+"""
+
+import logging
+import aiohttp
+from config import HTTP_CONNECTION_LIMIT, HTTP_DNS_CACHE_TTL, HTTP_KEEPALIVE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+_SESSION = None
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Возвращает общую сессию, создавая ее при первом обращении."""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_CONNECTION_LIMIT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        )
+        _SESSION = aiohttp.ClientSession(connector=connector)
+        logger.info(f"Создана HTTP-сессия (лимит соединений: {HTTP_CONNECTION_LIMIT})")
+    return _SESSION
+
+async def close_http_session():
+    """Закрывает общую сессию и все открытые соединения."""
+    global _SESSION
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+        logger.info("HTTP-сессия закрыта")
+    _SESSION = None
@@ -0,0 +1,171 @@
+"""
+Поиск и разбор машиночитаемой зоны паспорта (MRZ, формат TD3 — две строки по 44 символа).
+
+Фамилия, имя латиницей, номер паспорта, дата рождения, пол, гражданство и срок
+действия берутся из MRZ детерминированно и проверяются контрольными цифрами,
+поэтому GPT нужен только для полей, которых в MRZ нет (ФИО кириллицей,
+место рождения, дата выдачи, кем выдан).
+"""
+
+import logging
+import re
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+TD3_LENGTH = 44
+# Строки короче этого не считаются строками MRZ, даже если OCR потерял часть «<»
+TD3_MIN_LENGTH = 40
+
+_MRZ_LINE = re.compile(r"^[A-Z0-9<]+$")
+# Частые ошибки OCR в MRZ: заполнитель «<» распознается как «‹», «(», «[» и т.п.
+_FILLER_FIXES = str.maketrans({"«": "<", "‹": "<", "〈": "<", "(": "<", "[": "<", "{": "<"})
+# Буквы, которые OCR путает с цифрами, в полях, где допустимы только цифры
+_DIGIT_FIXES = str.maketrans({"O": "0", "Q": "0", "D": "0", "I": "1", "L": "1", "Z": "2",
+                              "S": "5", "B": "8", "G": "6", "<": "0"})
+_CHECK_WEIGHTS = (7, 3, 1)
+
+# Коды государств ICAO → гражданство, как его пишет парсер паспорта
+NATIONALITIES = {
+    "UZB": "УЗБЕКИСТАН",
+    "TJK": "ТАДЖИКИСТАН",
+    "KGZ": "КИРГИЗИЯ",
+    "KAZ": "КАЗАХСТАН",
+    "TKM": "ТУРКМЕНИСТАН",
+    "ARM": "АРМЕНИЯ",
+    "AZE": "АЗЕРБАЙДЖАН",
+    "GEO": "ГРУЗИЯ",
+    "MDA": "МОЛДОВА",
+    "BLR": "БЕЛАРУСЬ",
+    "UKR": "УКРАИНА",
+    "RUS": "РОССИЯ",
+}
+
+
+def check_digit(value: str) -> str:
+    """Контрольная цифра ICAO 9303: веса 7-3-1, A=10…Z=35, «<»=0."""
+    total = 0
+    for i, ch in enumerate(value):
+        if ch.isdigit():
+            code = int(ch)
+        elif "A" <= ch <= "Z":
+            code = ord(ch) - ord("A") + 10
+        else:
+            code = 0
+        total += code * _CHECK_WEIGHTS[i % 3]
+    return str(total % 10)
+
+
+def _normalize_line(line: str) -> str:
+    return line.upper().translate(_FILLER_FIXES).replace(" ", "")
+
+
+def find_td3(text: str):
+    """
+    Ищет две строки MRZ паспорта в тексте OCR.
+
+    Returns:
+        tuple: (строка 1, строка 2), дополненные «<» до 44 символов, или None
+    """
+    lines = [_normalize_line(line) for line in text.splitlines()]
+    for first, second in zip(lines, lines[1:]):
+        if not first.startswith("P") or not _MRZ_LINE.match(first) or not _MRZ_LINE.match(second):
+            continue
+        if not (TD3_MIN_LENGTH <= len(first) <= TD3_LENGTH and TD3_MIN_LENGTH <= len(second) <= TD3_LENGTH):
+            continue
+        return first.ljust(TD3_LENGTH, "<"), second.ljust(TD3_LENGTH, "<")
+    return None
+
+
+def _mrz_date(value: str, future: bool) -> str:
+    """YYMMDD → ДД.ММ.ГГГГ; век выбирается по тому, в прошлом ли дата (рождение) или нет (срок)."""
+    year, month, day = int(value[:2]), int(value[2:4]), int(value[4:6])
+    current = date.today().year % 100
+    if future:
+        century = 2000 if year < current + 50 else 1900
+    else:
+        century = 1900 if year > current else 2000
+    date(century + year, month, day)  # ValueError для несуществующей даты
+    return f"{day:02d}.{month:02d}.{century + year}"
+
+
+def parse_td3(first: str, second: str):
+    """
+    Разбирает MRZ паспорта (TD3) с проверкой контрольных цифр.
+
+    Returns:
+        dict: {'surname', 'given_names', 'number', 'country', 'nationality',
+            'birthdate', 'sex', 'expiry_date', 'personal_number'} или None,
+            если хоть одна контрольная цифра не сошлась
+    """
+    number, number_check = second[0:9], second[9]
+    nationality = second[10:13]
+    birth = second[13:19].translate(_DIGIT_FIXES)
+    birth_check = second[19].translate(_DIGIT_FIXES)
+    sex = second[20]
+    expiry = second[21:27].translate(_DIGIT_FIXES)
+    expiry_check = second[27].translate(_DIGIT_FIXES)
+    personal, personal_check = second[28:42], second[42].translate(_DIGIT_FIXES)
+    composite_check = second[43].translate(_DIGIT_FIXES)
+
+    checks = [
+        (number, number_check),
+        (birth, birth_check),
+        (expiry, expiry_check),
+        # Пустой личный номер может иметь контрольную цифру «<» — она равна 0
+        (personal, personal_check),
+        (number + number_check + birth + birth_check + expiry + expiry_check + personal + personal_check,
+         composite_check),
+    ]
+    for value, check in checks:
+        if check_digit(value) != check:
+            logger.info("MRZ найдена, но контрольные цифры не сходятся")
+            return None
+    try:
+        birthdate = _mrz_date(birth, future=False)
+        expiry_date = _mrz_date(expiry, future=True)
+    except ValueError:
+        logger.info("MRZ найдена, но даты в ней некорректны")
+        return None
+
+    surname, _, given_names = first[5:].partition("<<")
+    return {
+        "surname": surname.replace("<", " ").strip(),
+        "given_names": given_names.replace("<", " ").strip(),
+        "number": number.replace("<", ""),
+        "country": first[2:5].replace("<", ""),
+        "nationality": nationality.replace("<", ""),
+        "birthdate": birthdate,
+        "sex": sex,
+        "expiry_date": expiry_date,
+        "personal_number": personal.replace("<", ""),
+    }
+
+
+def mrz_passport_fields(text: str) -> dict:
+    """
+    Поля паспорта из MRZ в формате parse_passport_fields (пустой словарь, если
+    MRZ нет или она не прошла проверку).
+    """
+    lines = find_td3(text)
+    if not lines:
+        return {}
+    mrz = parse_td3(*lines)
+    if not mrz:
+        return {}
+    res = {
+        "fio_latin": f"{mrz['surname']} {mrz['given_names']}".strip(),
+        "birthdate": mrz["birthdate"],
+        "expiry_date": mrz["expiry_date"],
+        "nationality": NATIONALITIES.get(mrz["nationality"], mrz["nationality"]),
+        "mrz": "\n".join(lines),
+    }
+    if mrz["sex"] in ("M", "F"):
+        res["sex"] = "МУЖСКОЙ" if mrz["sex"] == "M" else "ЖЕНСКИЙ"
+    # Буквенный префикс номера — серия (кроме таджикских паспортов, где серии нет)
+    series = re.match(r"^([A-Z]+)(\d+)$", mrz["number"])
+    if series and mrz["country"] != "TJK":
+        res["passport_series"], res["passport_number"] = series.groups()
+    else:
+        res["passport_number"] = mrz["number"]
+    return res
@@ -1,13 +1,18 @@
 import os
-import platform
 import logging
 import re
 from datetime import datetime
-from reportlab.pdfgen import canvas
+from functools import lru_cache
+from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+
+from utils.fonts import register_fonts, get_font_paths, form_fonts
+from utils.pdf_layers import (
+    StaticLayerCanvas, DataLayerCanvas, LAYER_STATIC, LAYER_DATA, form_layer, value_font, draw_value, draw_value_line,
+    layout_version, get_skeleton, merge_layers
+)
 
 # Настраиваем логгер
 logging.basicConfig(level=logging.INFO)
@@ -60,52 +65,6 @@ COMPANY_DATA = {
     # Здесь можно добавить другие компании по мере необходимости
 }
 
-# Регистрируем шрифты с поддержкой кириллицы
-def register_fonts():
-    """Регистрирует шрифты для использования в PDF"""
-    font_registered = False
-    font_name = "Helvetica"  # По умолчанию
-    
-    # Определяем операционную систему и пути к шрифтам
-    system = platform.system()
-    if system == "Windows":
-        font_paths = [
-            "C:/Windows/Fonts/arial.ttf",
-            "C:/Windows/Fonts/times.ttf",
-            "C:/Windows/Fonts/cour.ttf",  # Courier New
-        ]
-    elif system == "Darwin":  # macOS
-        font_paths = [
-            "/Library/Fonts/Arial.ttf",
-            "/Library/Fonts/Times New Roman.ttf",
-            "/Library/Fonts/Courier New.ttf",
-        ]
-    else:  # Linux и другие
-        font_paths = [
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-            "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
-        ]
-    
-    # Пробуем зарегистрировать шрифт
-    for font_path in font_paths:
-        if os.path.exists(font_path):
-            try:
-                # Регистрируем шрифт для основного текста
-                pdfmetrics.registerFont(TTFont("FormFont", font_path))
-                # Регистрируем шрифт для кириллицы
-                pdfmetrics.registerFont(TTFont("CyrillicFont", font_path))
-                font_name = "FormFont"
-                font_registered = True
-                logger.info(f"Зарегистрирован шрифт: {font_path}")
-                break
-            except Exception as e:
-                logger.warning(f"Не удалось зарегистрировать шрифт {font_path}: {e}")
-    
-    if not font_registered:
-        logger.warning("Не удалось зарегистрировать шрифт с поддержкой кириллицы, используем стандартный")
-    
-    return font_name
-
 def parse_document_series_number(full_number):
     """
     Разделяет серию и номер документа.
@@ -461,14 +420,22 @@ def draw_multiline_char_cells(c, x, y, text, cells_per_line, max_lines=3, cell_w
     
     return lines_used
 
+@lru_cache(maxsize=4096)
+def glyph_width(font_name, font_size, char):
+    """Ширина символа в пунктах (кэшируется по шрифту, размеру и символу)."""
+    return pdfmetrics.stringWidth(char, font_name, font_size)
+
 # Функция для рисования клеток с символами
 def draw_char_cells(c, x, y, text, num_cells, cell_width=CELL_WIDTH, cell_height=CELL_HEIGHT, font_size=FONT_SIZE):
     """
     Рисует сетку клеток и заполняет их символами текста.
     Поддерживает кириллицу с улучшенной читаемостью.
+
+    Все клетки строки рисуются одним контуром, а символы — одним текстовым
+    объектом с единственной установкой шрифта и цвета.
     """
-    # Подготавливаем текст
-    clean_text = str(text).strip().upper() if text else ""
+    # Подготавливаем текст (в каркасе формы клетки остаются пустыми)
+    clean_text = str(text).strip().upper() if text and form_layer(c) != LAYER_STATIC else ""
     
     # Преобразуем в строку если это не строка
     try:
@@ -480,40 +447,37 @@ def draw_char_cells(c, x, y, text, num_cells, cell_width=CELL_WIDTH, cell_height
     # Увеличиваем размер шрифта для лучшей читаемости
     display_font_size = font_size + 1
     
-    # Рисуем клетки и символы
-    for i in range(num_cells):
-        cell_x = x + i * cell_width
-        
-        # Рисуем границы клетки с более толстыми линиями
-        c.setLineWidth(0.8)  # Немного толще стандартной линии
-        c.rect(cell_x, y, cell_width, cell_height)
-        
-        # Помещаем символ в клетку если он есть
-        if i < len(clean_text):
-            char = clean_text[i]
-            try:
-                # Используем кириллический шрифт для всех символов для единообразия
-                c.setFont("CyrillicFont", display_font_size)
-                
-                # Центрируем символ в клетке более точно
-                char_width = c.stringWidth(char, "CyrillicFont", display_font_size)
-                char_x = cell_x + (cell_width - char_width) / 2
-                char_y = y + (cell_height - display_font_size) / 2 + 1  # Немного выше для лучшего вида
-                
-                # Устанавливаем черный цвет для максимального контраста
-                c.setFillColor(colors.black)
-                
-                # Рисуем символ
-                c.drawString(char_x, char_y, char)
-                
-            except Exception as e:
-                logger.warning(f"Ошибка при отображении символа '{char}': {e}")
-                try:
-                    c.setFont("CyrillicFont", display_font_size)
-                    c.setFillColor(colors.black)
-                    c.drawCentredString(cell_x + cell_width/2, y + cell_height/3, "?")
-                except:
-                    pass
+    # Рисуем границы клеток с более толстыми линиями одним контуром
+    # (в слое данных клеток нет — они уже есть в каркасе формы)
+    c.setLineWidth(0.8)  # Немного толще стандартной линии
+    if form_layer(c) != LAYER_DATA:
+        path = c.beginPath()
+        for i in range(num_cells):
+            path.rect(x + i * cell_width, y, cell_width, cell_height)
+        c.drawPath(path, stroke=1, fill=0)
+    
+    # Помещаем символы в клетки
+    if clean_text:
+        try:
+            # Используем кириллический шрифт для всех символов для единообразия,
+            # черный цвет — для максимального контраста
+            text_obj = c.beginText()
+            text_obj.setFont("CyrillicFont", display_font_size)
+            text_obj.setFillColor(colors.black)
+            char_y = y + (cell_height - display_font_size) / 2 + 1  # Немного выше для лучшего вида
+            for i, char in enumerate(clean_text[:num_cells]):
+                # Центрируем символ в клетке
+                char_width = glyph_width("CyrillicFont", display_font_size, char)
+                text_obj.setTextOrigin(x + i * cell_width + (cell_width - char_width) / 2, char_y)
+                text_obj.textOut(char)
+            c.drawText(text_obj)
+        except Exception as e:
+            logger.warning(f"Ошибка при отображении текста '{clean_text}': {e}")
+
+    # Состояние холста после символов — как при посимвольной отрисовке
+    value_font(c, "CyrillicFont", display_font_size, bool(clean_text))
+    if clean_text:
+        c.setFillColor(colors.black)
     
     # Возвращаем толщину линии к стандартной
     c.setLineWidth(0.5)
@@ -530,9 +494,9 @@ def draw_lines(c, x, y, width, num_lines=1, line_spacing=20):
 def draw_checkbox(c, x, y, checked=False, size=13.5):
     """Рисует checkbox"""
     c.rect(x, y, size, size)
+    value_font(c, "FormFont", 12, checked)
     if checked:
-        c.setFont("FormFont", 12)
-        c.drawString(x + 3, y + 2, "X")
+        draw_value(c, x + 3, y + 2, "X")
 
 # Функция для обработки даты
 def format_date(date_str):
@@ -1306,11 +1270,12 @@ def create_page_5(c, data):
     
     # Выводим ФИО на строке после "дана"
     if patent_fio:
-        c.drawString(MARGIN_LEFT + 40, y_pos, patent_fio.upper())
+        draw_value(c, MARGIN_LEFT + 40, y_pos, patent_fio.upper())
     
-    # Длинная линия для ФИО (остается для дополнения если нужно)
-    c.line(MARGIN_LEFT + 40 + len(patent_fio) * 6 if patent_fio else MARGIN_LEFT + 40, 
-           y_pos - 2, PAGE_WIDTH - MARGIN_RIGHT, y_pos - 2)
+    # Длинная линия для ФИО (остается для дополнения если нужно);
+    # ее начало зависит от длины ФИО, поэтому она рисуется в слое данных
+    draw_value_line(c, MARGIN_LEFT + 40 + len(patent_fio) * 6 if patent_fio else MARGIN_LEFT + 40, 
+                    y_pos - 2, PAGE_WIDTH - MARGIN_RIGHT, y_pos - 2)
     
     # Пояснительный текст под первой линией ФИО
     y_pos -= 20
@@ -1380,6 +1345,61 @@ def create_notification_from_db_data(user_data, output_dir="notifications"):
         traceback.print_exc()
         return None
 
+def draw_notification_pages(c, data):
+    """Рисует все пять страниц уведомления на холсте c."""
+    create_page_1(c, data)
+    c.showPage()
+    
+    create_page_2(c, data)
+    c.showPage()
+    
+    create_page_3(c, data)
+    c.showPage()
+    
+    create_page_4(c, data)
+    c.showPage()
+    
+    create_page_5(c, data)
+
+def render_notification_skeleton(output):
+    """Рисует статический каркас уведомления: надписи и пустые клетки без данных."""
+    c = StaticLayerCanvas(output, pagesize=A4, shared_fonts=form_fonts())
+    draw_notification_pages(c, prepare_data_for_pdf({}))
+    c.save()
+
+@lru_cache(maxsize=None)
+def notification_layout_version():
+    """Версия макета уведомления: меняется вместе с кодом отрисовки или шрифтом формы."""
+    font_path = next((p for p in get_font_paths() if os.path.exists(p)), "")
+    return layout_version(__file__, layout_version.__code__.co_filename, extra=font_path)
+
+def get_notification_skeleton():
+    """PDF статического каркаса уведомления (кэшируется в памяти и на диске)."""
+    return get_skeleton("mvd_notification", notification_layout_version(), render_notification_skeleton)
+
+def render_notification_pdf(data, output):
+    """
+    Рисует уведомление по официальному шаблону МВД: на закэшированный каркас
+    формы накладывается слой только с данными.
+
+    Args:
+        data (dict): Данные для заполнения формы
+        output: Путь к файлу или файлоподобный объект (например, BytesIO)
+    """
+    skeleton = get_notification_skeleton()
+
+    # Подготавливаем данные с автозаполнением
+    prepared_data = prepare_data_for_pdf(data)
+    
+    # Рисуем только введенные значения
+    data_buffer = BytesIO()
+    c = DataLayerCanvas(data_buffer, pagesize=A4, shared_fonts=form_fonts())
+    draw_notification_pages(c, prepared_data)
+    c.save()
+    
+    # Накладываем данные на каркас и сохраняем PDF
+    merge_layers(skeleton, data_buffer.getvalue(), output)
+
 def create_notification_pdf_by_template(data, output_path):
     """
     Создает PDF уведомление по официальному шаблону МВД с точным позиционированием.
@@ -1392,29 +1412,7 @@ def create_notification_pdf_by_template(data, output_path):
         str: Путь к созданному файлу или None в случае ошибки
     """
     try:
-        # Подготавливаем данные с автозаполнением
-        prepared_data = prepare_data_for_pdf(data)
-        
-        # Создаем объект PDF
-        c = canvas.Canvas(output_path, pagesize=A4)
-        
-        # Создаем страницы по эталону
-        create_page_1(c, prepared_data)
-        c.showPage()
-        
-        create_page_2(c, prepared_data)
-        c.showPage()
-        
-        create_page_3(c, prepared_data)
-        c.showPage()
-        
-        create_page_4(c, prepared_data)
-        c.showPage()
-        
-        create_page_5(c, prepared_data)
-        
-        # Сохраняем PDF
-        c.save()
+        render_notification_pdf(data, output_path)
         logging.info(f"Создан PDF по официальному шаблону МВД: {output_path}")
         return output_path
     
@@ -1424,6 +1422,26 @@ def create_notification_pdf_by_template(data, output_path):
         traceback.print_exc()
         return None
 
+def create_notification_pdf_bytes(data):
+    """
+    Создает PDF уведомление по официальному шаблону МВД в памяти, без временных файлов.
+    
+    Args:
+        data (dict): Данные для заполнения формы
+        
+    Returns:
+        bytes: Содержимое PDF или None в случае ошибки
+    """
+    try:
+        buffer = BytesIO()
+        render_notification_pdf(data, buffer)
+        logging.info(f"Создан PDF по официальному шаблону МВД в памяти ({buffer.tell()} байт)")
+        return buffer.getvalue()
+    
+    except Exception as e:
+        logging.error(f"Ошибка при создании PDF: {e}", exc_info=True)
+        return None
+
 # Тестирование функции генерации PDF
 if __name__ == "__main__":
     # Тестовые данные с новыми полями
@@ -1,10 +1,25 @@
+import asyncio
+import hashlib
 import logging
+import os
+import re
+import tempfile
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from google.cloud import vision
 from google.oauth2 import service_account
-from io import BytesIO
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
-from config import SERVICE_ACCOUNT_JSON
+from pypdf import PdfReader
+from config import (
+    SERVICE_ACCOUNT_JSON, OCR_MAX_WORKERS, OCR_MAX_IN_FLIGHT, OCR_TIMEOUT,
+    OCR_CACHE_PATH, OCR_CACHE_MAX_ENTRIES, OCR_CACHE_TTL, OCR_ENGINE, OCR_FALLBACK_ENGINE
+)
+from utils.cache import SQLiteCache
+from utils.ocr_engines import is_local_engine, local_ocr_pages
+from utils.page_select import select_pages
+from utils.ocr_image import PREVIEW_DPI, PREPARE_SIGNATURE, choose_dpi, fit_pixel_budget, encode_for_ocr, prepare_photo
 
 logger = logging.getLogger(__name__)
 
@@ -14,41 +29,391 @@ if SERVICE_ACCOUNT_JSON:
 else:
     GCV_CLIENT = None
 
-def convert_pdf_to_png(pdf_bytes: bytes, pages: list = None) -> list:
-    if pages is None:
-        pages = []
-    images = convert_from_bytes(pdf_bytes, dpi=300, first_page=min(pages) if pages else 1, 
-                                last_page=max(pages) if pages else None)
-    result = []
-    for img in images:
-        buf = BytesIO()
-        img.save(buf, format="PNG")
-        result.append(buf.getvalue())
-    return result
+# Максимум изображений в одном запросе batch_annotate_images (ограничение Vision API)
+GCV_BATCH_SIZE = 16
 
-def gcv_ocr_multiple(images: list) -> str:
+# Текстовый слой страницы PDF используется вместо OCR, если в нем не меньше
+# TEXT_LAYER_MIN_CHARS букв/цифр и они в основном кириллица, латиница или цифры
+# (иначе это «мусор» от шрифтов без таблицы Unicode)
+TEXT_LAYER_MIN_CHARS = 50
+TEXT_LAYER_MIN_READABLE = 0.8
+_READABLE_CHARS = re.compile(r"[0-9A-Za-zА-Яа-яЁё]")
+
+# Блокирующие вызовы Vision и растеризация PDF выполняются в отдельном пуле потоков,
+# чтобы OCR одного пользователя не останавливал event loop бота
+_OCR_EXECUTOR = ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS, thread_name_prefix="ocr")
+# Глобальный лимит одновременных OCR-задач для всех чатов
+_OCR_SLOTS = asyncio.Semaphore(OCR_MAX_IN_FLIGHT)
+
+# Кэш распознанного текста по SHA-256 содержимого файла: повторная загрузка
+# того же скана не оплачивается в Vision повторно
+OCR_CACHE = SQLiteCache(OCR_CACHE_PATH, max_entries=OCR_CACHE_MAX_ENTRIES, ttl=OCR_CACHE_TTL)
+
+def iter_pdf_pages(pdf_bytes: bytes, pages: list = None):
+    """
+    Генератор: растеризует PDF по одной странице и отдает пары (номер страницы,
+    подготовленное для OCR изображение) по мере готовности. DPI каждой страницы
+    выбирается по ее превью (utils.ocr_image.choose_dpi); страница, которую не
+    удалось растеризовать, пропускается.
+    В памяти одновременно находится только одна растеризованная страница, поэтому
+    пиковое потребление не зависит от числа страниц документа.
+
+    Args:
+        pdf_bytes: Содержимое PDF
+        pages: Номера страниц (с 1); по умолчанию все страницы
+    """
+    fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        if pages:
+            page_numbers = sorted(set(pages))
+        else:
+            page_numbers = range(1, pdfinfo_from_path(pdf_path)["Pages"] + 1)
+        for page_no in page_numbers:
+            preview = convert_from_path(pdf_path, dpi=PREVIEW_DPI, first_page=page_no, last_page=page_no,
+                                        grayscale=True)
+            if not preview:
+                continue
+            dpi = choose_dpi(preview[0])
+            for img in convert_from_path(pdf_path, dpi=dpi, first_page=page_no, last_page=page_no):
+                prepared = encode_for_ocr(fit_pixel_budget(img))
+                img.close()
+                logger.debug(f"Страница {page_no}: {dpi} DPI, {len(prepared)} байт")
+                yield page_no, prepared
+    finally:
+        os.remove(pdf_path)
+
+def _iter_batches(pages):
+    """Пакеты по GCV_BATCH_SIZE страниц; pages — пары (номер страницы, изображение),
+    может быть генератором — страницы забираются по мере готовности.
+    Отдает (номера страниц пакета, изображения пакета)."""
+    pages = iter(pages)
+    while batch := list(islice(pages, GCV_BATCH_SIZE)):
+        page_numbers, images = zip(*batch)
+        yield list(page_numbers), list(images)
+
+def gcv_ocr_batch(batch: list, page_numbers: list = None, report: dict = None) -> list:
+    """
+    Распознает до GCV_BATCH_SIZE страниц одним запросом batch_annotate_images.
+    Возвращает тексты в порядке страниц; для страницы с ошибкой Vision возвращается
+    пустая строка, а ошибка логируется с ее номером (page_numbers, по умолчанию с 1)
+    и отмечается в report (см. ocr_document).
+    """
+    page_numbers = page_numbers or list(range(1, len(batch) + 1))
+    feature = vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+    requests = [
+        vision.AnnotateImageRequest(image=vision.Image(content=img_bytes), features=[feature])
+        for img_bytes in batch
+    ]
+    sent = sum(len(request.image.content) for request in requests)
+    logger.info(f"Vision: стр. {page_numbers}, отправлено {sent} байт")
+    response = GCV_CLIENT.batch_annotate_images(requests=requests, timeout=OCR_TIMEOUT)
+    texts = []
+    for page_no, page in zip(page_numbers, response.responses):
+        if page.error.message:
+            logger.error(f"Vision API error (страница {page_no}): {page.error.message}")
+            _mark_failed(report)
+            texts.append("")
+        elif page.text_annotations:
+            texts.append(page.text_annotations[0].description or "")
+        else:
+            texts.append("")
+    return texts
+
+def gcv_ocr_pages(images: list) -> list:
+    """Распознает страницы через Vision пакетами по GCV_BATCH_SIZE страниц за запрос."""
     if not GCV_CLIENT:
         logger.error("Google Cloud Vision client not initialized")
-        return ""
-    full_text = ""
-    for img_bytes in images:
-        image = vision.Image(content=img_bytes)
-        response = GCV_CLIENT.text_detection(image=image)
-        texts = response.text_annotations
-        if texts:
-            full_text += texts[0].description + "\n\n"
-    return full_text.strip()
-
-def gcv_ocr(file_bytes: bytes) -> str:
+        return ["" for _ in images]
+    texts = []
+    for page_numbers, batch in _iter_batches(enumerate(images, start=1)):
+        texts.extend(gcv_ocr_batch(batch, page_numbers))
+    return texts
+
+def gcv_ocr_multiple(images: list) -> str:
+    return "\n\n".join(text for text in gcv_ocr_pages(images) if text).strip()
+
+def _mark_engine(report, engine):
+    """Отмечает в отчете о распознавании движок, который дал текст."""
+    if report is not None:
+        report['engines'].add(engine)
+
+def _mark_failed(report):
+    """Отмечает в отчете о распознавании, что часть документа не распознана."""
+    if report is not None:
+        report['failed'] = True
+
+def _engines() -> list:
+    """Движки OCR в порядке попыток: основной, затем резервный; Vision без ключа пропускается."""
+    engines = []
+    for engine in dict.fromkeys(e for e in (OCR_ENGINE, OCR_FALLBACK_ENGINE) if e):
+        if engine == 'vision' and not GCV_CLIENT:
+            logger.error("Google Cloud Vision client not initialized")
+        elif engine != 'vision' and not is_local_engine(engine):
+            logger.error(f"Неизвестный движок OCR: {engine}")
+        else:
+            engines.append(engine)
+    return engines
+
+def engine_ocr_batch(engine: str, batch: list, page_numbers: list = None, report: dict = None) -> list:
+    """Распознает пакет страниц указанным движком ('vision', 'tesseract', 'paddle', 'easyocr')."""
+    if engine == 'vision':
+        return gcv_ocr_batch(batch, page_numbers, report)
+    logger.info(f"OCR {engine}: стр. {page_numbers or list(range(1, len(batch) + 1))}")
+    return local_ocr_pages(engine, batch)
+
+def ocr_pages(pages, report: dict = None) -> dict:
+    """
+    Распознает страницы движком OCR_ENGINE пакетами по мере готовности. Если движок
+    вернул ошибку (например, Vision недоступен), пакет распознается резервным
+    движком OCR_FALLBACK_ENGINE.
+
+    Args:
+        pages: Пары (номер страницы, изображение), например из iter_pdf_pages
+        report: Отчет о распознавании (см. ocr_document): какие движки дали текст
+            и были ли нераспознанные страницы
+
+    Returns:
+        dict: {номер страницы: текст} в порядке страниц
+    """
+    engines = _engines()
+    texts = {}
+    for page_numbers, batch in _iter_batches(pages):
+        if not engines:
+            _mark_failed(report)
+            texts.update((page_no, "") for page_no in page_numbers)
+            continue
+        for i, engine in enumerate(engines):
+            try:
+                texts.update(zip(page_numbers, engine_ocr_batch(engine, batch, page_numbers, report)))
+                _mark_engine(report, engine)
+                break
+            except Exception as e:
+                if i + 1 == len(engines):
+                    raise
+                logger.warning(f"OCR {engine} не удался ({e}), стр. {page_numbers} "
+                               f"распознаются движком {engines[i + 1]}")
+    return texts
+
+def ocr_multiple(pages, report: dict = None) -> str:
+    """Текст страниц (пары (номер страницы, изображение)) через пустую строку."""
+    return "\n\n".join(text for text in ocr_pages(pages, report).values() if text).strip()
+
+def is_usable_text(text: str) -> bool:
+    """Достаточно ли в тексте читаемых символов, чтобы не распознавать страницу заново."""
+    chars = [ch for ch in text if not ch.isspace()]
+    readable = sum(1 for ch in chars if _READABLE_CHARS.match(ch))
+    return readable >= TEXT_LAYER_MIN_CHARS and readable >= len(chars) * TEXT_LAYER_MIN_READABLE
+
+def read_text_layer(pdf_bytes: bytes, pages: list = None):
+    """
+    Читает текстовый слой PDF без растеризации.
+
+    Returns:
+        tuple: (номера запрошенных страниц, {номер страницы: текст} для страниц с пригодным текстом)
+            или (None, {}), если PDF не удалось разобрать
+    """
+    try:
+        reader = PdfReader(BytesIO(pdf_bytes))
+        page_numbers = sorted(set(pages)) if pages else list(range(1, len(reader.pages) + 1))
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать PDF для извлечения текстового слоя: {e}")
+        return None, {}
+    texts = {}
+    for page_no in page_numbers:
+        if page_no > len(reader.pages):
+            continue
+        try:
+            text = reader.pages[page_no - 1].extract_text() or ""
+        except Exception as e:
+            logger.warning(f"Не удалось извлечь текст страницы {page_no}: {e}")
+            continue
+        if is_usable_text(text):
+            texts[page_no] = text.strip()
+    return page_numbers, texts
+
+def ocr_pdf(pdf_bytes: bytes, pages: list = None, name: str = None, report: dict = None) -> str:
+    """
+    Извлекает текст PDF: страницы с текстовым слоем читаются напрямую, остальные
+    растеризуются постранично и распознаются пакетами по мере готовности.
+    """
+    page_numbers, texts = read_text_layer(pdf_bytes, pages)
+    if page_numbers is None:
+        # PDF не разбирается pypdf — распознаем все страницы как изображения
+        if not _engines():
+            _mark_failed(report)
+            return ""
+        return ocr_multiple(iter_pdf_pages(pdf_bytes, pages), report)
+
+    scan_pages = [p for p in page_numbers if p not in texts]
+    if scan_pages and _engines():
+        # Номера берутся из iter_pdf_pages: нерастеризованная страница не сдвигает остальные
+        texts.update(ocr_pages(iter_pdf_pages(pdf_bytes, scan_pages), report))
+    elif scan_pages:
+        # Страницы без текстового слоя распознать нечем — в тексте только часть документа
+        _mark_failed(report)
+
+    label = name or "PDF"
+    text_pages = [p for p in page_numbers if p not in scan_pages]
+    if not scan_pages:
+        logger.info(f"{label}: текстовый слой, без OCR (стр. {text_pages})")
+    elif text_pages:
+        logger.info(f"{label}: текстовый слой (стр. {text_pages}) + OCR (стр. {scan_pages})")
+    else:
+        logger.info(f"{label}: OCR (стр. {scan_pages})")
+    return "\n\n".join(texts[p] for p in page_numbers if texts.get(p)).strip()
+
+def gcv_ocr(file_bytes: bytes, report: dict = None) -> str:
     if not GCV_CLIENT:
         logger.error("Google Cloud Vision client not initialized")
         return ""
-    image = vision.Image(content=file_bytes)
-    response = GCV_CLIENT.text_detection(image=image)
+    content = prepare_photo(file_bytes)
+    logger.info(f"Vision: изображение, отправлено {len(content)} байт")
+    image = vision.Image(content=content)
+    response = GCV_CLIENT.text_detection(image=image, timeout=OCR_TIMEOUT)
     texts = response.text_annotations
     if response.error.message:
         logger.error(f"Vision API error: {response.error.message}")
+        _mark_failed(report)
         return ""
     if not texts:
         return ""
     return texts[0].description or ""
+
+def ocr_image(file_bytes: bytes, report: dict = None) -> str:
+    """Распознает фото движком OCR_ENGINE, при ошибке — резервным OCR_FALLBACK_ENGINE."""
+    engines = _engines()
+    for i, engine in enumerate(engines):
+        try:
+            if engine == 'vision':
+                text = gcv_ocr(file_bytes, report)
+            else:
+                text = engine_ocr_batch(engine, [prepare_photo(file_bytes)])[0]
+            _mark_engine(report, engine)
+            return text
+        except Exception as e:
+            if i + 1 == len(engines):
+                raise
+            logger.warning(f"OCR {engine} не удался ({e}), изображение распознается движком {engines[i + 1]}")
+    _mark_failed(report)
+    return ""
+
+async def _run_in_executor(func, *args, timeout: float = OCR_TIMEOUT):
+    """
+    Выполняет блокирующую функцию в пуле OCR с учетом глобального лимита и таймаута.
+    Слотов (OCR_MAX_IN_FLIGHT) больше, чем потоков пула (OCR_MAX_WORKERS), поэтому
+    задача может ждать свободный поток; таймаут отсчитывается с момента, когда
+    поток взял задачу, а не с постановки в очередь. После таймаута поток пула
+    продолжает работу, поэтому слот лимита освобождается, только когда функция
+    действительно завершится.
+    """
+    await _OCR_SLOTS.acquire()
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+
+    def notify(callback):
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            # Цикл событий уже закрыт — уведомлять некого
+            pass
+
+    def run():
+        notify(started.set)
+        return func(*args)
+
+    def release():
+        # Задача, отмененная до запуска, тоже будит ожидающего
+        started.set()
+        _OCR_SLOTS.release()
+
+    try:
+        future = _OCR_EXECUTOR.submit(run)
+    except BaseException:
+        _OCR_SLOTS.release()
+        raise
+    future.add_done_callback(lambda _: notify(release))
+    await started.wait()
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+
+async def ocr_image_async(file_bytes: bytes, report: dict = None) -> str:
+    try:
+        return await _run_in_executor(ocr_image, file_bytes, report)
+    except asyncio.TimeoutError:
+        logger.error(f"OCR timeout ({OCR_TIMEOUT} с)")
+        _mark_failed(report)
+        return ""
+
+async def ocr_multiple_async(images: list) -> str:
+    try:
+        return await _run_in_executor(ocr_multiple, list(enumerate(images, start=1)))
+    except asyncio.TimeoutError:
+        logger.error(f"OCR timeout ({OCR_TIMEOUT} с)")
+        return ""
+
+async def ocr_pdf_async(pdf_bytes: bytes, pages: list = None, name: str = None, report: dict = None) -> str:
+    # Растеризация и распознавание идут одной задачей пула, поэтому таймаут
+    # покрывает оба этапа, как раньше два отдельных вызова
+    timeout = 2 * OCR_TIMEOUT
+    try:
+        return await _run_in_executor(ocr_pdf, pdf_bytes, pages, name, report, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"PDF OCR timeout ({timeout} с)")
+        _mark_failed(report)
+        return ""
+
+def ocr_cache_key(file_bytes: bytes, mime: str, pages: list = None, doc_type: str = None) -> str:
+    """Ключ кэша OCR: SHA-256 содержимого + движок и параметры подготовки изображений (для PDF — и страницы)."""
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    if mime == 'application/pdf':
+        if pages:
+            page_list = ",".join(str(p) for p in pages)
+        else:
+            page_list = f"auto-{doc_type}" if doc_type else "all"
+        return f"{digest}:pdf:{OCR_ENGINE}:{PREPARE_SIGNATURE}:pages={page_list}"
+    return f"{digest}:image:{OCR_ENGINE}:{PREPARE_SIGNATURE}"
+
+async def ocr_document(file_bytes: bytes, mime: str, pages: list = None, doc_type: str = None,
+                       name: str = None) -> str:
+    """
+    Асинхронно распознает текст документа. У PDF страницы с текстовым слоем читаются
+    напрямую, остальные растеризуются и распознаются постранично (страницы не
+    накапливаются в памяти); большие фото уменьшаются до лимита пикселей.
+    Кэшируется только полный непустой результат основного движка OCR_ENGINE (или
+    текстового слоя): текст резервного движка и текст, в котором не хватает
+    страниц из-за ошибок OCR, при следующем обращении распознаются заново.
+
+    Args:
+        file_bytes: Содержимое файла (bytes или memoryview отображенного файла из
+            utils.document_store — копируется в память, только если результата нет в кэше)
+        mime: MIME-тип файла
+        pages: Номера страниц PDF (с 1); по умолчанию все страницы
+        doc_type: Тип документа ('passport', 'patent', ...); если страницы не заданы,
+            в OCR отправляются только нужные этому типу страницы (utils.page_select)
+        name: Имя файла для журнала (какой путь извлечения текста выбран)
+    """
+    # SHA-256 всего файла и запросы к SQLite — в потоке, чтобы не блокировать цикл событий
+    cache_key = await asyncio.to_thread(ocr_cache_key, file_bytes, mime, pages, doc_type)
+    cached = await asyncio.to_thread(OCR_CACHE.get, cache_key)
+    if cached is not None:
+        logger.info(f"OCR из кэша: {cache_key[:16]}… ({OCR_CACHE.hits} попаданий / {OCR_CACHE.misses} промахов)")
+        return cached
+
+    if isinstance(file_bytes, memoryview):
+        # Библиотеки растеризации и клиент Vision работают с bytes
+        file_bytes = file_bytes.tobytes()
+    report = {'engines': set(), 'failed': False}
+    if mime == 'application/pdf':
+        if not pages and doc_type:
+            pages = await _run_in_executor(select_pages, file_bytes, doc_type)
+        raw_text = await ocr_pdf_async(file_bytes, pages, name, report)
+    else:
+        raw_text = await ocr_image_async(file_bytes, report)
+
+    if raw_text and not report['failed'] and report['engines'] <= {OCR_ENGINE}:
+        await asyncio.to_thread(OCR_CACHE.set, cache_key, raw_text)
+    elif raw_text:
+        logger.info(f"OCR не кэшируется: движки {sorted(report['engines'])}, "
+                    f"{'есть нераспознанные страницы' if report['failed'] else 'резервный движок'}")
+    return raw_text
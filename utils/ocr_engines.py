@@ -0,0 +1,180 @@
+"""
+Локальные движки OCR (Tesseract, PaddleOCR, EasyOCR) в пуле процессов.
+
+Распознавание нагружает CPU и держит GIL, поэтому оно выполняется в отдельных
+процессах. Модель движка загружается один раз при старте процесса пула
+(у PaddleOCR и EasyOCR это секунды), а не на каждый документ. Для каждого
+движка создается свой пул; страницы пакета распознаются параллельно.
+
+Локальный движок выбирается через OCR_ENGINE (вместо Google Cloud Vision) или
+OCR_FALLBACK_ENGINE (когда Vision недоступен).
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import OCR_ENGINE, OCR_FALLBACK_ENGINE, OCR_TIMEOUT, LOCAL_OCR_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Языки распознавания в формате каждого движка
+TESSERACT_LANG = "rus+eng"
+PADDLE_LANG = "ru"
+EASYOCR_LANGS = ["ru", "en"]
+
+_LOCK = threading.Lock()
+# Пулы процессов по движкам: {движок: ProcessPoolExecutor}
+_EXECUTORS = {}
+
+# Модель движка в процессе пула (загружается в _init_worker)
+_ENGINE = None
+_MODEL = None
+
+
+def _load_tesseract():
+    import pytesseract
+    # Проверяем, что бинарник tesseract установлен, до первого документа
+    pytesseract.get_tesseract_version()
+    return pytesseract
+
+
+def _load_paddle():
+    from paddleocr import PaddleOCR
+    return PaddleOCR(use_angle_cls=True, lang=PADDLE_LANG)
+
+
+def _load_easyocr():
+    import easyocr
+    return easyocr.Reader(EASYOCR_LANGS, gpu=False)
+
+
+def _tesseract_text(model, img):
+    return model.image_to_string(img, lang=TESSERACT_LANG)
+
+
+def _paddle_text(model, img):
+    import numpy as np
+    result = model.ocr(np.asarray(img.convert("RGB")))
+    lines = []
+    for page in result or []:
+        if not page:
+            continue
+        if "rec_texts" in page:
+            # PaddleOCR 3.x: результат страницы — словарь
+            lines.extend(page["rec_texts"])
+        else:
+            # PaddleOCR 2.x: [[рамка, (текст, уверенность)], ...]
+            lines.extend(line[1][0] for line in page)
+    return "\n".join(lines)
+
+
+def _easyocr_text(model, img):
+    import numpy as np
+    return "\n".join(model.readtext(np.asarray(img.convert("RGB")), detail=0, paragraph=True))
+
+
+# Локальные движки: {имя: (загрузка модели, распознавание PIL-изображения)}
+LOCAL_ENGINES = {
+    'tesseract': (_load_tesseract, _tesseract_text),
+    'paddle': (_load_paddle, _paddle_text),
+    'easyocr': (_load_easyocr, _easyocr_text),
+}
+
+
+def is_local_engine(engine: str) -> bool:
+    return engine in LOCAL_ENGINES
+
+
+def _init_worker(engine):
+    """Инициализация процесса пула: модель движка загружается один раз."""
+    global _ENGINE, _MODEL
+    _ENGINE = engine
+    _MODEL = LOCAL_ENGINES[engine][0]()
+
+
+def _ping():
+    return True
+
+
+def _recognize(img_bytes):
+    from io import BytesIO
+    from PIL import Image
+    with Image.open(BytesIO(img_bytes)) as img:
+        return (LOCAL_ENGINES[_ENGINE][1](_MODEL, img) or "").strip()
+
+
+def _get_executor(engine):
+    with _LOCK:
+        executor = _EXECUTORS.get(engine)
+        if executor is None:
+            executor = _EXECUTORS[engine] = ProcessPoolExecutor(
+                max_workers=LOCAL_OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(engine,),
+            )
+        return executor
+
+
+def _drop_executor(engine):
+    with _LOCK:
+        executor = _EXECUTORS.pop(engine, None)
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def local_ocr_pages(engine: str, images: list) -> list:
+    """
+    Распознает изображения (байты PNG/JPEG) локальным движком, страницы — параллельно
+    в процессах пула. Блокирующий вызов: выполняется в пуле потоков OCR.
+
+    Raises:
+        RuntimeError: Если движок не удалось загрузить (не установлен пакет или бинарник)
+    """
+    executor = _get_executor(engine)
+    futures = [executor.submit(_recognize, img_bytes) for img_bytes in images]
+    try:
+        return [future.result(timeout=OCR_TIMEOUT) for future in futures]
+    except BrokenProcessPool as e:
+        # Процессы пула не смогли загрузить модель: следующий вызов создаст пул заново
+        _drop_executor(engine)
+        raise RuntimeError(f"локальный OCR {engine} недоступен: {e}") from e
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+async def start_local_ocr(engines: list = None):
+    """
+    Запускает пулы локальных движков (по умолчанию из OCR_ENGINE / OCR_FALLBACK_ENGINE)
+    и дожидается загрузки моделей во всех процессах. Ошибка загрузки логируется,
+    бот продолжает работу.
+
+    Returns:
+        list: Движки, пулы которых запущены
+    """
+    loop = asyncio.get_running_loop()
+    started = []
+    for engine in dict.fromkeys(engines or (OCR_ENGINE, OCR_FALLBACK_ENGINE)):
+        if not is_local_engine(engine):
+            continue
+        executor = _get_executor(engine)
+        try:
+            await asyncio.gather(*(loop.run_in_executor(executor, _ping) for _ in range(LOCAL_OCR_WORKERS)))
+        except Exception as e:
+            logger.error(f"Не удалось запустить локальный OCR {engine}: {e}")
+            _drop_executor(engine)
+            continue
+        logger.info(f"Пул локального OCR {engine} запущен: {LOCAL_OCR_WORKERS} процесс(ов)")
+        started.append(engine)
+    return started
+
+
+def shutdown_local_ocr():
+    """Останавливает пулы локальных движков."""
+    for engine in list(_EXECUTORS):
+        _drop_executor(engine)
+        logger.info(f"Пул локального OCR {engine} остановлен")
@@ -0,0 +1,119 @@
+"""
+Подготовка изображений для отправки в Vision.
+
+DPI растеризации страницы PDF выбирается по ее размеру и плотности текста
+(по маленькому превью), фотографии сверх лимита пикселей уменьшаются,
+фото и шумные сканы кодируются в JPEG/WebP высокого качества, а чистые
+страницы — в PNG в оттенках серого. Фото документов перед этим выпрямляются
+и обрезаются (utils.ocr_preprocess).
+"""
+
+import logging
+from io import BytesIO
+
+from PIL import Image, ImageFilter, ImageOps, features
+
+from config import OCR_DPI, OCR_DENSE_DPI, OCR_MAX_PIXELS, OCR_IMAGE_FORMAT, OCR_IMAGE_QUALITY, OCR_PREPROCESS
+
+logger = logging.getLogger(__name__)
+
+# DPI превью, по которому оценивается страница
+PREVIEW_DPI = 36
+# Доля пикселей-границ на превью, начиная с которой текст считается мелким и плотным
+DENSE_TEXT_EDGE_RATIO = 0.08
+# Ниже этого DPI страницы не растеризуются даже при большом формате
+MIN_DPI = 72
+# Доля полутонов, ниже которой страница считается «чистой» (цифровой PDF, четкий скан):
+# такие страницы меньше и без артефактов в PNG, чем в JPEG/WebP
+CLEAN_PAGE_MIDTONE_RATIO = 0.1
+
+if OCR_IMAGE_FORMAT == "WEBP" and not features.check("webp"):
+    logger.warning("Pillow собран без WebP, изображения для OCR кодируются в JPEG")
+    IMAGE_FORMAT = "JPEG"
+elif OCR_IMAGE_FORMAT in ("JPEG", "WEBP", "PNG"):
+    IMAGE_FORMAT = OCR_IMAGE_FORMAT
+else:
+    logger.warning(f"Неизвестный OCR_IMAGE_FORMAT={OCR_IMAGE_FORMAT}, используется JPEG")
+    IMAGE_FORMAT = "JPEG"
+
+# Параметры подготовки входят в ключ кэша OCR: при их изменении текст распознается заново
+PREPARE_SIGNATURE = f"dpi={OCR_DPI}/{OCR_DENSE_DPI}:px={OCR_MAX_PIXELS}:{IMAGE_FORMAT.lower()}{OCR_IMAGE_QUALITY}"
+if OCR_PREPROCESS:
+    PREPARE_SIGNATURE += ":pre"
+
+
+def text_density(preview: Image.Image) -> float:
+    """Доля пикселей-границ на превью страницы: мелкий плотный текст дает много границ."""
+    edges = preview.convert("L").filter(ImageFilter.FIND_EDGES)
+    histogram = edges.histogram()
+    return sum(histogram[64:]) / max(1, preview.width * preview.height)
+
+
+def choose_dpi(preview: Image.Image, preview_dpi: int = PREVIEW_DPI) -> int:
+    """
+    DPI растеризации страницы по ее превью: OCR_DENSE_DPI для мелкого плотного
+    текста, иначе OCR_DPI; для больших форматов DPI снижается до лимита пикселей.
+    """
+    area_in2 = (preview.width / preview_dpi) * (preview.height / preview_dpi)
+    dpi = OCR_DENSE_DPI if text_density(preview) >= DENSE_TEXT_EDGE_RATIO else OCR_DPI
+    budget_dpi = int((OCR_MAX_PIXELS / max(area_in2, 1e-6)) ** 0.5)
+    return max(MIN_DPI, min(dpi, budget_dpi))
+
+
+def fit_pixel_budget(img: Image.Image, max_pixels: int = OCR_MAX_PIXELS) -> Image.Image:
+    """Пропорционально уменьшает изображение, если в нем больше max_pixels пикселей."""
+    pixels = img.width * img.height
+    if pixels <= max_pixels:
+        return img
+    scale = (max_pixels / pixels) ** 0.5
+    size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+    return img.resize(size, Image.LANCZOS)
+
+
+def is_clean_page(img: Image.Image) -> bool:
+    """Почти нет полутонов: текст и линии на ровном фоне, без фотографического шума."""
+    histogram = img.reduce(4).convert("L").histogram()
+    return sum(histogram[32:224]) / max(1, sum(histogram)) < CLEAN_PAGE_MIDTONE_RATIO
+
+
+def encode_for_ocr(img: Image.Image) -> bytes:
+    """
+    Кодирует изображение для OCR: чистые страницы — PNG в оттенках серого,
+    фото и шумные сканы — OCR_IMAGE_FORMAT (JPEG/WebP с качеством OCR_IMAGE_QUALITY).
+    """
+    buf = BytesIO()
+    if is_clean_page(img):
+        img.convert("L").save(buf, format="PNG")
+        return buf.getvalue()
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    if IMAGE_FORMAT == "PNG":
+        img.save(buf, format="PNG")
+    else:
+        img.save(buf, format=IMAGE_FORMAT, quality=OCR_IMAGE_QUALITY)
+    return buf.getvalue()
+
+
+def prepare_photo(file_bytes: bytes) -> bytes:
+    """
+    Готовит загруженное изображение для OCR: фото поворачивается по EXIF,
+    документ на нем выпрямляется и обрезается (если включен OCR_PREPROCESS),
+    большие изображения уменьшаются до лимита пикселей и перекодируются.
+    Без предобработки укладывающиеся в лимит файлы отправляются как есть.
+    """
+    try:
+        img = Image.open(BytesIO(file_bytes))
+        if not OCR_PREPROCESS and img.width * img.height <= OCR_MAX_PIXELS:
+            return file_bytes
+        original_size = img.size
+        img = ImageOps.exif_transpose(img)
+        if OCR_PREPROCESS:
+            from utils.ocr_preprocess import preprocess_photo
+            img = preprocess_photo(img)
+        img = fit_pixel_budget(img)
+        prepared = encode_for_ocr(img)
+    except Exception as e:
+        logger.warning(f"Не удалось подготовить изображение для OCR, отправляется исходное: {e}")
+        return file_bytes
+    logger.info(f"Фото подготовлено для OCR: {original_size} → {img.size}, {len(file_bytes)} → {len(prepared)} байт")
+    return prepared
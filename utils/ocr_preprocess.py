@@ -0,0 +1,201 @@
+"""
+Предобработка фотографий документов перед OCR (OpenCV/NumPy).
+
+Пользователи присылают снятые телефоном паспорта под углом, с фоном стола
+и неравномерным освещением — Vision распознает такие фото хуже, и GPT не
+находит часть полей. Шаги предобработки:
+- поиск границ документа на уменьшенной копии (Canny + самый большой контур);
+- исправление перспективы: документ вырезается и выпрямляется по найденному
+  четырехугольнику;
+- выравнивание наклона по строкам текста (преобразование Хафа);
+- нормализация контраста (CLAHE по яркости);
+- обрезка пустых полей вокруг содержимого.
+
+Все операции — вызовы OpenCV и векторные операции NumPy; OpenCV отпускает GIL,
+поэтому предобработка параллельно выполняется в пуле потоков OCR.
+Время каждого шага логируется и накапливается в preprocess_stats().
+"""
+
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Длинная сторона уменьшенной копии, на которой ищутся границы документа и наклон
+DETECT_SIZE = 800
+# Минимальная доля кадра, которую должен занимать найденный документ
+MIN_DOCUMENT_AREA = 0.2
+# Наклон меньше MIN_SKEW_ANGLE не исправляется, больше MAX_SKEW_ANGLE — не считается наклоном строк
+MIN_SKEW_ANGLE = 0.5
+MAX_SKEW_ANGLE = 15
+# Параметры CLAHE: ограничение контраста и размер сетки
+CLAHE_CLIP_LIMIT = 2.0
+CLAHE_GRID = 8
+# Поля, оставляемые вокруг содержимого при обрезке (доля стороны)
+CROP_MARGIN = 0.02
+
+STEPS = ("boundary", "perspective", "deskew", "contrast", "crop")
+
+_STATS_LOCK = threading.Lock()
+# Накопленное время шагов: {шаг: [число вызовов, суммарное время в сек.]}
+_STATS = {step: [0, 0.0] for step in STEPS}
+
+
+def _order_corners(points):
+    """Углы четырехугольника в порядке: левый верхний, правый верхний, правый нижний, левый нижний."""
+    points = points.reshape(4, 2).astype(np.float32)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([points[np.argmin(sums)], points[np.argmin(diffs)],
+                     points[np.argmax(sums)], points[np.argmax(diffs)]], dtype=np.float32)
+
+
+def find_document(gray):
+    """
+    Ищет документ на кадре по уменьшенной копии.
+
+    Returns:
+        np.ndarray: Четыре угла документа в координатах gray или None, если документ
+            не отделяется от фона (занимает весь кадр или фон слишком пестрый)
+    """
+    scale = DETECT_SIZE / max(gray.shape)
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    scale = min(scale, 1.0)
+    edges = cv2.Canny(cv2.GaussianBlur(small, (5, 5), 0), 50, 150)
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8), iterations=2)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    contour = max(contours, key=cv2.contourArea)
+    frame_area = small.shape[0] * small.shape[1]
+    area = cv2.contourArea(contour)
+    if area < frame_area * MIN_DOCUMENT_AREA or area > frame_area * 0.98:
+        return None
+    hull = cv2.convexHull(contour)
+    quad = cv2.approxPolyDP(hull, 0.02 * cv2.arcLength(hull, True), True)
+    if len(quad) != 4:
+        # Углы не видны (закрыты пальцами, скруглены) — берем описанный повернутый прямоугольник
+        quad = cv2.boxPoints(cv2.minAreaRect(contour))
+    return _order_corners(quad) / scale
+
+
+def warp_document(img, corners):
+    """Вырезает документ по четырем углам и выпрямляет перспективу."""
+    tl, tr, br, bl = corners
+    width = int(max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl)))
+    height = int(max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr)))
+    target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(corners, target)
+    return cv2.warpPerspective(img, matrix, (width, height), flags=cv2.INTER_CUBIC,
+                               borderMode=cv2.BORDER_REPLICATE)
+
+
+def estimate_skew(gray) -> float:
+    """Угол наклона строк текста в градусах (медиана углов почти горизонтальных отрезков)."""
+    scale = min(1.0, DETECT_SIZE / max(gray.shape))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    edges = cv2.Canny(small, 50, 150)
+    lines = cv2.HoughLinesP(edges, 1, np.pi / 360, threshold=80,
+                            minLineLength=small.shape[1] // 8, maxLineGap=10)
+    if lines is None:
+        return 0.0
+    x1, y1, x2, y2 = lines.reshape(-1, 4).T.astype(np.float32)
+    angles = np.degrees(np.arctan2(y2 - y1, x2 - x1))
+    angles = angles[np.abs(angles) <= MAX_SKEW_ANGLE]
+    return float(np.median(angles)) if angles.size else 0.0
+
+
+def rotate(gray, angle):
+    """Поворачивает изображение на angle градусов без потери углов (края заполняются белым)."""
+    height, width = gray.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_width, new_height = int(height * sin + width * cos), int(height * cos + width * sin)
+    matrix[0, 2] += new_width / 2 - width / 2
+    matrix[1, 2] += new_height / 2 - height / 2
+    return cv2.warpAffine(gray, matrix, (new_width, new_height), flags=cv2.INTER_CUBIC,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+
+
+def normalize_contrast(gray):
+    """Выравнивает освещение и контраст по областям (CLAHE)."""
+    clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=(CLAHE_GRID, CLAHE_GRID))
+    return clahe.apply(gray)
+
+
+def crop_to_content(gray):
+    """Обрезает пустые поля: строки и столбцы без темных пикселей (порог Оцу)."""
+    _, dark = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    rows = np.flatnonzero(dark.mean(axis=1) > 2)
+    cols = np.flatnonzero(dark.mean(axis=0) > 2)
+    if rows.size == 0 or cols.size == 0:
+        return gray
+    height, width = gray.shape
+    margin_y, margin_x = int(height * CROP_MARGIN), int(width * CROP_MARGIN)
+    top, bottom = max(0, rows[0] - margin_y), min(height, rows[-1] + 1 + margin_y)
+    left, right = max(0, cols[0] - margin_x), min(width, cols[-1] + 1 + margin_x)
+    if (bottom - top) * (right - left) < height * width * MIN_DOCUMENT_AREA:
+        return gray
+    return gray[top:bottom, left:right]
+
+
+def _record(timings):
+    with _STATS_LOCK:
+        for step, elapsed in timings.items():
+            _STATS[step][0] += 1
+            _STATS[step][1] += elapsed
+
+
+def preprocess_stats() -> dict:
+    """Среднее время шагов предобработки (мс) и число обработанных фото."""
+    with _STATS_LOCK:
+        return {step: {"count": count, "avg_ms": round(total / count * 1000, 1) if count else 0.0}
+                for step, (count, total) in _STATS.items()}
+
+
+def preprocess_photo(img: Image.Image) -> Image.Image:
+    """
+    Выпрямляет и обрезает документ на фото, выравнивает наклон и контраст.
+
+    Args:
+        img: Фото, уже повернутое по EXIF
+
+    Returns:
+        Image.Image: Изображение документа в оттенках серого
+    """
+    timings = {}
+    gray = np.asarray(img.convert("L"))
+
+    start = time.perf_counter()
+    corners = find_document(gray)
+    timings["boundary"] = time.perf_counter() - start
+
+    if corners is not None:
+        start = time.perf_counter()
+        gray = warp_document(gray, corners)
+        timings["perspective"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    angle = estimate_skew(gray)
+    if abs(angle) >= MIN_SKEW_ANGLE:
+        gray = rotate(gray, angle)
+    timings["deskew"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    gray = normalize_contrast(gray)
+    timings["contrast"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    gray = crop_to_content(gray)
+    timings["crop"] = time.perf_counter() - start
+
+    _record(timings)
+    steps = ", ".join(f"{step} {elapsed * 1000:.0f} мс" for step, elapsed in timings.items())
+    logger.info(f"Предобработка фото: документ {'найден' if corners is not None else 'не найден'}, "
+                f"наклон {angle:.1f}°, {img.size} → {gray.shape[1]}x{gray.shape[0]} ({steps})")
+    return Image.fromarray(gray)
@@ -0,0 +1,151 @@
+"""
+Выбор страниц PDF, которые нужно отправлять в OCR для каждого типа документа.
+
+Дешевые локальные эвристики вместо распознавания всего файла:
+- текстовый слой: для ДМС и договора ищутся страницы с ключевыми словами;
+- MRZ: у паспорта ищется страница с машиночитаемой зоной (две строки
+  моноширинного текста одинаковой длины) по маленькому превью;
+- иначе берутся первые страницы (обе стороны патента, миграционной карты).
+"""
+
+import logging
+from io import BytesIO
+
+import numpy as np
+from pdf2image import convert_from_bytes
+from pypdf import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# Правила выбора страниц по типу документа:
+#   max_pages — сколько страниц отправлять в OCR (документы не длиннее берутся целиком)
+#   first_pages — сколько первых страниц брать всегда
+#   keywords — искать остальные страницы по этим словам в текстовом слое
+#   mrz — искать страницу с машиночитаемой зоной
+PAGE_RULES = {
+    'passport': {'max_pages': 1, 'mrz': True},
+    'patent': {'max_pages': 2},
+    'migration': {'max_pages': 2},
+    'dms': {'max_pages': 1, 'keywords': ['полис', 'страхов']},
+    # Дата договора — на первой странице, должность может быть дальше
+    'contract': {'max_pages': 2, 'first_pages': 1, 'keywords': ['должност']},
+}
+
+# DPI превью для поиска MRZ и сколько первых страниц просматривать
+MRZ_PREVIEW_DPI = 50
+MRZ_SCAN_PAGES = 10
+# Минимальная длина строки MRZ и допуск выравнивания ее краев (доли ширины страницы):
+# паспорт на скане формата A4 занимает примерно половину ширины листа
+MRZ_MIN_LINE_WIDTH = 0.3
+MRZ_ALIGN_TOLERANCE = 0.02
+# Насколько пиксель текста должен быть темнее фона страницы
+MRZ_DARK_DELTA = 40
+
+
+def _text_bands(dark):
+    """Полосы строк текста на бинарном изображении: [(верх, низ, левый край, правый край)]."""
+    height, width = dark.shape
+    is_text = dark.sum(axis=1) > width * 0.02
+    bands = []
+    top = None
+    for y, text in enumerate(list(is_text) + [False]):
+        if text and top is None:
+            top = y
+        elif not text and top is not None:
+            cols = np.flatnonzero(dark[top:y].any(axis=0))
+            bands.append((top, y, cols[0], cols[-1]))
+            top = None
+    return bands
+
+
+def _aligned(a, b, width):
+    """Две полосы одинаковой длины и высоты, идущие друг под другом."""
+    height = a[1] - a[0]
+    return (abs(a[2] - b[2]) <= width * MRZ_ALIGN_TOLERANCE
+            and abs(a[3] - b[3]) <= width * MRZ_ALIGN_TOLERANCE
+            and abs(height - (b[1] - b[0])) <= max(2, height // 2)
+            and b[0] - a[1] <= 2 * height)
+
+
+def has_mrz(preview) -> bool:
+    """
+    Есть ли на превью страницы машиночитаемая зона: ровно две строки текста
+    одинаковой длины друг под другом (44 моноширинных символа), а не блок
+    выровненного текста из многих строк.
+    """
+    img = np.asarray(preview.convert("L")).astype(np.int16)
+    width = img.shape[1]
+    # На превью мелкий текст получается серым, поэтому порог считается от фона страницы
+    bands = _text_bands(img < np.median(img) - MRZ_DARK_DELTA)
+    for i in range(len(bands) - 1):
+        first, second = bands[i], bands[i + 1]
+        if first[3] - first[2] < width * MRZ_MIN_LINE_WIDTH or not _aligned(first, second, width):
+            continue
+        if i > 0 and _aligned(bands[i - 1], first, width):
+            continue
+        if i + 2 < len(bands) and _aligned(second, bands[i + 2], width):
+            continue
+        return True
+    return False
+
+
+def _pages_with_keywords(reader, keywords, pages, limit):
+    """Дополняет pages страницами, в текстовом слое которых есть ключевые слова."""
+    pages = list(pages)
+    for page_no, page in enumerate(reader.pages, start=1):
+        if len(pages) >= limit:
+            break
+        if page_no in pages:
+            continue
+        try:
+            text = (page.extract_text() or "").lower()
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать текстовый слой страницы {page_no}: {e}")
+            continue
+        if any(keyword in text for keyword in keywords):
+            pages.append(page_no)
+    return sorted(pages)
+
+
+def _pages_with_mrz(pdf_bytes, page_count, limit):
+    last_page = min(page_count, MRZ_SCAN_PAGES)
+    previews = convert_from_bytes(pdf_bytes, dpi=MRZ_PREVIEW_DPI, first_page=1, last_page=last_page,
+                                  grayscale=True)
+    return [page_no for page_no, preview in enumerate(previews, start=1) if has_mrz(preview)][:limit]
+
+
+def select_pages(pdf_bytes: bytes, doc_type: str):
+    """
+    Выбирает страницы PDF для OCR по типу документа.
+
+    Returns:
+        list: Номера страниц (с 1) или None, если нужно распознавать все страницы
+    """
+    rule = PAGE_RULES.get(doc_type)
+    if not rule:
+        return None
+    try:
+        reader = PdfReader(BytesIO(pdf_bytes))
+        page_count = len(reader.pages)
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать PDF для выбора страниц: {e}")
+        return None
+
+    max_pages = rule['max_pages']
+    if page_count <= max_pages:
+        return None
+
+    first_pages = list(range(1, rule.get('first_pages', 0) + 1))
+    pages, method = first_pages, "первые страницы"
+    if rule.get('keywords'):
+        pages, method = _pages_with_keywords(reader, rule['keywords'], first_pages, max_pages), "текстовый слой"
+    if pages == first_pages and rule.get('mrz'):
+        try:
+            pages, method = _pages_with_mrz(pdf_bytes, page_count, max_pages), "MRZ"
+        except Exception as e:
+            logger.warning(f"Не удалось найти MRZ на превью: {e}")
+    if pages == first_pages:
+        pages, method = list(range(1, max_pages + 1)), "первые страницы"
+
+    logger.info(f"Страницы для OCR ({doc_type}): {pages} из {page_count} ({method})")
+    return pages
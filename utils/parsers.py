@@ -1,319 +1,236 @@
 import re
 
-def parse_migration_fields(text: str):
-    res = {}
+from utils.dms_parser import parse_dms_fields  # noqa: F401 — разбор ДМС вынесен в отдельный модуль
+
+# Значения, которые GPT пишет вместо отсутствующего поля
+MISSING_VALUES = {"не найдено", "не найден", "не указано", "нет", "n/a", "none", "null", "-", "—", "not found"}
+
+NATIONALITY_NAMES = {
+    "UZBEKISTAN": "УЗБЕКИСТАН",
+    "REPUBLIC OF UZBEKISTAN": "УЗБЕКИСТАН",
+    "УЗБЕКИСТАН": "УЗБЕКИСТАН",
+    "TAJIKISTAN": "ТАДЖИКИСТАН",
+    "REPUBLIC OF TAJIKISTAN": "ТАДЖИКИСТАН",
+    "ТАДЖИКИСТАН": "ТАДЖИКИСТАН",
+    "ТАДЖИКСКАЯ РЕСПУБЛИКА": "ТАДЖИКИСТАН",
+}
+
+def is_missing(v) -> bool:
+    """Нормализация значений, которые считаются отсутствующими."""
+    if v is None:
+        return True
+    return str(v).strip().lower() in MISSING_VALUES
+
+def normalize_birth_place(val: str) -> str:
+    if "FERGANA" in val.upper():
+        return "ФЕРГАНСКАЯ ОБЛАСТЬ"
+    return val.upper()
+
+def normalize_sex(val: str) -> str:
+    uv = val.upper()
+    return "МУЖСКОЙ" if uv in {"M", "М", "МУЖ", "MALE"} else ("ЖЕНСКИЙ" if uv in {"F", "Ж", "ЖЕН", "FEMALE"} else uv)
+
+def normalize_authority(val: str) -> str:
+    if "МВД" in val.upper():
+        mvd_pos = val.upper().find("МВД")
+        after_mvd = val[mvd_pos + 3:].strip()
+        nums = ''.join(filter(str.isdigit, after_mvd))
+        return f"МВД {nums}" if nums else "МВД"
+    nums = ''.join(filter(str.isdigit, val))
+    return f"МВД {nums}" if nums else val.strip()
+
+def normalize_nationality(val: str) -> str:
+    v = val.upper().strip()
+    return NATIONALITY_NAMES.get(v, v)
+
+# Ответы GPT разбираются по строкам «Ключ: значение». Для каждого документа —
+# таблица полей: (поле, точные ключи, наборы фрагментов ключа). Таблица один раз
+# превращается в словарь {нормализованный ключ: поле}, поэтому ключ из промпта
+# распознается одним поиском в словаре. Если ключ написан иначе, подходят наборы
+# фрагментов, все фрагменты которых есть в ключе; из них выбирается набор с самыми
+# длинными фрагментами (при равенстве — стоящий в таблице раньше). Короткие
+# фрагменты (не длиннее SHORT_FRAGMENT_LEN) ищутся только целым словом: «пол» —
+# это пол, но не «Полное имя». Поле None — ключ, который намеренно не разбирается.
+# Результат нечеткого поиска запоминается, так что повторный такой ключ — тоже
+# один поиск в словаре.
+#
+# По скорости на ключах из промптов таблица примерно равна цепочкам if/elif
+# (x0.9–1.3 в зависимости от документа и прогона, benchmarks/field_parsers.py):
+# веток в цепочках мало, и выигрыш дает в основном запоминание нечетких ключей.
+MIGRATION_KEYS = [
+    ("migration_card_series", {"серия карты"}, [("серия карты",)]),
+    ("migration_card_number", {"номер карты"}, [("номер карты",)]),
+    ("migration_card_date", {"дата выдачи"}, [("дата выдачи",)]),
+    ("migration_card_purpose", {"цель визита"}, [("цель визита",)]),
+]
+
+PATENT_KEYS = [
+    ("patent_series", {"серия патента"}, [("серия патента",)]),
+    ("patent_number", {"номер патента"}, [("номер патента",)]),
+    ("patent_date", {"дата выдачи"}, [("дата выдачи",)]),
+    ("patent_issuer", {"кем выдан"}, [("кем выдан",)]),
+    ("fio", {"фио"}, [("фио",)]),
+    (None, {"фио (латиницей)"}, [("латиницей",)]),
+    ("patent_blank", {"серия и номер бланка"}, [("серия и номер бланка",)]),
+    ("inn", {"инн"}, [("инн",)]),
+]
+
+PASSPORT_KEYS = [
+    ("fio", {"фио"}, []),
+    ("birthdate", {"дата рождения"}, [("дата рождения",)]),
+    ("birth_place", {"место рождения"}, [("место рождения",)]),
+    ("sex", {"пол"}, [("пол",)]),
+    ("passport_series", {"серия"}, [("серия", "паспорт")]),
+    ("passport_number", {"номер", "номер (таджикский)"}, [("номер (таджик",), ("номер", "паспорт")]),
+    ("issue_date", {"дата выдачи"}, [("дата", "выдач"), ("дата", "passport")]),
+    ("expiry_date", {"срок действия"}, [("срок действия",), ("действителен до",)]),
+    ("authority", {"кем выдан"}, [("кем выдан",), ("authority",)]),
+    ("nationality", {"страна"}, [("страна",), ("гражданство",)]),
+    ("mrz", {"mrz", "мрз"}, [("мрз",), ("mrz",)]),
+]
+
+CONTRACT_KEYS = [
+    ("contract_number", {"номер договора"}, [("номер договора",)]),
+    ("contract_date", {"дата договора"}, [("дата договора",)]),
+    ("position", {"должность"}, [("должность",)]),
+    ("work_address", {"место работы"}, [("место работы",)]),
+    ("phone", {"телефон"}, [("телефон",)]),
+]
+
+# Значения полей паспорта: нормализация и поля, где отсутствующее значение не записывается
+PASSPORT_NORMALIZERS = {
+    "fio": str.upper,
+    "birth_place": normalize_birth_place,
+    "sex": normalize_sex,
+    "passport_series": str.upper,
+    "passport_number": str.upper,
+    "authority": normalize_authority,
+    "nationality": normalize_nationality,
+    "mrz": str.upper,
+}
+PASSPORT_SKIP_MISSING = {"passport_series", "passport_number"}
+
+# Сколько нечетко распознанных ключей запоминается для каждой таблицы
+KEY_CACHE_SIZE = 1024
+# Фрагменты не длиннее этого ищутся целым словом (не внутри другого слова)
+SHORT_FRAGMENT_LEN = 3
+
+_KEY_EDGE_CHARS = " \t*#•-"
+_UNKNOWN = object()
+
+def normalize_key(key: str) -> str:
+    """Ключ строки ответа GPT: нижний регистр, одиночные пробелы, без разметки по краям."""
+    return " ".join(key.lower().split()).strip(_KEY_EDGE_CHARS)
+
+def fragments_pattern(fragments):
+    """Регулярное выражение: в ключе есть все фрагменты (в любом порядке), короткие — целым словом."""
+    checks = []
+    for fragment in fragments:
+        fragment = re.escape(fragment)
+        if len(fragment) <= SHORT_FRAGMENT_LEN:
+            # Граница слова — не буква (цифры и знаки рядом с коротким ключом допустимы)
+            fragment = rf"(?<![^\W\d_]){fragment}(?![^\W\d_])"
+        checks.append(f"(?=.*{fragment})")
+    return re.compile("".join(checks), re.S)
+
+def compile_keys(specs):
+    """
+    Готовит таблицу полей к разбору.
+
+    Returns:
+        tuple: ({ключ: поле} — точные ключи, затем запомненные результаты нечеткого
+            поиска; ранжированный список (шаблон фрагментов, поле); предельный размер словаря)
+    """
+    lookup = {}
+    ranked = []
+    for order, (field, keys, fragment_sets) in enumerate(specs):
+        for key in keys:
+            lookup.setdefault(normalize_key(key), field)
+        for fragments in fragment_sets:
+            ranked.append((-sum(len(f) for f in fragments), order, fragments_pattern(fragments), field))
+    ranked.sort(key=lambda item: item[:2])
+    return lookup, [(pattern, field) for _, _, pattern, field in ranked], len(lookup) + KEY_CACHE_SIZE
+
+def _classify_new_key(key: str, table):
+    """Поле для ключа, которого еще нет в словаре таблицы; результат запоминается."""
+    lookup, ranked, limit = table
+    normalized = normalize_key(key)
+    field = lookup.get(normalized, _UNKNOWN)
+    if field is _UNKNOWN:
+        field = next((field for pattern, field in ranked if pattern.match(normalized)), None)
+    if len(lookup) < limit:
+        lookup[key] = field
+    return field
+
+def key_fields(text: str, table):
+    """Пары (поле, значение) для строк «Ключ: значение» с распознанным ключом."""
+    lookup = table[0]
+    res = []
     for line in text.splitlines():
-        if ":" not in line:
+        key, sep, val = line.partition(":")
+        if not sep:
             continue
-        key, val = line.split(":", 1)
-        key, val = key.strip(), val.strip()
-        if "Серия карты" in key:
-            res["migration_card_series"] = val
-        elif "Номер карты" in key:
-            res["migration_card_number"] = val
-        elif "Дата выдачи" in key:
-            res["migration_card_date"] = val
-        elif "Цель визита" in key:
-            res["migration_card_purpose"] = val
+        key = key.strip()
+        # Ключ из промпта или уже встречавшийся в таком написании — один поиск в словаре
+        field = lookup.get(key, _UNKNOWN)
+        if field is _UNKNOWN:
+            field = _classify_new_key(key, table)
+        if field:
+            res.append((field, val.strip()))
     return res
 
-def parse_patent_fields(text: str):
-    # Упрощённая (исходная) версия: парсим только строки формата 'Ключ: Значение'.
-    # Это возвращает стабильность: меньше ложных срабатываний и не ломает корректные GPT-ответы.
+def key_values(text: str, table) -> dict:
+    """{поле: значение} по строкам «Ключ: значение»; как dict(key_fields(...)), без промежуточного списка."""
+    lookup = table[0]
     res = {}
     for line in text.splitlines():
-        if ":" not in line:
+        key, sep, val = line.partition(":")
+        if not sep:
             continue
-        key, val = line.split(":", 1)
-        key, val = key.strip(), val.strip()
-        if "Серия патента" in key:
-            res["patent_series"] = val
-        elif "Номер патента" in key:
-            res["patent_number"] = val
-        elif "Дата выдачи" in key:
-            res["patent_date"] = val
-        elif "Кем выдан" in key:
-            res["patent_issuer"] = val
-        elif "ФИО" in key and "латиницей" not in key:
-            res["fio"] = val
-        elif "Серия и номер бланка" in key:
-            res["patent_blank"] = val
-        elif "ИНН" in key:
-            res["inn"] = val
+        key = key.strip()
+        field = lookup.get(key, _UNKNOWN)
+        if field is _UNKNOWN:
+            field = _classify_new_key(key, table)
+        if field:
+            res[field] = val.strip()
     return res
 
+_MIGRATION_TABLE = compile_keys(MIGRATION_KEYS)
+_PATENT_TABLE = compile_keys(PATENT_KEYS)
+_PASSPORT_TABLE = compile_keys(PASSPORT_KEYS)
+_CONTRACT_TABLE = compile_keys(CONTRACT_KEYS)
+
+def parse_migration_fields(text: str):
+    return key_values(text, _MIGRATION_TABLE)
+
+def parse_patent_fields(text: str):
+    # Упрощённая (исходная) версия: парсим только строки формата 'Ключ: Значение'.
+    # Это возвращает стабильность: меньше ложных срабатываний и не ломает корректные GPT-ответы.
+    return key_values(text, _PATENT_TABLE)
+
 def parse_passport_fields(text: str):
     res = {}
     # Флаг таджикского паспорта (по ключевой фразе или по наличию спец-поля)
     t = text.lower()
     is_tajik = ("таджик" in t) or ("номер (таджик" in t)
 
-    # Нормализация значений, которые считаются отсутствующими
-    def is_missing(v: str) -> bool:
-        if v is None:
-            return True
-        s = str(v).strip().lower()
-        return s in {"не найдено", "не найден", "не указано", "нет", "n/a", "none", "null", "-", "—", "not found"}
-
-    for line in text.splitlines():
-        if ":" not in line:
+    for field, val in key_fields(text, _PASSPORT_TABLE):
+        if field in PASSPORT_SKIP_MISSING and is_missing(val):
             continue
-        key, val = line.split(":", 1)
-        key, val = key.strip(), val.strip()
-        kl = key.lower()
-
-        if key == "ФИО":
-            res["fio"] = val.upper()
-        elif "дата рождения" in kl:
-            res["birthdate"] = val
-        elif "место рождения" in kl:
-            if "FERGANA" in val.upper():
-                res["birth_place"] = "ФЕРГАНСКАЯ ОБЛАСТЬ"
-            else:
-                res["birth_place"] = val.upper()
-        elif "пол" in kl:
-            uv = val.upper()
-            res["sex"] = "МУЖСКОЙ" if uv in {"M", "М", "МУЖ", "MALE"} else ("ЖЕНСКИЙ" if uv in {"F", "Ж", "ЖЕН", "FEMALE"} else uv)
         # Серия: не пишем для таджикского паспорта
-        elif (key == "Серия" or ("серия" in kl and "паспорт" in kl)) and not is_tajik:
-            if not is_missing(val) and val.strip().lower() not in {"нет"}:
-                res["passport_series"] = val.upper()
-        # Номер (таджикский): приоритетно пишем в passport_number
-        elif "номер (таджик" in kl:
-            if not is_missing(val):
-                res["passport_number"] = val.upper()
-        # Универсальный номер
-        elif ("номер" in kl and "паспорт" in kl) or key == "Номер":
-            if not is_missing(val):
-                res["passport_number"] = val.upper()
-        elif "дата" in kl and ("выдач" in kl or "passport" in kl):
-            res["issue_date"] = val
-        elif "срок действия" in kl or "действителен до" in kl:
-            res["expiry_date"] = val
-        elif "кем выдан" in kl or "authority" in kl:
-            if "МВД" in val.upper():
-                mvd_pos = val.upper().find("МВД")
-                if mvd_pos != -1:
-                    after_mvd = val[mvd_pos + 3:].strip()
-                    nums = ''.join(filter(str.isdigit, after_mvd))
-                    res["authority"] = f"МВД {nums}" if nums else "МВД"
-                else:
-                    res["authority"] = val.strip()
-            else:
-                nums = ''.join(filter(str.isdigit, val))
-                res["authority"] = f"МВД {nums}" if nums else val.strip()
-        elif "страна" in kl or "гражданство" in kl:
-            v = val.upper().strip()
-            mapping = {
-                "UZBEKISTAN": "УЗБЕКИСТАН",
-                "REPUBLIC OF UZBEKISTAN": "УЗБЕКИСТАН",
-                "УЗБЕКИСТАН": "УЗБЕКИСТАН",
-                "TAJIKISTAN": "ТАДЖИКИСТАН",
-                "REPUBLIC OF TAJIKISTAN": "ТАДЖИКИСТАН",
-                "ТАДЖИКИСТАН": "ТАДЖИКИСТАН",
-                "ТАДЖИКСКАЯ РЕСПУБЛИКА": "ТАДЖИКИСТАН",
-            }
-            res["nationality"] = mapping.get(v, v)
-        elif "мрз" in kl or "mrz" in kl:
-            res["mrz"] = val.upper()
-
-    # Если это таджикский паспорт — серия должна быть пустой
-    if is_tajik:
-        res.pop("passport_series", None)
-
-    return res
-
-def parse_dms_fields(text: str):
-    res = {}
-    lines = text.splitlines()
-
-    # Разбор строк с двоеточием для извлечения ключевых данных
-    for line in lines:
-        if ":" not in line:
-            continue
-        key, val = line.split(":", 1)
-        key, val = key.strip(), val.strip()
-        lk = key.lower()
-
-        if ("email" in lk or "почта" in lk or "e-mail" in lk) or "@" in val:
-            res['insurance_expiry'] = val
-        elif "телефон" in lk or "phone" in lk:
-            res['phone'] = val
-        elif "номер" in lk and ("полис" in lk or "дмс" in lk or "страхов" in lk):
-            res['dms_number'] = val
-        elif "дата" in lk and ("выдач" in lk or "полис" in lk or "дмс" in lk or "страхов" in lk or "начал" in lk):
-            res['insurance_date'] = val
-        elif (("страховая компания" in lk or "страховщик" in lk or ("компан" in lk and "страхов" in lk) or 
-              "insurance company" in lk or "insurer" in lk) and "@" not in val and "телефон" not in lk):
-            # Новый формат ответа GPT: "Страховая компания: <название>" или "Insurance company: <название>"
-            if val and val != "Не найдено":
-                res['insurance_company'] = val
-
-    full_text = " ".join(lines)
-
-    # УНИВЕРСАЛЬНОЕ ИЗВЛЕЧЕНИЕ НАЗВАНИЯ СТРАХОВОЙ КОМПАНИИ
-    if 'insurance_company' not in res:
-        # Стратегия 1: Поиск известных страховых компаний
-        known_companies = [
-            r'(?:ООО\s+)?(?:Страховая\s+компания\s+)?СОГАЗ(?:\s+МЕДИЦИНА)?',
-            r'(?:ООО\s+)?ИНГОССТРАХ(?:-М)?',
-            r'(?:ООО\s+)?РЕСО-Гарантия',
-            r'(?:ООО\s+)?(?:СК\s+)?Альфа-Страхование',
-            r'(?:ПАО\s+)?Росгосстрах',
-            r'(?:ООО\s+)?ВТБ\s+Страхование',
-            r'(?:ООО\s+)?(?:СК\s+)?Сбербанк\s+Страхование',
-            r'(?:ООО\s+)?(?:СК\s+)?АльфаСтрахование-ОМС',
-            r'(?:ООО\s+)?МАКС(?:\s+М)?',
-            r'(?:ООО\s+)?(?:СК\s+)?Капитал\s+Лайф\s+Страхование\s+Жизни',
-            r'(?:ООО\s+)?(?:СК\s+)?ЭРГО(?:\s+Русь)?',
-            r'(?:ООО\s+)?(?:СК\s+)?Гайде',
-            r'(?:ООО\s+)?(?:СК\s+)?УралСиб',
-            r'(?:АО\s+)?(?:СК\s+)?Энергогарант',
-            r'(?:ООО\s+)?(?:СК\s+)?Медэкспресс',
-            r'(?:ООО\s+)?(?:СК\s+)?Страховая\s+Группа\s+МСК',
-            r'(?:ООО\s+)?(?:СК\s+)?ЖАСО',
-            r'(?:ООО\s+)?(?:СК\s+)?Мед\s+Инвест',
-            r'(?:ООО\s+)?(?:СК\s+)?АСКО(?:-МЕД)?(?:\s+ДМС)?',
-            r'(?:ООО\s+)?(?:СК\s+)?Спасские\s+ворота(?:-М)?',
-            r'(?:ООО\s+)?(?:СК\s+)?Либерти\s+Страхование',
-            r'(?:ООО\s+)?(?:СК\s+)?МетЛайф',
-            r'(?:ООО\s+)?(?:СК\s+)?Группа\s+Ренессанс\s+Страхование',
-            r'(?:ООО\s+)?(?:СК\s+)?Открытие\s+Страхование',
-            r'(?:ООО\s+)?(?:СК\s+)?Зетта\s+Страхование',
-            r'(?:ООО\s+)?(?:СК\s+)?Рента',
-            r'(?:ООО\s+)?(?:СК\s+)?СОСЬЕТЕ\s+ЖЕНЕРАЛЬ\s+Страхование',
-            r'(?:ООО\s+)?(?:СК\s+)?Согласие',
-        ]
-        
-        for pattern in known_companies:
-            match = re.search(pattern, full_text, re.IGNORECASE)
-            if match:
-                res['insurance_company'] = match.group(0).strip()
-                break
-        
-        # Стратегия 2: Поиск организационно-правовых форм + "страх"
-        if 'insurance_company' not in res:
-            org_forms_pattern = r'(?:ООО|АО|ПАО|ЗАО|НПФ|ОАО)\s+["\']?(?:[А-ЯЁ][а-яё\s\-]*)*(?:страх|медицин|полис)[а-яёА-ЯЁ\s\-]*["\']?'
-            match = re.search(org_forms_pattern, full_text, re.IGNORECASE)
-            if match:
-                candidate = match.group(0).strip().strip('"\'')
-                # Проверяем, что это не содержит номера или даты
-                if not re.search(r'\d{6,}|\d{2}\.\d{2}\.\d{4}', candidate):
-                    res['insurance_company'] = candidate
-        
-        # Стратегия 3: Поиск по ключевым словам в строках без двоеточия
-        if 'insurance_company' not in res:
-            for line in lines:
-                if ':' in line:
-                    continue
-                    
-                line_clean = line.strip()
-                if len(line_clean) < 5:  # Слишком короткая строка
-                    continue
-                    
-                line_lower = line_clean.lower()
-                
-                # Проверяем наличие страховых маркеров
-                insurance_markers = [
-                    'страхов', 'страхование', 'insurance', 'медицин', 'дмс', 'полис',
-                    'согаз', 'ингос', 'ресо', 'альфа', 'росгос', 'втб', 'сбербанк',
-                    'макс', 'капитал', 'эрго', 'гайде', 'уралсиб', 'энергогарант',
-                    'медэкспресс', 'мск', 'жасо', 'аско', 'спасские', 'либерти',
-                    'метлайф', 'ренессанс', 'открытие', 'зетта', 'рента', 'согласие'
-                ]
-                
-                has_insurance_marker = any(marker in line_lower for marker in insurance_markers)
-                
-                # Исключаем строки с явными признаками не-названий
-                exclusion_patterns = [
-                    r'\d{6,}',  # Длинные числа (номера полисов)
-                    r'\d{2}\.\d{2}\.\d{4}',  # Даты
-                    r'\+?\d[\d\-\(\) ]{8,}',  # Телефоны
-                    r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}',  # Email
-                    r'(?:номер|серия|дата|период|с\s+\d|до\s+\d)',  # Технические поля
-                ]
-                
-                has_exclusion = any(re.search(pattern, line_clean, re.IGNORECASE) for pattern in exclusion_patterns)
-                
-                if has_insurance_marker and not has_exclusion:
-                    # Очищаем от лишних символов
-                    cleaned = re.sub(r'^[^\w]*|[^\w]*$', '', line_clean)
-                    if len(cleaned) > 5:
-                        res['insurance_company'] = cleaned
-                        break
-        
-        # Стратегия 4: Поиск названий в первых строках (логотип/шапка)
-        if 'insurance_company' not in res:
-            for i, line in enumerate(lines[:10]):  # Первые 10 строк
-                if ':' in line or len(line.strip()) < 5:
-                    continue
-                    
-                line_clean = line.strip()
-                line_upper = line_clean.upper()
-                
-                # Часто названия компаний написаны заглавными в шапке
-                if (len([c for c in line_clean if c.isupper()]) / len(line_clean) > 0.7 and 
-                    not re.search(r'\d{6,}|\d{2}\.\d{2}\.\d{4}|\+?\d[\d\-\(\) ]{8,}', line_clean)):
-                    
-                    # Дополнительная проверка на страховые термины
-                    if any(term in line_upper for term in ['СТРАХ', 'МЕДИЦИН', 'INSURANCE', 'СОГАЗ', 'ИНГОС', 'РЕСО']):
-                        res['insurance_company'] = line_clean
-                        break
-
-    # Извлечение остальных полей (номер, дата и т.д.)
-    for i, line in enumerate(lines):
-        # Поиск номера полиса по шаблону (если не найден выше)
-        if 'dms_number' not in res:
-            number_match = re.search(r'(?:№|серия\s+DMS\s*№)\s*([0-9]+)', line, re.IGNORECASE)
-            if number_match:
-                res['dms_number'] = number_match.group(1)
-            else:
-                alt_match = re.search(r'\b(?:полис|dms)\s+№?\s*([A-Za-zА-Яа-я0-9\-\/]+)', line, re.IGNORECASE)
-                if alt_match:
-                    res['dms_number'] = alt_match.group(1)
-
-        if 'insurance_date' not in res:
-            date_match = re.search(r'дата\s+выдачи:\s*(\d{2}\.\d{2}\.\d{4})', line, re.IGNORECASE)
-            if date_match:
-                res['insurance_date'] = date_match.group(1)
-
-        # Email
-        email_match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b', line)
-        if email_match and 'insurance_expiry' not in res:
-            res['insurance_expiry'] = email_match.group(0)
+        if field == "passport_series" and is_tajik:
             continue
-
-    # Последняя попытка найти номер полиса в полном тексте
-    if 'dms_number' not in res:
-        full_number_match = re.search(r'\b(\d{10,15})\b', full_text)
-        if full_number_match:
-            res['dms_number'] = full_number_match.group(1)
+        res[field] = PASSPORT_NORMALIZERS.get(field, str)(val)
 
     return res
 
 def parse_contract_fields(text: str):
-    res = {}
-    lines = text.splitlines()
-    
     # Ищем в тексте стандартные поля с двоеточием
-    for line in lines:
-        if ":" not in line:
-            continue
-        key, val = line.split(":", 1)
-        key, val = key.strip(), val.strip()
-        if "Номер договора" in key:
-            res['contract_number'] = val
-        elif "Дата договора" in key:
-            res['contract_date'] = val
-        elif "Должность" in key:
-            res['position'] = val
-        elif "Место работы" in key:
-            res['work_address'] = val
-        elif "Телефон" in key or "телефон" in key:
-            res['phone'] = val
+    res = key_values(text, _CONTRACT_TABLE)
     
     # Ищем пункт 9 о месте работы, если он не был найден
     if 'work_address' not in res:
+        lines = text.splitlines()
         for i, line in enumerate(lines):
             # Пытаемся найти "9." или "9)" или "Пункт 9" и т.п.
             if re.search(r'(?:^|\s)9[\.\)]|пункт\s*9', line.lower()):
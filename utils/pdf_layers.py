@@ -0,0 +1,407 @@
+"""
+Двухслойная отрисовка PDF-форм.
+
+Статический каркас формы (заголовки, подписи, пустые клетки, рамки чекбоксов)
+рисуется один раз на версию макета и кэшируется на диске. Для каждого запроса
+рисуется только слой с введенными данными, который накладывается на каркас.
+
+Функции страниц формы вызываются дважды с разными холстами:
+- StaticLayerCanvas: рисуется все, кроме значений из данных (draw_value пропускается);
+- DataLayerCanvas: надписи, рамки, линии и контуры подавляются, рисуются только значения.
+
+Отрисовка значения меняет шрифт холста (value_font), и надписи после нее в
+обычной отрисовке наследуют этот шрифт. Каркас рисуется без данных и не знает,
+каким будет шрифт, поэтому надписи от value_font до ближайшего явного setFont
+рисуются не в каркасе, а в слое данных — с тем же шрифтом, что и в обычной
+отрисовке.
+
+Шрифт встраивается в итоговый PDF один раз. Оба холста сначала заносят в
+подмножества TrueType-шрифтов формы один и тот же набор символов SHARED_CHARSET,
+поэтому коды символов в каркасе и в слое данных совпадают, и при наложении слой
+данных ссылается на шрифты каркаса вместо своих копий.
+"""
+
+import glob
+import hashlib
+import logging
+import os
+import re
+import struct
+import threading
+from io import BytesIO
+
+import reportlab
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject, NumberObject
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+
+from config import PDF_SKELETON_DIR
+
+logger = logging.getLogger(__name__)
+
+LAYER_STATIC = "static"
+LAYER_DATA = "data"
+
+# Имя Form XObject слоя данных в ресурсах страницы каркаса
+DATA_LAYER_XOBJECT = "/DataLayer"
+
+# Символы, которые получают одинаковые коды в подмножествах шрифта обоих слоев.
+# ASCII в подмножестве ReportLab и так на своих местах; кириллицы достаточно для
+# надписей и данных формы. Прочие символы слоя данных получают коды после этого
+# набора (см. _layer_fonts).
+SHARED_CHARSET = "АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯабвгдеёжзийклмнопрстуфхцчшщъыьэюя№«»–—"
+
+# Таблицы TrueType, которые не нужны встроенному в PDF шрифту
+_DROPPED_FONT_TABLES = {b"name"}
+
+# Пара «код символа — Unicode» в ToUnicode CMap шрифта ReportLab
+_CMAP_ENTRY = re.compile(rb"<([0-9A-F]{2})> <([0-9A-F]{4})>")
+
+_LOCK = threading.Lock()
+# Каркасы, уже загруженные в этом процессе: {имя_формы: (версия, байты PDF)}
+_SKELETONS = {}
+
+
+class _LayerCanvas(canvas.Canvas):
+    """
+    Холст слоя формы. shared_fonts — имена зарегистрированных шрифтов формы в
+    постоянном порядке: их внутренние имена и коды SHARED_CHARSET закрепляются
+    до отрисовки, одинаково в каркасе и в слое данных.
+    """
+
+    def __init__(self, *args, shared_fonts=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        # Шрифт холста мог смениться при отрисовке значения (value_font)
+        self.font_from_data = False
+        for font_name in shared_fonts:
+            font = pdfmetrics.getFont(font_name)
+            # Стандартные шрифты PDF не встраиваются — делить нечего
+            if getattr(font, "_dynamicFont", 0):
+                font.splitString(SHARED_CHARSET, self._doc)
+                font.getSubsetInternalName(0, self._doc)
+
+    def setFont(self, *args, **kwargs):
+        super().setFont(*args, **kwargs)
+        self.font_from_data = False
+
+
+class StaticLayerCanvas(_LayerCanvas):
+    """Холст каркаса формы: значения из данных и надписи шрифтом из данных не рисуются."""
+    form_layer = LAYER_STATIC
+
+    def drawString(self, *args, **kwargs):
+        if not self.font_from_data:
+            super().drawString(*args, **kwargs)
+
+    def drawCentredString(self, *args, **kwargs):
+        if not self.font_from_data:
+            super().drawCentredString(*args, **kwargs)
+
+    def drawRightString(self, *args, **kwargs):
+        if not self.font_from_data:
+            super().drawRightString(*args, **kwargs)
+
+
+class DataLayerCanvas(_LayerCanvas):
+    """Холст слоя данных: статические надписи (кроме надписей шрифтом из данных), рамки, линии и контуры пропускаются."""
+    form_layer = LAYER_DATA
+
+    def drawString(self, *args, **kwargs):
+        if self.font_from_data:
+            super().drawString(*args, **kwargs)
+
+    def drawCentredString(self, *args, **kwargs):
+        if self.font_from_data:
+            super().drawCentredString(*args, **kwargs)
+
+    def drawRightString(self, *args, **kwargs):
+        if self.font_from_data:
+            super().drawRightString(*args, **kwargs)
+
+    def rect(self, *args, **kwargs):
+        pass
+
+    def line(self, *args, **kwargs):
+        pass
+
+    def drawPath(self, *args, **kwargs):
+        pass
+
+
+def form_layer(c):
+    """Слой, который рисует холст: LAYER_STATIC, LAYER_DATA или None (обычная отрисовка)."""
+    return getattr(c, "form_layer", None)
+
+
+def value_font(c, font_name, size, has_value):
+    """
+    Шрифт, который оставляет на холсте отрисовка значения (has_value — значение
+    есть), как в обычной отрисовке. На холстах слоев следующие надписи до явного
+    setFont считаются надписями шрифтом из данных.
+    """
+    layer = form_layer(c)
+    if has_value and layer != LAYER_STATIC:
+        canvas.Canvas.setFont(c, font_name, size)
+    if layer is not None:
+        c.font_from_data = True
+
+
+def draw_value(c, x, y, text, centred=False):
+    """Рисует значение из данных: в каркасе пропускается, в слое данных не подавляется."""
+    if form_layer(c) == LAYER_STATIC:
+        return
+    if centred:
+        canvas.Canvas.drawCentredString(c, x, y, text)
+    else:
+        canvas.Canvas.drawString(c, x, y, text)
+
+
+def draw_value_line(c, x1, y1, x2, y2):
+    """Рисует линию, положение которой зависит от данных (в каркас не попадает)."""
+    if form_layer(c) == LAYER_STATIC:
+        return
+    canvas.Canvas.line(c, x1, y1, x2, y2)
+
+
+def layout_version(*source_files, extra=""):
+    """
+    Версия макета: хэш исходников, рисующих форму, версии ReportLab и доп. параметров
+    (например, пути к шрифту). Любое изменение кода макета дает новый каркас.
+    """
+    digest = hashlib.sha256()
+    for path in source_files:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    digest.update(reportlab.Version.encode())
+    digest.update(extra.encode())
+    return digest.hexdigest()[:16]
+
+
+def _strip_truetype(font_program):
+    """
+    TrueType-программа шрифта без таблиц, которые не нужны для отображения PDF.
+
+    Для встроенного TrueType-шрифта достаточно таблиц glyf, loca, head, hhea, hmtx,
+    maxp, cvt, fpgm, prep (и cmap); подмножество ReportLab копирует из исходного
+    файла еще таблицу name — у DejaVu это 15 КБ текста лицензии.
+    """
+    num_tables = struct.unpack(">H", font_program[4:6])[0]
+    tables = []
+    for i in range(num_tables):
+        tag, checksum, offset, length = struct.unpack(">4sIII", font_program[12 + 16 * i:28 + 16 * i])
+        if tag not in _DROPPED_FONT_TABLES:
+            tables.append((tag, checksum, font_program[offset:offset + length]))
+    if len(tables) == num_tables:
+        return font_program
+
+    entry_selector = max(len(tables).bit_length() - 1, 0)
+    search_range = 16 << entry_selector
+    header = font_program[:4] + struct.pack(">HHHH", len(tables), search_range, entry_selector,
+                                            len(tables) * 16 - search_range)
+    offset = 12 + 16 * len(tables)
+    directory, body = [], []
+    for tag, checksum, data in tables:
+        directory.append(struct.pack(">4sIII", tag, checksum, offset, len(data)))
+        data += b"\0" * (-len(data) % 4)
+        body.append(data)
+        offset += len(data)
+    result = bytearray(header + b"".join(directory) + b"".join(body))
+
+    # Контрольная сумма файла в head.checkSumAdjustment
+    head = next((i for i, (tag, _, _) in enumerate(tables) if tag == b"head"), None)
+    if head is not None:
+        head_offset = struct.unpack(">I", directory[head][8:12])[0]
+        result[head_offset + 8:head_offset + 12] = b"\0\0\0\0"
+        total = sum(struct.unpack(f">{len(result) // 4}I", result)) & 0xFFFFFFFF
+        result[head_offset + 8:head_offset + 12] = struct.pack(">I", (0xB1B0AFBA - total) & 0xFFFFFFFF)
+    return bytes(result)
+
+
+def _compact_skeleton(pdf_bytes):
+    """
+    Уменьшает PDF каркаса (один раз, при его создании): потоки страниц — только
+    Flate, без ASCII85 ReportLab (+25% к размеру), из встроенных шрифтов удаляются
+    ненужные для отображения таблицы.
+    """
+    writer = PdfWriter(clone_from=PdfReader(BytesIO(pdf_bytes)))
+    font_files = {}
+    for page in writer.pages:
+        page.compress_content_streams()
+        fonts = page[NameObject("/Resources")].get_object().get("/Font")
+        for font in (fonts.get_object().values() if fonts is not None else ()):
+            descriptor = font.get_object().get("/FontDescriptor")
+            font_file = descriptor.get_object().raw_get("/FontFile2") if descriptor is not None else None
+            if font_file is not None:
+                font_files[font_file.idnum] = font_file.get_object()
+    for font_file in font_files.values():
+        program = _strip_truetype(font_file.get_data())
+        font_file.set_data(program)
+        font_file[NameObject("/Length1")] = NumberObject(len(program))
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def get_skeleton(name, version, render):
+    """
+    Возвращает PDF каркаса формы: из памяти процесса, из файла на диске
+    или рисует его заново через render(output) и сохраняет.
+    """
+    cached = _SKELETONS.get(name)
+    if cached and cached[0] == version:
+        return cached[1]
+    with _LOCK:
+        cached = _SKELETONS.get(name)
+        if cached and cached[0] == version:
+            return cached[1]
+        path = os.path.join(PDF_SKELETON_DIR, f"{name}-{version}.pdf")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                pdf_bytes = f.read()
+        else:
+            buffer = BytesIO()
+            render(buffer)
+            pdf_bytes = _compact_skeleton(buffer.getvalue())
+            os.makedirs(PDF_SKELETON_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(pdf_bytes)
+            os.replace(tmp_path, path)
+            logger.info(f"Каркас формы {name} сохранен: {path} ({len(pdf_bytes)} байт)")
+            # Каркасы прежних версий макета больше не понадобятся
+            for old_path in glob.glob(os.path.join(PDF_SKELETON_DIR, f"{glob.escape(name)}-*.pdf")):
+                if old_path != path:
+                    try:
+                        os.remove(old_path)
+                    except FileNotFoundError:
+                        pass
+        _SKELETONS[name] = (version, pdf_bytes)
+        return pdf_bytes
+
+
+def _font_codes(font):
+    """{код: Unicode} подмножества шрифта по его ToUnicode CMap; None, если CMap нет."""
+    to_unicode = font.get("/ToUnicode")
+    if to_unicode is None:
+        return None
+    return dict(_CMAP_ENTRY.findall(to_unicode.get_object().get_data()))
+
+
+def _adopt_font(skeleton_font, font):
+    """
+    Переносит в шрифт каркаса подмножество шрифта слоя данных, содержащее все
+    символы каркаса под теми же кодами. Объекты шрифта каркаса обновляются на
+    месте, поэтому в файл не попадают ни старое, ни второе подмножество.
+    """
+    skeleton_font[NameObject("/LastChar")] = NumberObject(font["/LastChar"])
+    skeleton_font[NameObject("/Widths")] = ArrayObject(FloatObject(width) for width in font["/Widths"])
+    skeleton_font["/ToUnicode"].set_data(font["/ToUnicode"].get_data())
+    font_file = skeleton_font["/FontDescriptor"]["/FontFile2"]
+    program = _strip_truetype(font["/FontDescriptor"]["/FontFile2"].get_data())
+    font_file.set_data(program)
+    font_file[NameObject("/Length1")] = NumberObject(len(program))
+
+
+def _owns_font_file(fonts, name):
+    """Встроенная программа шрифта name не используется другими шрифтами страницы."""
+    descriptor = fonts[name].raw_get("/FontDescriptor")
+    return not any(key != name and fonts[key].get("/FontDescriptor") is not None
+                   and fonts[key].raw_get("/FontDescriptor") == descriptor for key in fonts)
+
+
+def _layer_fonts(writer, data_fonts, skeleton_fonts, codes_cache):
+    """
+    Ресурсы /Font для слоя данных. Если символы слоя данных есть в шрифте каркаса
+    с тем же внутренним именем под теми же кодами, слой ссылается на шрифт каркаса.
+    Если наоборот, шрифт слоя данных содержит весь шрифт каркаса, он переносится
+    в шрифт каркаса (_adopt_font). Иначе у слоя данных остается своя копия шрифта.
+    """
+    form_fonts = DictionaryObject()
+    for name, ref in data_fonts.items():
+        font = ref.get_object()
+        skeleton_ref = skeleton_fonts.raw_get(name) if name in skeleton_fonts else None
+        skeleton_font = skeleton_ref.get_object() if skeleton_ref is not None else None
+        if skeleton_font is None or font.get("/BaseFont") != skeleton_font.get("/BaseFont"):
+            form_fonts[NameObject(name)] = ref.clone(writer)
+            continue
+        if "/FontDescriptor" not in font:
+            # Стандартный шрифт PDF: встроенной программы нет, общий, если совпадает кодировка
+            same = font.get("/Encoding") == skeleton_font.get("/Encoding")
+            form_fonts[NameObject(name)] = skeleton_ref if same else ref.clone(writer)
+            continue
+        if skeleton_ref.idnum not in codes_cache:
+            codes_cache[skeleton_ref.idnum] = _font_codes(skeleton_font)
+        codes, skeleton_codes = _font_codes(font), codes_cache[skeleton_ref.idnum]
+        if codes is None or skeleton_codes is None:
+            form_fonts[NameObject(name)] = ref.clone(writer)
+        elif codes.items() <= skeleton_codes.items():
+            form_fonts[NameObject(name)] = skeleton_ref
+        elif skeleton_codes.items() <= codes.items() and _owns_font_file(skeleton_fonts, name) \
+                and "/FontFile2" in font["/FontDescriptor"]:
+            _adopt_font(skeleton_font, font)
+            codes_cache[skeleton_ref.idnum] = codes
+            form_fonts[NameObject(name)] = skeleton_ref
+        else:
+            form_fonts[NameObject(name)] = ref.clone(writer)
+    return form_fonts
+
+
+def merge_layers(skeleton_pdf, data_pdf, output):
+    """
+    Накладывает страницы слоя данных на соответствующие страницы каркаса.
+
+    Страница слоя данных встраивается в страницу каркаса как Form XObject со своими
+    ресурсами: содержимое страниц не разбирается и не переименовывается, поэтому
+    наложение занимает единицы миллисекунд. Совместимые шрифты слоев не дублируются
+    (см. _layer_fonts).
+    """
+    writer = PdfWriter(clone_from=PdfReader(BytesIO(skeleton_pdf)))
+    data_pages = PdfReader(BytesIO(data_pdf)).pages
+    codes_cache = {}
+    for page, data_page in zip(writer.pages, data_pages):
+        resources = page[NameObject("/Resources")].get_object()
+        data_resources = data_page[NameObject("/Resources")].get_object()
+
+        form_resources = DictionaryObject()
+        for key, value in data_resources.items():
+            if key != "/Font":
+                form_resources[NameObject(key)] = value.clone(writer)
+        data_fonts = data_resources.get("/Font")
+        if data_fonts is not None:
+            data_fonts = data_fonts.get_object()
+            skeleton_fonts = resources.get("/Font")
+            skeleton_fonts = skeleton_fonts.get_object() if skeleton_fonts is not None else DictionaryObject()
+            form_resources[NameObject("/Font")] = _layer_fonts(writer, data_fonts, skeleton_fonts, codes_cache)
+
+        # ReportLab кодирует потоки еще и в ASCII85 (+25% к размеру) — оставляем только Flate
+        form = DecodedStreamObject()
+        form.set_data(data_page[NameObject("/Contents")].get_object().get_data())
+        form = form.flate_encode()
+        form[NameObject("/Type")] = NameObject("/XObject")
+        form[NameObject("/Subtype")] = NameObject("/Form")
+        # Обрезку по краю страницы делает сама страница: BBox по mediabox срезал бы
+        # выходящие за край надписи иначе, чем обычная отрисовка
+        left, bottom, right, top = (float(v) for v in data_page.mediabox)
+        width, height = right - left, top - bottom
+        form[NameObject("/BBox")] = ArrayObject(
+            FloatObject(v) for v in (left - width, bottom - height, right + width, top + height))
+        form[NameObject("/Resources")] = form_resources
+
+        xobjects = resources.get(NameObject("/XObject"))
+        if xobjects is None:
+            xobjects = resources[NameObject("/XObject")] = DictionaryObject()
+        xobjects = xobjects.get_object()
+        xobjects[NameObject(DATA_LAYER_XOBJECT)] = writer._add_object(form)
+
+        overlay = DecodedStreamObject()
+        overlay.set_data(f"q {DATA_LAYER_XOBJECT} Do Q".encode())
+        # raw_get: в массив /Contents должна попасть ссылка на поток, а не сам поток
+        contents = page.raw_get(NameObject("/Contents"))
+        if not isinstance(contents.get_object(), ArrayObject):
+            contents = ArrayObject([contents])
+        else:
+            contents = contents.get_object()
+        contents.append(writer._add_object(overlay))
+        page[NameObject("/Contents")] = contents
+    writer.write(output)
@@ -0,0 +1,122 @@
+"""
+Сервис генерации PDF уведомлений в пуле процессов.
+
+Отрисовка ReportLab — чистый Python и нагружает CPU, поэтому она выполняется
+в отдельных процессах со шрифтами, зарегистрированными при старте процесса.
+Число задач в очереди ограничено: при переполнении вызывающий код ждет
+свободного места, а по истечении PDF_RENDER_WAIT_TIMEOUT получает ошибку.
+Если процесс пула аварийно завершился (пул сломан), пул создается заново и
+генерация повторяется один раз.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import PDF_RENDER_WORKERS, PDF_RENDER_MAX_PENDING, PDF_RENDER_WAIT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+_EXECUTOR = None
+# Ограничение на число задач, отправленных в пул (выполняемых + ожидающих)
+_PENDING_SLOTS = asyncio.Semaphore(PDF_RENDER_MAX_PENDING)
+# Метрики очереди
+_waiting = 0
+_in_pool = 0
+
+
+def _init_worker():
+    """Инициализация процесса пула: шрифты регистрируются, каркас формы загружается один раз."""
+    from utils.fonts import warm_up_fonts
+    from utils.mvd_notification_pdf import get_notification_skeleton
+    warm_up_fonts()
+    get_notification_skeleton()
+
+
+def _ping():
+    return True
+
+
+def _render(data):
+    from utils.template_notification_pdf import create_notification_bytes_from_db_data
+    return create_notification_bytes_from_db_data(data)
+
+
+def _get_executor():
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ProcessPoolExecutor(
+            max_workers=PDF_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _EXECUTOR
+
+
+def _drop_executor(executor):
+    """Останавливает сломанный пул; следующий _get_executor создаст новый."""
+    global _EXECUTOR
+    # Пул мог уже пересоздать другой вызов — новый не трогаем
+    if _EXECUTOR is executor:
+        _EXECUTOR = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def start_pdf_renderer():
+    """Запускает пул и дожидается готовности всех процессов (шрифты уже загружены)."""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    await asyncio.gather(*(loop.run_in_executor(executor, _ping) for _ in range(PDF_RENDER_WORKERS)))
+    logger.info(f"Пул генерации PDF запущен: {PDF_RENDER_WORKERS} процесс(ов)")
+
+
+def shutdown_pdf_renderer():
+    """Останавливает пул процессов."""
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _EXECUTOR = None
+        logger.info("Пул генерации PDF остановлен")
+
+
+def pdf_render_stats() -> dict:
+    """Глубина очереди: задачи в пуле и задачи, ожидающие места в пуле."""
+    return {"in_pool": _in_pool, "waiting": _waiting, "workers": PDF_RENDER_WORKERS}
+
+
+async def render_notification_pdf(data: dict):
+    """
+    Генерирует PDF уведомления МВД в пуле процессов.
+
+    Returns:
+        bytes: Содержимое PDF или None, если генерация не удалась
+
+    Raises:
+        RuntimeError: Если очередь переполнена дольше PDF_RENDER_WAIT_TIMEOUT секунд
+    """
+    global _waiting, _in_pool
+    _waiting += 1
+    try:
+        await asyncio.wait_for(_PENDING_SLOTS.acquire(), timeout=PDF_RENDER_WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Очередь генерации PDF переполнена: {pdf_render_stats()}")
+        raise RuntimeError("сервис генерации PDF перегружен, попробуйте позже")
+    finally:
+        _waiting -= 1
+
+    _in_pool += 1
+    try:
+        if _in_pool > PDF_RENDER_WORKERS:
+            logger.info(f"Очередь генерации PDF: {pdf_render_stats()}")
+        loop = asyncio.get_running_loop()
+        executor = _get_executor()
+        try:
+            return await loop.run_in_executor(executor, _render, data)
+        except BrokenProcessPool as e:
+            logger.error(f"Пул генерации PDF сломан, создается заново: {e}")
+            _drop_executor(executor)
+            return await loop.run_in_executor(_get_executor(), _render, data)
+    finally:
+        _in_pool -= 1
+        _PENDING_SLOTS.release()
@@ -0,0 +1,267 @@
+"""
+Персистентность состояния бота (user_data, chat_data, bot_data и состояния
+ConversationHandler) в SQLite, чтобы незавершенные заявки переживали перезапуск.
+
+- Состояние каждого пользователя/чата — отдельная строка с pickle-снимком.
+- Большие значения bytes (загруженные документы) не попадают в снимок: они
+  сохраняются отдельно в таблице blobs по SHA-256 содержимого, а в снимке
+  остается только ссылка. Поэтому снимок маленький, повторная запись
+  состояния не переписывает уже сохраненные документы, а одинаковые файлы
+  хранятся один раз.
+- Application вызывает update_* раз в update_interval секунд только для
+  изменившихся данных; снимки накапливаются в памяти и записываются одной
+  транзакцией через FLUSH_DELAY после последнего изменения, в потоке, чтобы
+  не блокировать цикл событий. Задача записи работает, пока очередь не пуста;
+  после ошибки запись повторяется с растущей паузой. Остаток дописывается в
+  flush() при остановке.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from collections import defaultdict
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+# bytes не короче этого размера сохраняются отдельно от снимка состояния
+BLOB_MIN_SIZE = 16 * 1024
+# Сколько ждать следующих изменений перед записью накопленных снимков (сек.)
+FLUSH_DELAY = 1.0
+# Предельная пауза между повторными попытками записи после ошибки (сек.)
+FLUSH_RETRY_MAX_DELAY = 60.0
+
+_USER, _CHAT, _BOT, _CONVERSATION = "user", "chat", "bot", "conversation"
+
+
+class _StatePickler(pickle.Pickler):
+    """Pickler, заменяющий большие bytes ссылками на содержимое (digest)."""
+
+    def __init__(self, file, digests, blobs):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        # {id(bytes): (bytes, digest)} — уже посчитанные хеши, чтобы не хешировать документы повторно
+        self._digests = digests
+        # {digest: bytes} — все большие значения этого снимка
+        self.blobs = blobs
+
+    def persistent_id(self, obj):
+        if type(obj) is not bytes or len(obj) < BLOB_MIN_SIZE:
+            return None
+        cached = self._digests.get(id(obj))
+        if cached is not None and cached[0] is obj:
+            digest = cached[1]
+        else:
+            digest = hashlib.sha256(obj).hexdigest()
+        self.blobs[digest] = obj
+        return digest
+
+
+class _StateUnpickler(pickle.Unpickler):
+    """Unpickler, подставляющий содержимое из таблицы blobs по ссылке."""
+
+    def __init__(self, file, load_blob):
+        super().__init__(file)
+        self._load_blob = load_blob
+
+    def persistent_load(self, digest):
+        return self._load_blob(digest)
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Хранилище состояния бота в локальном файле SQLite.
+
+    Args:
+        path: Путь к файлу базы
+        update_interval: Как часто Application передает изменения (сек.)
+    """
+
+    def __init__(self, path: str, update_interval: float = 60):
+        super().__init__(store_data=PersistenceInput(callback_data=False), update_interval=update_interval)
+        self.path = path
+        self._lock = threading.Lock()
+        # {(вид, ключ): (снимок или None для удаления, [digest], {новый digest: bytes})} — ждут записи
+        self._pending = {}
+        # {(вид, ключ): {id(bytes): (bytes, digest)}} — хеши документов из последнего снимка
+        self._digests = defaultdict(dict)
+        # {имя обработчика: {ключ диалога в JSON: состояние}}
+        self._conversations = {}
+        self._flush_task = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (kind TEXT NOT NULL, key TEXT NOT NULL, data BLOB NOT NULL, "
+            "PRIMARY KEY (kind, key))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, data BLOB NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS refs (kind TEXT NOT NULL, key TEXT NOT NULL, digest TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS refs_owner ON refs (kind, key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS refs_digest ON refs (digest)")
+        self._conn.commit()
+
+    # --- Сериализация ---
+
+    def _dumps(self, owner, data):
+        """Снимок данных, все ссылки на документы и документы, которых не было в прошлом снимке."""
+        blobs = {}
+        buffer = io.BytesIO()
+        previous = self._digests[owner]
+        _StatePickler(buffer, previous, blobs).dump(data)
+        known = {digest for _, digest in previous.values()}
+        self._digests[owner] = {id(blob): (blob, digest) for digest, blob in blobs.items()}
+        new_blobs = {digest: blob for digest, blob in blobs.items() if digest not in known}
+        return buffer.getvalue(), list(blobs), new_blobs
+
+    def _load_blob(self, digest):
+        row = self._conn.execute("SELECT data FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise pickle.UnpicklingError(f"нет сохраненного значения {digest}")
+        return bytes(row[0])
+
+    def _load_kind(self, kind):
+        """{ключ: данные} всех записей вида kind; поврежденные записи пропускаются."""
+        res = {}
+        with self._lock:
+            rows = self._conn.execute("SELECT key, data FROM state WHERE kind = ?", (kind,)).fetchall()
+            for key, data in rows:
+                try:
+                    res[key] = _StateUnpickler(io.BytesIO(data), self._load_blob).load()
+                except Exception as e:
+                    logger.warning(f"Состояние {kind}:{key} не загружено: {e}")
+        return res
+
+    # --- Запись ---
+
+    def _schedule(self, owner, data):
+        """Ставит снимок (или удаление, если data is None) в очередь на запись."""
+        if data is None:
+            self._pending[owner] = (None, [], {})
+            self._digests.pop(owner, None)
+        else:
+            self._pending[owner] = self._dumps(owner, data)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        # Пишем, пока есть что писать: изменения, пришедшие во время записи, и снимки,
+        # возвращенные в очередь после ошибки, не ждут следующего update_*
+        delay = FLUSH_DELAY
+        while self._pending:
+            await asyncio.sleep(delay)
+            if await self._write_pending():
+                delay = FLUSH_DELAY
+            else:
+                delay = min(delay * 2, FLUSH_RETRY_MAX_DELAY)
+
+    async def _write_pending(self) -> bool:
+        """Записывает накопленные снимки; False — запись не удалась и снимки снова в очереди."""
+        if not self._pending:
+            return True
+        pending, self._pending = self._pending, {}
+        try:
+            await asyncio.to_thread(self._write, pending)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка записи состояния бота: {e}")
+            # Не теряем изменения: более новые снимки тех же ключей имеют приоритет,
+            # но документы из ненаписанного снимка остаются в очереди на запись
+            for owner, (data, digests, new_blobs) in pending.items():
+                if owner in self._pending:
+                    newer_data, newer_digests, newer_blobs = self._pending[owner]
+                    self._pending[owner] = (newer_data, newer_digests, {**new_blobs, **newer_blobs})
+                else:
+                    self._pending[owner] = (data, digests, new_blobs)
+            return False
+
+    def _write(self, pending):
+        """Записывает снимки одной транзакцией и удаляет документы, на которые больше нет ссылок."""
+        with self._lock, self._conn:
+            for (kind, key), (data, digests, new_blobs) in pending.items():
+                self._conn.execute("DELETE FROM refs WHERE kind = ? AND key = ?", (kind, key))
+                if data is None:
+                    self._conn.execute("DELETE FROM state WHERE kind = ? AND key = ?", (kind, key))
+                    continue
+                self._conn.executemany("INSERT OR IGNORE INTO blobs (digest, data) VALUES (?, ?)", new_blobs.items())
+                self._conn.executemany("INSERT INTO refs (kind, key, digest) VALUES (?, ?, ?)",
+                                       [(kind, key, digest) for digest in digests])
+                self._conn.execute("INSERT OR REPLACE INTO state (kind, key, data) VALUES (?, ?, ?)",
+                                   (kind, key, data))
+            self._conn.execute("DELETE FROM blobs WHERE digest NOT IN (SELECT digest FROM refs)")
+        logger.info(f"Состояние бота сохранено: записей {len(pending)}")
+
+    # --- BasePersistence ---
+
+    async def get_user_data(self):
+        return {int(key): data for key, data in self._load_kind(_USER).items()}
+
+    async def get_chat_data(self):
+        return {int(key): data for key, data in self._load_kind(_CHAT).items()}
+
+    async def get_bot_data(self):
+        return self._load_kind(_BOT).get("", {})
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        conversations = self._load_kind(_CONVERSATION).get(name, {})
+        return {tuple(json.loads(key)): state for key, state in conversations.items()}
+
+    async def update_user_data(self, user_id, data):
+        self._schedule((_USER, str(user_id)), data)
+
+    async def update_chat_data(self, chat_id, data):
+        self._schedule((_CHAT, str(chat_id)), data)
+
+    async def update_bot_data(self, data):
+        self._schedule((_BOT, ""), data)
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        # Состояния всех диалогов обработчика — одна небольшая запись
+        if name not in self._conversations:
+            loaded = await self.get_conversations(name)
+            self._conversations[name] = {json.dumps(list(k)): state for k, state in loaded.items()}
+        conversations = self._conversations[name]
+        if new_state is None:
+            conversations.pop(json.dumps(list(key)), None)
+        else:
+            conversations[json.dumps(list(key))] = new_state
+        self._schedule((_CONVERSATION, name), conversations)
+
+    async def drop_user_data(self, user_id):
+        self._schedule((_USER, str(user_id)), None)
+
+    async def drop_chat_data(self, chat_id):
+        self._schedule((_CHAT, str(chat_id)), None)
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        """Дописывает накопленные изменения при остановке бота."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self._write_pending()
+        with self._lock:
+            self._conn.close()
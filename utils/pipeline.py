@@ -0,0 +1,366 @@
+"""
+Конвейер обработки загруженных документов.
+
+Сначала все документы распределяются по типам (по имени файла), затем
+OCR и GPT для всех типов выполняются параллельно с ограничением на число
+одновременно обрабатываемых документов. У паспорта с читаемой MRZ
+большая часть полей берется из нее, а GPT запрашивает только остальные.
+
+С GPT_STRUCTURED GPT отвечает JSON-объектом по схеме полей документа
+(utils.field_schemas), который проверяется одним декодером; текстовые
+парсеры из utils.parsers используются, только если ответ не прошел проверку.
+
+С GPT_COMBINED тексты всех документов после OCR отправляются в GPT одним
+запросом с разделами по типам документов (utils.gpt.extract_fields_combined),
+а каждый раздел ответа разбирается так же, как отдельный ответ.
+
+Обработка может начаться заранее: start_prefetch запускает OCR для документа
+сразу после загрузки в фоновой задаче, а если запрос не совмещенный — и GPT,
+но только для первого документа каждого типа (остальные кандидаты нужны,
+лишь если первый не распознается). Задачи хранятся в реестре модуля по id
+пользователя (в user_data их положить нельзя — оно сохраняется между
+перезапусками), а run_document_pipeline дожидается уже запущенных задач
+вместо повторной обработки. Задачи пользователя, к которым не обращались
+дольше PREFETCH_TTL, отменяются фоновой проверкой.
+"""
+
+import asyncio
+import logging
+import time
+
+from config import DOCUMENT_CONCURRENCY, GPT_COMBINED, GPT_STRUCTURED, PREFETCH_TTL
+from utils.document_store import open_document
+from utils.field_schemas import FIELD_SCHEMAS, decode_fields
+from utils.gpt import extract_doc_fields_with_gpt, extract_fields_combined
+from utils.mrz import mrz_passport_fields
+from utils.ocr import ocr_document
+from utils.parsers import parse_passport_fields
+from utils.prompts import PROMPT_PASSPORT, PROMPT_PASSPORT_NO_MRZ_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Дополнительные ключевые слова для поиска документа по имени файла
+EXTRA_KEYWORDS = {
+    'договор': ['тд'],
+    'дмс': ['страхов'],
+}
+
+
+async def extract_fields(raw_text: str, prompt: str, parser, schema: str = None) -> dict:
+    """
+    Поля документа через GPT: структурированный ответ по схеме (при GPT_STRUCTURED),
+    а если он не прошел проверку или схемы нет — текстовый ответ и парсер.
+    """
+    if GPT_STRUCTURED and schema in FIELD_SCHEMAS:
+        fields = decode_fields(await extract_doc_fields_with_gpt(raw_text, prompt, schema=schema), schema)
+        if fields is not None:
+            return fields
+        logger.warning(f"Структурированный ответ GPT ({schema}) не прошел проверку, запрашиваем текстовый")
+    return parser(await extract_doc_fields_with_gpt(raw_text, prompt))
+
+
+def passport_prompt(raw_text: str):
+    """
+    Промпт и схема для паспорта и поля из MRZ: при читаемой MRZ у GPT
+    запрашиваются только остальные поля.
+    """
+    mrz_fields = mrz_passport_fields(raw_text)
+    if not mrz_fields:
+        return PROMPT_PASSPORT, 'passport', {}
+    logger.info(f"Паспорт: поля из MRZ ({', '.join(mrz_fields)}), GPT — только остальные")
+    return PROMPT_PASSPORT_NO_MRZ_FIELDS, 'passport_no_mrz_fields', mrz_fields
+
+
+async def extract_passport_fields(raw_text: str) -> dict:
+    """
+    Поля паспорта: из MRZ (с проверкой контрольных цифр), остальные — через GPT
+    по сокращенному промпту. Без MRZ все поля извлекаются полным промптом.
+    """
+    prompt, schema, mrz_fields = passport_prompt(raw_text)
+    fields = await extract_fields(raw_text, prompt, parse_passport_fields, schema)
+    fields.update(mrz_fields)
+    return fields
+
+
+# Извлечение полей, которое заменяет стандартное «промпт + парсер» для типа документа
+FIELD_EXTRACTORS = {
+    'passport': extract_passport_fields,
+}
+
+
+def classify_documents(documents: list, processing_map: dict) -> dict:
+    """
+    Распределяет документы по типам из processing_map по имени файла.
+    Каждый документ попадает только в первый подходящий тип (в порядке processing_map).
+
+    Returns:
+        dict: {ключевое_слово: [индексы документов-кандидатов]}
+    """
+    assigned = set()
+    classified = {}
+    for keyword in processing_map:
+        search_keywords = [keyword] + EXTRA_KEYWORDS.get(keyword, [])
+        candidates = []
+        for i, doc in enumerate(documents):
+            if i in assigned:
+                continue
+            if any(kw in doc['name'].lower() for kw in search_keywords):
+                candidates.append(i)
+                assigned.add(i)
+        classified[keyword] = candidates
+    return classified
+
+
+async def _extract_fields(doc_type, raw_text, prompt, parser):
+    if doc_type in FIELD_EXTRACTORS:
+        return await FIELD_EXTRACTORS[doc_type](raw_text)
+    return await extract_fields(raw_text, prompt, parser, doc_type)
+
+
+async def _process_type(documents, candidates, doc_type, prompt, parser, semaphore, on_progress, prefetched):
+    """
+    Обрабатывает кандидатов одного типа по очереди до первого успешного.
+    Возвращает словарь полей или None, если ни один документ не обработан.
+    """
+    for i in candidates:
+        doc = documents[i]
+        tasks = prefetched.get(doc.get('digest'), {})
+        try:
+            if tasks.get('fields'):
+                # Документ уже обрабатывается (или обработан) с момента загрузки
+                data = await tasks['fields']
+                if data is None:
+                    logger.warning(f"Пустой результат OCR: {doc['name']}")
+                    continue
+            else:
+                async with semaphore:
+                    if tasks.get('ocr'):
+                        raw_text = await tasks['ocr']
+                    else:
+                        async with open_document(doc) as content:
+                            raw_text = await ocr_document(content, doc['mime'], doc_type=doc_type, name=doc['name'])
+                    if not raw_text:
+                        logger.warning(f"Пустой результат OCR: {doc['name']}")
+                        continue
+                    data = await _extract_fields(doc_type, raw_text, prompt, parser)
+        except Exception as e:
+            logger.error(f"Ошибка обработки '{doc['name']}': {e}", exc_info=True)
+            if on_progress:
+                await on_progress(doc, False)
+            continue
+        if on_progress:
+            await on_progress(doc, True)
+        return data
+    return None
+
+
+async def _ocr_type(documents, candidates, doc_type, semaphore, on_progress, prefetched):
+    """OCR кандидатов одного типа по очереди до первого непустого текста: (документ, текст) или None."""
+    for i in candidates:
+        doc = documents[i]
+        task = prefetched.get(doc.get('digest'), {}).get('ocr')
+        try:
+            if task:
+                raw_text = await task
+            else:
+                async with semaphore, open_document(doc) as content:
+                    raw_text = await ocr_document(content, doc['mime'], doc_type=doc_type, name=doc['name'])
+        except Exception as e:
+            logger.error(f"Ошибка OCR '{doc['name']}': {e}", exc_info=True)
+            if on_progress:
+                await on_progress(doc, False)
+            continue
+        if raw_text:
+            return doc, raw_text
+        logger.warning(f"Пустой результат OCR: {doc['name']}")
+    return None
+
+
+async def _run_combined(documents, processing_map, classified, semaphore, on_progress, prefetched):
+    """OCR всех типов параллельно, затем один запрос GPT на все документы."""
+    keywords = list(processing_map)
+    ocr_results = await asyncio.gather(*(
+        _ocr_type(documents, classified.get(keyword, []), processing_map[keyword][0], semaphore, on_progress,
+                  prefetched)
+        for keyword in keywords
+    ))
+    ocr_results = {keyword: result for keyword, result in zip(keywords, ocr_results) if result}
+
+    sections = {}
+    schemas = {}
+    mrz_fields = {}
+    for keyword, (doc, raw_text) in ocr_results.items():
+        doc_type, prompt = processing_map[keyword][0], processing_map[keyword][1]
+        schema = doc_type
+        if doc_type == 'passport':
+            prompt, schema, mrz_fields[keyword] = passport_prompt(raw_text)
+        sections[doc_type] = (prompt, raw_text)
+        schemas[doc_type] = schema
+    structured = GPT_STRUCTURED and all(schema in FIELD_SCHEMAS for schema in schemas.values())
+    answers = await extract_fields_combined(sections, schemas if structured else None) if sections else {}
+    if answers is None:
+        logger.warning("Совмещенный запрос GPT не удался, поля извлекаются отдельными запросами")
+        answers = {}
+
+    async def finish(keyword):
+        doc, raw_text = ocr_results[keyword]
+        doc_type, prompt, parser = processing_map[keyword][:3]
+        try:
+            data = None
+            if doc_type in answers:
+                if structured:
+                    data = decode_fields(answers[doc_type], schemas[doc_type])
+                else:
+                    data = parser("\n".join(f"{key}: {value}" for key, value in answers[doc_type].items()))
+            if data is None:
+                # Раздела нет в ответе или он не прошел проверку — отдельный запрос, как в обычном режиме
+                data = await _extract_fields(doc_type, raw_text, prompt, parser)
+            else:
+                data.update(mrz_fields.get(keyword, {}))
+        except Exception as e:
+            logger.error(f"Ошибка обработки '{doc['name']}': {e}", exc_info=True)
+            if on_progress:
+                await on_progress(doc, False)
+            return None
+        if on_progress:
+            await on_progress(doc, True)
+        return data
+
+    results = await asyncio.gather(*(finish(keyword) for keyword in ocr_results))
+    data_by_keyword = dict(zip(ocr_results, results))
+    return {keyword: data_by_keyword.get(keyword) for keyword in keywords}
+
+
+async def run_document_pipeline(documents: list, processing_map: dict, classified: dict,
+                                on_progress=None, concurrency: int = None, combined: bool = None,
+                                prefetched: dict = None) -> dict:
+    """
+    Запускает OCR и GPT для всех классифицированных документов параллельно.
+
+    Args:
+        documents: Загруженные документы ({'digest', 'size', 'name', 'mime'}, см. utils.document_store)
+        processing_map: {ключевое_слово: (тип_документа, промпт, парсер, обязательные_поля)}
+        classified: Результат classify_documents
+        on_progress: async-функция (doc, ok), вызывается по завершении каждого документа
+        concurrency: Максимум одновременно обрабатываемых документов
+        combined: Один запрос GPT на все документы (по умолчанию GPT_COMBINED)
+        prefetched: Задачи, запущенные при загрузке (get_prefetched); их результаты
+            используются вместо повторного OCR и GPT
+
+    Returns:
+        dict: {ключевое_слово: словарь полей или None} в порядке processing_map
+    """
+    semaphore = asyncio.Semaphore(concurrency or DOCUMENT_CONCURRENCY)
+    prefetched = prefetched or {}
+    if GPT_COMBINED if combined is None else combined:
+        return await _run_combined(documents, processing_map, classified, semaphore, on_progress, prefetched)
+    keywords = list(processing_map)
+    results = await asyncio.gather(*(
+        _process_type(documents, classified.get(keyword, []), processing_map[keyword][0],
+                      processing_map[keyword][1], processing_map[keyword][2],
+                      semaphore, on_progress, prefetched)
+        for keyword in keywords
+    ))
+    return dict(zip(keywords, results))
+
+
+# Фоновая обработка документов с момента загрузки:
+# {id пользователя: {'semaphore': Semaphore, 'documents': {digest: {'ocr': Task, 'fields': Task | None}},
+#                    'fields_started': {ключевые слова типов с запущенным GPT}, 'touched': time.monotonic()}}
+_PREFETCH = {}
+_sweep_task = None
+
+
+def _log_prefetch_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Фоновая обработка документа не удалась: {task.exception()}")
+
+
+async def _prefetch_ocr(doc, doc_type, semaphore):
+    async with semaphore, open_document(doc) as content:
+        return await ocr_document(content, doc['mime'], doc_type=doc_type, name=doc['name'])
+
+
+async def _prefetch_fields(ocr_task, doc_type, prompt, parser, semaphore):
+    raw_text = await ocr_task
+    if not raw_text:
+        return None
+    async with semaphore:
+        return await _extract_fields(doc_type, raw_text, prompt, parser)
+
+
+def start_prefetch(user_id, doc: dict, processing_map: dict, combined: bool = None):
+    """
+    Запускает обработку только что загруженного документа в фоне: OCR, а если
+    запрос GPT не совмещенный — и извлечение полей. Тип определяется так же, как
+    в classify_documents; документ без типа или без digest не обрабатывается.
+
+    Returns:
+        str: Ключевое слово типа документа или None
+    """
+    keyword = next((kw for kw, candidates in classify_documents([doc], processing_map).items() if candidates), None)
+    if keyword is None or 'digest' not in doc:
+        return None
+    entry = _PREFETCH.setdefault(user_id, {'semaphore': asyncio.Semaphore(DOCUMENT_CONCURRENCY), 'documents': {},
+                                           'fields_started': set()})
+    entry['touched'] = time.monotonic()
+    _start_sweep()
+    if doc['digest'] in entry['documents']:
+        return keyword
+    doc_type, prompt, parser = processing_map[keyword][:3]
+    loop = asyncio.get_running_loop()
+    ocr_task = loop.create_task(_prefetch_ocr(doc, doc_type, entry['semaphore']))
+    fields_task = None
+    # GPT заранее — только для первого документа типа: его и возьмет run_document_pipeline
+    if not (GPT_COMBINED if combined is None else combined) and keyword not in entry['fields_started']:
+        entry['fields_started'].add(keyword)
+        fields_task = loop.create_task(_prefetch_fields(ocr_task, doc_type, prompt, parser, entry['semaphore']))
+    # Ошибку журналирует последняя задача цепочки (ошибка OCR передается в задачу полей)
+    (fields_task or ocr_task).add_done_callback(_log_prefetch_failure)
+    entry['documents'][doc['digest']] = {'ocr': ocr_task, 'fields': fields_task}
+    logger.info(f"Фоновая обработка '{doc['name']}' ({doc_type}) запущена")
+    return keyword
+
+
+def get_prefetched(user_id) -> dict:
+    """Задачи фоновой обработки документов пользователя: {digest: {'ocr', 'fields'}}."""
+    entry = _PREFETCH.get(user_id)
+    if not entry:
+        return {}
+    entry['touched'] = time.monotonic()
+    return entry['documents']
+
+
+def cancel_prefetch(user_id):
+    """Отменяет фоновую обработку документов пользователя и забывает ее результаты."""
+    entry = _PREFETCH.pop(user_id, None)
+    if not entry:
+        return
+    for tasks in entry['documents'].values():
+        for task in tasks.values():
+            if task:
+                task.cancel()
+
+
+def cleanup_prefetch(ttl: float = PREFETCH_TTL) -> int:
+    """Отменяет фоновую обработку пользователей, к которой не обращались дольше ttl секунд; возвращает их число."""
+    deadline = time.monotonic() - ttl
+    stale = [user_id for user_id, entry in _PREFETCH.items() if entry['touched'] < deadline]
+    for user_id in stale:
+        cancel_prefetch(user_id)
+    return len(stale)
+
+
+async def _sweep_loop():
+    # Работает, пока есть фоновая обработка: брошенные диалоги не держат задачи вечно
+    while _PREFETCH:
+        await asyncio.sleep(PREFETCH_TTL / 2)
+        removed = cleanup_prefetch()
+        if removed:
+            logger.info(f"Фоновая обработка документов: отменена для неактивных пользователей ({removed})")
+
+
+def _start_sweep():
+    global _sweep_task
+    if _sweep_task is None or _sweep_task.done():
+        _sweep_task = asyncio.get_running_loop().create_task(_sweep_loop())
@@ -29,6 +29,22 @@ PROMPT_PASSPORT = (
     "Текст:\n"
 )
 
+# Паспорт с прочитанной MRZ: остальные поля берутся из нее, у GPT запрашиваются только эти
+PROMPT_PASSPORT_NO_MRZ_FIELDS = (
+    "Ты — эксперт по иностранным паспортам. Из текста найди:\n"
+    "1. ФИО (Фамилия Имя Отчество, русскими буквами, ВСЕ ЗАГЛАВНЫМИ; латинское написание есть в MRZ)\n"
+    "2. Место рождения\n"
+    "3. Дата выдачи\n"
+    "4. Кем выдан (пример: МВД России, МВД Таджикистана, МВД Узбекистана)\n"
+    "Ответь строго в формате:\n"
+    "ФИО: <русскими ЗАГЛАВНЫМИ>\n"
+    "Место рождения: <место>\n"
+    "Дата выдачи: <дата>\n"
+    "Кем выдан: <орган>\n"
+    "Если не можешь найти — пиши 'Не найдено'.\n"
+    "Текст:\n"
+)
+
 PROMPT_MIGRATION = (
     "Ты — эксперт по миграционным картам РФ. Из текста найди:\n"
     "1. Серия карты\n"
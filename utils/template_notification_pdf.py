@@ -6,13 +6,12 @@
 """
 
 import os
-import platform
 import logging
 from datetime import datetime
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+
+from utils.fonts import register_fonts
 
 # Настраиваем логгер
 logging.basicConfig(level=logging.INFO)
@@ -39,52 +38,6 @@ FONT_SIZE = 9
 SMALL_FONT_SIZE = 8
 TINY_FONT_SIZE = 7
 
-# Регистрируем шрифты с поддержкой кириллицы
-def register_fonts():
-    """Регистрирует шрифты для использования в PDF"""
-    font_registered = False
-    font_name = "Helvetica"  # По умолчанию
-    
-    # Определяем операционную систему и пути к шрифтам
-    system = platform.system()
-    if system == "Windows":
-        font_paths = [
-            "C:/Windows/Fonts/arial.ttf",
-            "C:/Windows/Fonts/times.ttf",
-            "C:/Windows/Fonts/cour.ttf",  # Courier New
-        ]
-    elif system == "Darwin":  # macOS
-        font_paths = [
-            "/Library/Fonts/Arial.ttf",
-            "/Library/Fonts/Times New Roman.ttf",
-            "/Library/Fonts/Courier New.ttf",
-        ]
-    else:  # Linux и другие
-        font_paths = [
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-            "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
-        ]
-    
-    # Пробуем зарегистрировать шрифт
-    for font_path in font_paths:
-        if os.path.exists(font_path):
-            try:
-                # Регистрируем шрифт для основного текста
-                pdfmetrics.registerFont(TTFont("FormFont", font_path))
-                # Регистрируем шрифт для кириллицы
-                pdfmetrics.registerFont(TTFont("CyrillicFont", font_path))
-                font_name = "FormFont"
-                font_registered = True
-                logger.info(f"Зарегистрирован шрифт: {font_path}")
-                break
-            except Exception as e:
-                logger.warning(f"Не удалось зарегистрировать шрифт {font_path}: {e}")
-    
-    if not font_registered:
-        logger.warning("Не удалось зарегистрировать шрифт с поддержкой кириллицы, используем стандартный")
-    
-    return font_name
-
 # Функция для рисования клеток с символами
 def draw_char_cells(c, x, y, text, num_cells, cell_width=CELL_WIDTH, cell_height=CELL_HEIGHT, font_size=SMALL_FONT_SIZE):
     """
@@ -692,6 +645,24 @@ def create_notification_from_db_data(user_data, output_dir="notifications"):
         traceback.print_exc()
         return None
 
+def create_notification_bytes_from_db_data(user_data):
+    """
+    Создает PDF уведомление по данным из базы данных целиком в памяти.
+    
+    Args:
+        user_data (dict): Данные пользователя из базы данных
+    
+    Returns:
+        bytes: Содержимое PDF или None в случае ошибки
+    """
+    try:
+        from utils.mvd_notification_pdf import create_notification_pdf_bytes
+        return create_notification_pdf_bytes(user_data)
+    
+    except Exception as e:
+        logger.error(f"Ошибка при создании уведомления из данных БД: {e}")
+        return None
+
 # Тестирование функции генерации PDF
 if __name__ == "__main__":
     # Тестовые данные